@@ -0,0 +1,158 @@
+"""
+録音停止後の処理の実行方式の比較ベンチマーク（フェイクサーバー使用）。
+
+同じ数の口述を一度に投入し、全ての結果が届くまでの時間・スループット・レイテンシと、
+実行中のスレッド数のピークを比べる。
+- thread: TranscriptionQueue（ワーカースレッド + RequestPolicy のスレッドで同期クライアントを呼ぶ）
+- async:  AsyncTranscriptionQueue（1本のイベントループ上で非同期クライアントを呼ぶ）
+接続プールの上限で頭打ちにならないよう、どちらもプールを --pool 本にして比べる。
+あわせて、キャンセルとタイムアウトで結果が kind="cancelled" / "timeout" として届くことを確認する。
+
+    python benchmarks/bench_async_core.py [--latency 0.5] [--concurrency 4,16,64]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("APPDATA", tempfile.mkdtemp(prefix="rb10-async-"))
+
+from src.async_jobs import AsyncTranscriptionQueue, EventLoopThread
+from src.backends import OpenAIBackend
+from src.jobs import TranscriptionQueue
+from src.request_policy import RequestPolicy
+from src.transcriber import Transcriber
+from bench_backends import make_speech_like
+from fake_openai import FakeOpenAIServer
+
+
+def client_threads() -> int:
+    """フェイクサーバーの接続ごとのスレッドを除いた、実行中のスレッド数"""
+    return sum(1 for thread in threading.enumerate() if "process_request" not in thread.name)
+
+
+class ThreadSampler:
+    """実行中のスレッド数のピークを記録する"""
+
+    def __init__(self, interval=0.005):
+        self.peak = client_threads()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(interval,), daemon=True)
+        self._thread.start()
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            self.peak = max(self.peak, client_threads())
+
+    def stop(self) -> int:
+        self._stop.set()
+        self._thread.join()
+        return self.peak
+
+
+def make_transcriber(base_url, pool, loop=None):
+    backend = OpenAIBackend(api_key="sk-test", base_url=base_url)
+    backend.MAX_CONNECTIONS = pool
+    backend.reload_key()
+    if loop is not None:
+        backend.attach_loop(loop.loop)
+    transcriber = Transcriber(backend, cache=None)
+    # 実行方式だけを比べるため、ヘッジで送信数が変わらないようにする
+    transcriber.policy = RequestPolicy(hedging=False)
+    return transcriber
+
+
+def run_jobs(mode, base_url, pool, concurrency, jobs):
+    clips = [make_speech_like(3, seed=i) for i in range(jobs)]
+    done = threading.Event()
+    finished = []
+    errors = []
+
+    def on_result(text, error):
+        finished.append(time.perf_counter())
+        if error:
+            errors.append(error)
+        if len(finished) == jobs:
+            done.set()
+
+    loop = EventLoopThread() if mode == "async" else None
+    transcriber = make_transcriber(base_url, pool, loop)
+    baseline_threads = client_threads()
+    sampler = ThreadSampler()
+    start = time.perf_counter()
+    if mode == "async":
+        queue = AsyncTranscriptionQueue(loop, max_jobs=concurrency, on_result=on_result)
+        for clip in clips:
+            queue.submit(lambda clip=clip: transcriber.transcribe_async(clip))
+    else:
+        queue = TranscriptionQueue(max_workers=concurrency, on_result=on_result)
+        for clip in clips:
+            queue.submit(lambda clip=clip: transcriber.transcribe(clip))
+    done.wait(120)
+    elapsed = time.perf_counter() - start
+    peak = sampler.stop() - baseline_threads
+    queue.shutdown()
+    if loop:
+        loop.stop()
+    latencies = (np.array(finished) - start) * 1000
+    return {"elapsed": elapsed, "throughput": jobs / elapsed, "p50": np.percentile(latencies, 50),
+            "p95": np.percentile(latencies, 95), "threads": peak, "errors": len(errors)}
+
+
+def check_cancel_and_timeout(base_url):
+    """キャンセル・タイムアウトした口述が、待たずにエラーとして投入順に届くこと"""
+    loop = EventLoopThread()
+    transcriber = make_transcriber(base_url, 4, loop)
+    results = []
+    done = threading.Event()
+
+    def on_result(text, error):
+        results.append((time.perf_counter(), getattr(error, "kind", None)))
+        if len(results) == 5:
+            done.set()
+
+    queue = AsyncTranscriptionQueue(loop, max_jobs=2, on_result=on_result)
+    start = time.perf_counter()
+    queue.submit(lambda: transcriber.transcribe_async(make_speech_like(3, seed=0)), timeout=0.2)
+    for i in range(4):
+        queue.submit(lambda: transcriber.transcribe_async(make_speech_like(3, seed=1 + i)))
+    time.sleep(0.3)
+    queue.cancel_all()
+    done.wait(10)
+    kinds = [kind for _, kind in results]
+    last = (results[-1][0] - start) * 1000
+    queue.shutdown()
+    loop.stop()
+    assert kinds == ["timeout"] + ["cancelled"] * 4, kinds
+    print(f"  timeout + cancel: {kinds} delivered in order, last after {last:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.5, help="フェイクサーバーの応答時間（秒）")
+    parser.add_argument("--concurrency", default="4,16,64", help="同時に実行する口述の数（カンマ区切り）")
+    parser.add_argument("--jobs-per-slot", type=int, default=2, help="同時実行数あたりの投入件数")
+    parser.add_argument("--pool", type=int, default=64, help="接続プールの上限")
+    args = parser.parse_args()
+
+    print(f"Concurrent dictations, 3 s each (upstream {args.latency * 1000:.0f} ms, pool {args.pool})")
+    print(f"  {'mode':6s} {'conc':>4s} {'jobs':>4s} {'elapsed':>8s} {'jobs/s':>7s} {'p50 ms':>7s}"
+          f" {'p95 ms':>7s} {'+threads':>8s}")
+    with FakeOpenAIServer(latency=args.latency) as server:
+        for concurrency in [int(n) for n in args.concurrency.split(",")]:
+            jobs = concurrency * args.jobs_per_slot
+            for mode in ("thread", "async"):
+                row = run_jobs(mode, server.base_url, args.pool, concurrency, jobs)
+                print(f"  {mode:6s} {concurrency:4d} {jobs:4d} {row['elapsed']:7.2f}s {row['throughput']:7.1f}"
+                      f" {row['p50']:7.0f} {row['p95']:7.0f} {row['threads']:8d}"
+                      + (f"  ({row['errors']} errors)" if row['errors'] else ""))
+        check_cancel_and_timeout(server.base_url)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+文字起こしバックエンドのレイテンシ比較ベンチマーク。
+
+同じ合成音声を OpenAI バックエンドとローカルCPUバックエンドに渡し、
+音声1秒あたりの処理時間（秒）を比較する。
+
+- openai: 環境変数 OPENAI_API_KEY（と任意で OPENAI_BASE_URL）が設定されている場合のみ実行
+- local:  faster-whisper がインストールされている場合のみ実行（初回のモデルロードは計測から除外）
+
+    python benchmarks/bench_backends.py [--model small] [--durations 5,15,30]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.capture import RecordedAudio
+from src.backends import OpenAIBackend, LocalWhisperBackend
+
+SAMPLE_RATE = 16000
+
+
+def make_speech_like(seconds, seed=0):
+    """音節のような振幅変調をかけた帯域ノイズ + 母音風の倍音（決定的）"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) * (np.sin(2 * np.pi * 0.25 * t) > -0.3)
+    signal = (voiced * 0.6 + rng.standard_normal(len(t)) * 0.05) * envelope * 0.2
+    samples = (signal * 32767).astype(np.int16).reshape(-1, 1)
+    return RecordedAudio([samples], SAMPLE_RATE, 1, np.int16)
+
+
+def bench(backend, durations, repeat):
+    rows = []
+    for seconds in durations:
+        audio = make_speech_like(seconds)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            backend.transcribe(audio)
+            times.append(time.perf_counter() - start)
+        best = min(times)
+        rows.append((seconds, best, best / seconds))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--durations", default="5,15,30")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    durations = [float(d) for d in args.durations.split(",")]
+
+    backends = []
+    if os.getenv("OPENAI_API_KEY"):
+        backends.append(OpenAIBackend(api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("OPENAI_BASE_URL")))
+    else:
+        print("openai: skipped (OPENAI_API_KEY is not set)")
+
+    local = LocalWhisperBackend(model_size=args.model)
+    try:
+        start = time.perf_counter()
+        local._get_model()
+        print(f"local: model '{args.model}' loaded in {time.perf_counter() - start:.1f}s (excluded)")
+        backends.append(local)
+    except Exception as e:
+        print(f"local: skipped ({e.__class__.__name__}: {e})")
+
+    print(f"{'backend':<8} {'audio s':>8} {'latency s':>10} {'s per audio s':>14}")
+    for backend in backends:
+        for seconds, latency, per_second in bench(backend, durations, args.repeat):
+            print(f"{backend.name:<8} {seconds:8.1f} {latency:10.3f} {per_second:14.3f}")
+
+
+if __name__ == "__main__":
+    main()
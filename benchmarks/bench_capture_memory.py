@@ -0,0 +1,84 @@
+"""
+録音バッファのメモリベンチマーク。
+
+従来の実装（ブロックごとに indata.copy() してリストに溜め、停止時に np.concatenate）と
+CaptureBuffer（事前確保チャンクへの直接書き込み + 停止時はビューを返すだけ）について、
+10秒 / 10分 / 1時間の録音を模擬したときのピークRSSを比較する。
+各ケースは別プロセスで実行し、RSSの最大値 (VmHWM) を計測する。Linux専用。
+"anon MB" は終了時点の匿名メモリで、メモリマップに逃がした分（OSが回収可能）は含まれない。
+
+    python benchmarks/bench_capture_memory.py
+"""
+import os
+import subprocess
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+SAMPLE_RATE = 16000
+BLOCK_SIZE = 1024
+DURATIONS = [("10s", 10), ("10min", 600), ("1h", 3600)]
+
+
+def _read_status(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def _run_case(mode, seconds, dtype):
+    import numpy as np
+    from src.capture import CaptureBuffer, RecordedAudio
+
+    block = (np.random.default_rng(0).standard_normal((BLOCK_SIZE, 1)) * 1000).astype(dtype)
+    num_blocks = int(seconds * SAMPLE_RATE / BLOCK_SIZE)
+
+    # ピークの起点をリセットしてから計測する
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    base = _read_status("VmRSS")
+    base_anon = _read_status("RssAnon")
+
+    if mode == "legacy":
+        frames = []
+        for _ in range(num_blocks):
+            frames.append(block.copy())
+        audio = RecordedAudio.from_frames(frames, SAMPLE_RATE, 1)
+    else:
+        buffer = CaptureBuffer(SAMPLE_RATE, 1, dtype=dtype)
+        for _ in range(num_blocks):
+            buffer.write(block)
+        audio = RecordedAudio(buffer.split(), SAMPLE_RATE, 1, dtype)
+
+    peak = _read_status("VmHWM") - base
+    anon = _read_status("RssAnon") - base_anon
+    print(f"{peak} {anon} {audio.data_size}")
+
+
+def main():
+    dtype = sys.argv[1] if len(sys.argv) > 1 else "float32"
+    print(f"dtype={dtype}, block={BLOCK_SIZE}, rate={SAMPLE_RATE}")
+    print(f"{'duration':>8} {'audio MB':>9} {'legacy MB':>10} {'arena MB':>9} {'ratio':>6} {'anon MB':>8}")
+    for label, seconds in DURATIONS:
+        results = {}
+        for mode in ("legacy", "arena"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--case", mode, str(seconds), dtype],
+                capture_output=True, text=True, check=True,
+            ).stdout.split()
+            results[mode] = [int(v) for v in out]
+        audio_mb = results["arena"][2] / 2**20
+        legacy_mb = results["legacy"][0] / 2**20
+        arena_mb = results["arena"][0] / 2**20
+        anon_mb = results["arena"][1] / 2**20
+        print(f"{label:>8} {audio_mb:9.1f} {legacy_mb:10.1f} {arena_mb:9.1f} "
+              f"{legacy_mb / max(arena_mb, 0.01):6.2f} {anon_mb:8.1f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--case":
+        _run_case(sys.argv[2], float(sys.argv[3]), sys.argv[4])
+    else:
+        main()
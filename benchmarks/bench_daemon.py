@@ -0,0 +1,107 @@
+"""
+口述デーモン (src.server) のベンチマーク（フェイクサーバー使用）。
+
+クライアント A が一度に大量の音声を送っている間に、クライアント B（トレイアプリと同じ DaemonBackend）が
+1件ずつ口述したときの B の待ち時間を、次の2つで比べる。
+- fair: クライアントごとの列から順番に取り出す（デーモンの既定）
+- fifo: 全員が同じクライアントIDで送る（到着順に1列で処理するのと同じ）
+あわせて、待ち件数の上限で A が 429 を返されて B は受け付けられること（バックプレッシャー）と、
+何件送っても上流への接続数が接続プールの上限に収まること（接続の共有）を確認する。
+
+    python benchmarks/bench_daemon.py [--latency 0.3] [--flood 32] [--dictations 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("APPDATA", tempfile.mkdtemp(prefix="rb10-daemon-"))
+
+from src.backends import DaemonBackend, OpenAIBackend
+from src.server import DictationServer, DictationService
+from src.transcriber import Transcriber
+from bench_backends import make_speech_like
+from fake_openai import FakeOpenAIServer
+
+
+def wav_bytes(seconds, seed):
+    with make_speech_like(seconds, seed=seed).open() as f:
+        return f.read()
+
+
+def flood(server, client_id, bodies, statuses):
+    """bodies を全て同時に送る（429 でも再送しない）"""
+    def send(body):
+        response = httpx.post(f"{server.url}/v1/transcribe", content=body, timeout=120,
+                              headers={"Authorization": f"Bearer {server.token}", "X-Client-Id": client_id})
+        statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=send, args=(body,)) for body in bodies]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def run(upstream, mode, args, per_client, total):
+    info_path = os.path.join(tempfile.mkdtemp(prefix="rb10-daemon-info-"), "server.json")
+    backend = OpenAIBackend(api_key="sk-test", base_url=upstream.base_url)
+    service = DictationService(Transcriber(backend, cache=None), workers=args.workers,
+                               max_pending_per_client=per_client, max_pending=total)
+    connections_before = upstream.connections
+    with DictationServer(service, port=0, info_path=info_path) as server:
+        flood_id, dictation_id = ("A", "B") if mode == "fair" else ("shared", "shared")
+        statuses = []
+        threads = flood(server, flood_id, [wav_bytes(3, seed=i) for i in range(args.flood)], statuses)
+        time.sleep(0.1) # A の音声が先に並ぶのを待つ
+
+        client = Transcriber(DaemonBackend(client_id=dictation_id, info_path=info_path), cache=None)
+        latencies = []
+        for i in range(args.dictations):
+            audio = make_speech_like(3, seed=100 + i)
+            start = time.perf_counter()
+            client.transcribe(audio)
+            latencies.append(time.perf_counter() - start)
+        for thread in threads:
+            thread.join()
+        health = service.health()
+    return {
+        "latencies": np.array(latencies) * 1000,
+        "accepted": statuses.count(200),
+        "rejected": statuses.count(429),
+        "connections": upstream.connections - connections_before,
+        "completed": sum(health["completed"].values()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.3, help="フェイクサーバーの応答時間（秒）")
+    parser.add_argument("--flood", type=int, default=32, help="クライアント A が同時に送る件数")
+    parser.add_argument("--dictations", type=int, default=5, help="クライアント B が1件ずつ送る件数")
+    parser.add_argument("--workers", type=int, default=OpenAIBackend.MAX_CONNECTIONS)
+    args = parser.parse_args()
+
+    print(f"Client A floods {args.flood} x 3 s, client B dictates {args.dictations} x 3 s"
+          f" (upstream {args.latency * 1000:.0f} ms, {args.workers} workers)")
+    with FakeOpenAIServer(latency=args.latency) as upstream:
+        unlimited = args.flood + args.dictations
+        for mode in ("fifo", "fair"):
+            row = run(upstream, mode, args, unlimited, unlimited)
+            latencies = row["latencies"]
+            print(f"  {mode:4s}: B p50 {np.percentile(latencies, 50):7.0f} ms, max {latencies.max():7.0f} ms"
+                  f" | {row['completed']} done over {row['connections']} upstream connections")
+
+        row = run(upstream, "fair", args, 4, 32)
+        latencies = row["latencies"]
+        print(f"  backpressure (4 per client / 32 total): A accepted {row['accepted']}, rejected {row['rejected']}"
+              f" (429); B p50 {np.percentile(latencies, 50):.0f} ms, all {len(latencies)} accepted")
+
+
+if __name__ == "__main__":
+    main()
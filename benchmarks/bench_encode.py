@@ -0,0 +1,93 @@
+"""
+サンプル形式ごとの送信サイズとエンコード時間のベンチマーク。
+
+- float32 (tempfile): 従来の実装。scipy.io.wavfile で一時ファイルに書き、読み直して送信
+- float32 (memory):   RecordedAudio からメモリ上で送信
+- int16 (memory):     既定の16bit PCMでメモリ上から送信
+
+「エンコード時間」は停止後に WAV を組み立て、送信用に全バイトを読み出すまでの時間。
+「メータリング」は1ブロック (1024サンプル) あたりのRMS計算時間。
+
+    python benchmarks/bench_encode.py [秒数]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.capture import CaptureBuffer, RecordedAudio
+
+SAMPLE_RATE = 16000
+BLOCK_SIZE = 1024
+REPEAT = 5
+
+
+def _make_blocks(seconds, dtype):
+    rng = np.random.default_rng(0)
+    signal = rng.standard_normal((int(seconds * SAMPLE_RATE), 1)) * 0.1
+    if np.dtype(dtype).kind == 'i':
+        signal = signal * 32767
+    signal = signal.astype(dtype)
+    return [signal[i:i + BLOCK_SIZE] for i in range(0, len(signal), BLOCK_SIZE)]
+
+
+def _encode_tempfile(blocks):
+    import scipy.io.wavfile as wav
+    data = np.concatenate(blocks, axis=0)
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
+    temp_file.close()
+    try:
+        wav.write(temp_file.name, SAMPLE_RATE, data)
+        with open(temp_file.name, "rb") as f:
+            return len(f.read())
+    finally:
+        os.remove(temp_file.name)
+
+
+def _encode_memory(blocks):
+    buffer = CaptureBuffer(SAMPLE_RATE, 1, dtype=blocks[0].dtype)
+    for block in blocks:
+        buffer.write(block)
+    start = time.perf_counter()
+    audio = RecordedAudio(buffer.split(), SAMPLE_RATE, 1, blocks[0].dtype)
+    size = len(audio.open().read())
+    return size, time.perf_counter() - start
+
+
+def _meter(blocks, scale):
+    start = time.perf_counter()
+    for block in blocks:
+        float(np.sqrt(np.mean(np.square(block, dtype=np.float32)))) * scale
+    return (time.perf_counter() - start) / len(blocks)
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 60.0
+    print(f"{seconds:.0f}s of audio at {SAMPLE_RATE} Hz, best of {REPEAT}")
+    print(f"{'path':<20} {'upload KB':>10} {'encode ms':>10} {'meter us/block':>15}")
+
+    float_blocks = _make_blocks(seconds, np.float32)
+    int_blocks = _make_blocks(seconds, np.int16)
+
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        size = _encode_tempfile(float_blocks)
+        times.append(time.perf_counter() - start)
+    meter = _meter(float_blocks, 1.0)
+    print(f"{'float32 (tempfile)':<20} {size / 1024:10.1f} {min(times) * 1000:10.2f} {meter * 1e6:15.2f}")
+
+    for label, blocks, scale in (("float32 (memory)", float_blocks, 1.0),
+                                 ("int16 (memory)", int_blocks, 1.0 / 32768)):
+        results = [_encode_memory(blocks) for _ in range(REPEAT)]
+        size = results[0][0]
+        best = min(t for _, t in results)
+        print(f"{label:<20} {size / 1024:10.1f} {best * 1000:10.2f} {_meter(blocks, scale) * 1e6:15.2f}")
+
+
+if __name__ == "__main__":
+    main()
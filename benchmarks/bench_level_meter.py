@@ -0,0 +1,91 @@
+"""
+録音コールバック内の音量計算のベンチマーク。
+
+旧方式（np.square で一時配列を作って RMS を求め、ブロックごとに root.after でUIへイベントを投げる）と
+新方式（事前確保した作業領域で RMS を求め、LevelMeter のスロットに置くだけ）について、
+1ブロック (1024サンプル) あたりの処理時間と確保されるメモリ、UI スレッドへ届くイベント数を比べる。
+UI の描画ループは 60fps で LevelMeter.read() を呼ぶものとする。
+
+    python benchmarks/bench_level_meter.py
+"""
+import os
+import queue
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.audio import AudioRecorder
+from src.capture import CaptureBuffer
+
+SAMPLE_RATE = 16000
+BLOCK = AudioRecorder.BLOCK_SIZE
+SECONDS = 60
+UI_FPS = 60
+
+
+def make_blocks(count, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(count * BLOCK) / SAMPLE_RATE
+    signal = np.sin(2 * np.pi * 220 * t) * (0.2 + 0.2 * np.sin(t)) + rng.normal(0, 0.01, t.size)
+    samples = (np.clip(signal, -1, 1) * 32767).astype(np.int16)
+    return [samples[i * BLOCK:(i + 1) * BLOCK].reshape(-1, 1) for i in range(count)]
+
+
+def legacy_block(indata, events):
+    """旧 _audio_callback の音量計算と start_recording の update_volume_ui"""
+    scale = AudioRecorder.LEVEL_SCALES["int16"]
+    rms = float(np.sqrt(np.mean(np.square(indata, dtype=np.float32)))) * scale
+    volume = min(1.0, rms * 5)
+    # root.after(0, lambda: overlay.update_volume(vol)) の代わり
+    events.put(lambda: volume)
+
+
+def measure(block_fn, blocks):
+    """(1ブロックあたりの処理時間, 1ブロックあたりに確保されるメモリの中央値) を返す"""
+    start = time.perf_counter()
+    for indata in blocks:
+        block_fn(indata)
+    elapsed = (time.perf_counter() - start) / len(blocks)
+
+    allocations = []
+    tracemalloc.start()
+    for indata in blocks:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        block_fn(indata)
+        _, peak = tracemalloc.get_traced_memory()
+        allocations.append(peak - base)
+    tracemalloc.stop()
+    return elapsed, float(np.median(allocations))
+
+
+def main():
+    count = SECONDS * SAMPLE_RATE // BLOCK
+    blocks = make_blocks(count)
+
+    events = queue.Queue()
+    legacy_sec, legacy_alloc = measure(lambda indata: legacy_block(indata, events), blocks)
+
+    recorder = AudioRecorder(sample_rate=SAMPLE_RATE)
+    recorder.recording = True
+    recorder.buffer = CaptureBuffer(SAMPLE_RATE, 1, dtype="int16")
+    new_sec, new_alloc = measure(lambda indata: recorder._audio_callback(indata, BLOCK, None, None), blocks)
+
+    # 旧方式と同じ音量がスロットに入っていること
+    scale = AudioRecorder.LEVEL_SCALES["int16"]
+    expected = min(1.0, float(np.sqrt(np.mean(np.square(blocks[-1], dtype=np.float32)))) * scale * 5)
+    assert abs(recorder.meter.level - expected) < 1e-6
+
+    print(f"Level metering ({count} blocks of {BLOCK} samples = {SECONDS} s, measured twice)")
+    print(f"  legacy metering:         {legacy_sec * 1e6:6.2f} us/block, {legacy_alloc:7.0f} B allocated/block,"
+          f" {events.qsize() // 2} UI events posted")
+    print(f"  new callback (+buffer):  {new_sec * 1e6:6.2f} us/block, {new_alloc:7.0f} B allocated/block,"
+          f" 0 UI events ({SECONDS * UI_FPS} slot reads by the {UI_FPS} fps draw loop)")
+
+
+if __name__ == "__main__":
+    main()
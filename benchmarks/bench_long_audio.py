@@ -0,0 +1,105 @@
+"""
+長い録音の分割・並行送信のベンチマーク（フェイクサーバー使用）。
+
+1〜30分の話し声風の音声を、分割せずに1リクエストで送った場合と、
+発話の切れ目で分割して並行して送った場合で、文字起こしが終わるまでの時間を比べる。
+フェイクサーバーは音声の長さに比例して遅れる（実際の API と同様）。
+あわせて、重ねて分割したチャンクのテキストを連結したときに重複が取り除かれることを確認する。
+
+    python benchmarks/bench_long_audio.py [--minutes 1,5,10,30] [--chunk-sec 120] [--parallelism 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("APPDATA", tempfile.mkdtemp(prefix="rb10-long-"))
+
+from src.backends import OpenAIBackend
+from src.capture import RecordedAudio
+from src.chunking import OVERLAP_SEC, merge_texts, split_at_silences
+from src.request_policy import RequestPolicy
+from src.transcriber import Transcriber
+from bench_backends import SAMPLE_RATE, make_speech_like
+from fake_openai import FakeOpenAIServer
+
+
+def long_recording(minutes):
+    """1分の話し声風の音声を繰り返して指定の長さにする（生成の時間とメモリを抑えるため）"""
+    minute = make_speech_like(60, seed=0).samples
+    return RecordedAudio([np.tile(minute, (int(minutes), 1))], SAMPLE_RATE, 1, np.int16)
+
+
+def time_transcribe(transcriber, audio):
+    start = time.perf_counter()
+    text = transcriber.transcribe_raw(audio)
+    return time.perf_counter() - start, text
+
+
+def check_merge():
+    """連続した話し声の無い音声（区切りが無音にならない）を重ねて分割し、テキストの重複が取り除かれること"""
+    rng = np.random.default_rng(0)
+    noise = (rng.standard_normal((SAMPLE_RATE * 300, 1)) * 0.1 * 32767).astype(np.int16)
+    chunks = split_at_silences(RecordedAudio([noise], SAMPLE_RATE, 1, np.int16), chunk_sec=60)
+    assert all(overlapped for _, overlapped in chunks[1:]), "cuts in noise should overlap"
+
+    # 1秒あたり8文字の文字起こし結果を、各チャンクの範囲（重なりを含む）で切り出す
+    kana = [chr(c) for c in range(ord("ぁ"), ord("ゖ"))]
+    truth = "".join(rng.choice(kana, 300 * 8))
+    overlap = int(OVERLAP_SEC * SAMPLE_RATE)
+    texts, first = [], 0
+    for chunk, overlapped in chunks:
+        if overlapped:
+            first -= overlap
+        last = first + chunk.num_frames
+        texts.append(truth[first * 8 // SAMPLE_RATE:last * 8 // SAMPLE_RATE])
+        first = last
+    merged = merge_texts(texts, [overlapped for _, overlapped in chunks])
+    naive = "".join(texts)
+    assert merged == truth, "merge mismatch"
+    print(f"Merge check: {len(chunks)} overlapping chunks, {len(naive) - len(merged)} duplicated chars removed, "
+          f"result matches the reference")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--minutes", default="1,5,10,30")
+    parser.add_argument("--chunk-sec", type=float, default=120)
+    parser.add_argument("--parallelism", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.3, help="フェイクサーバーの固定の応答時間（秒）")
+    parser.add_argument("--latency-per-audio-sec", type=float, default=0.02,
+                        help="音声1秒あたりに加わる応答時間（秒）")
+    args = parser.parse_args()
+
+    check_merge()
+    print(f"Upstream {args.latency * 1000:.0f} ms + {args.latency_per_audio_sec * 1000:.0f} ms per audio second;"
+          f" chunks <= {args.chunk_sec:.0f} s, {args.parallelism} in parallel")
+    print(f"  {'audio':>6s} {'size':>8s} {'single':>8s} {'chunked':>8s} {'chunks':>6s} {'split ms':>8s} {'speedup':>7s}")
+    print("  (single: chunk_sec unlimited, so only the upload size limit splits the audio)")
+    with FakeOpenAIServer(latency=args.latency, latency_per_audio_sec=args.latency_per_audio_sec) as server:
+        backend = OpenAIBackend(api_key="sk-test", base_url=server.base_url)
+        single = Transcriber(backend, cache=None, chunk_sec=10 ** 9)
+        chunked = Transcriber(backend, cache=None, chunk_sec=args.chunk_sec, chunk_parallelism=args.parallelism)
+        for transcriber in (single, chunked):
+            # ヘッジで送信数が変わらないようにして、分割の効果だけを比べる
+            transcriber.policy = RequestPolicy(hedging=False)
+        single.transcribe_raw(make_speech_like(1, seed=0)) # 接続を確立しておく
+        for minutes in [float(m) for m in args.minutes.split(",")]:
+            audio = long_recording(minutes)
+            start = time.perf_counter()
+            chunks = split_at_silences(audio, args.chunk_sec)
+            split_ms = (time.perf_counter() - start) * 1000
+            single_sec, _ = time_transcribe(single, audio)
+            chunked_sec, _ = time_transcribe(chunked, audio)
+            parts = len(split_at_silences(audio, 10 ** 9))
+            over = f" (single sent as {parts} by size limit)" if parts > 1 else ""
+            print(f"  {minutes:4.0f} m {audio.nbytes / 1024 / 1024:6.1f}MB {single_sec:7.2f}s {chunked_sec:7.2f}s"
+                  f" {len(chunks):6d} {split_ms:8.1f} {single_sec / chunked_sec:6.1f}x{over}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+オーバーレイ描画のベンチマーク（Tk なしで計測できる部分）。
+
+- 1フレーム分の高さ計算: 旧実装（バーごとに math.exp / math.sin）と BarAnimator（NumPy 一括）
+- 1フレームあたりの Tcl 呼び出し回数: 旧実装（全バーで coords 読み書き + itemconfig）と
+  変化したバーだけを更新する差分描画
+- FrameGovernor: 処理時間が予算を超えたときに描画レベルが下がり、戻ると上がること
+
+    python benchmarks/bench_overlay.py
+"""
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.visualizer import BarAnimator, FrameGovernor
+
+NUM_BARS = 100
+HEIGHT = 80
+FPS = 60
+SECONDS = 10
+
+
+def legacy_frame(t, volume, thinking):
+    """旧 _draw_frame の計算部分。(高さのリスト, Tcl 呼び出し回数) を返す"""
+    heights = []
+    calls = 0
+    for i in range(NUM_BARS):
+        norm_pos = i / (NUM_BARS - 1)
+        dist = abs(norm_pos - 0.5)
+        envelope = math.exp(-(dist**2) / (2 * 0.18**2))
+        if thinking:
+            delay = dist * 0.4
+            p = (t * 0.8 - delay) % 1.0
+            p1 = math.exp(-((p - 0.2)**2) / (2 * 0.05**2)) * 1.0
+            p2 = math.exp(-((p - 0.45)**2) / (2 * 0.04**2)) * 0.4
+            h = max(3, 3 + 40 * (p1 + p2) * envelope)
+        else:
+            anim_t = t * 6
+            wave = (math.sin(norm_pos * 14 + anim_t) * 0.2 +
+                    math.sin(norm_pos * 9 - anim_t * 0.5) * 0.1 + 0.7)
+            h = 3 + (HEIGHT * volume * 1.6) * envelope * wave
+            h = max(3, min(HEIGHT - 6, h))
+        heights.append(h)
+        calls += 3 # itemconfig(fill) + coords 読み出し + coords 書き込み
+    return heights, calls
+
+
+def volume_trace(frames):
+    """話している区間と無音区間が交互に来る音量の推移"""
+    rng = np.random.default_rng(0)
+    t = np.arange(frames) / FPS
+    speaking = (np.sin(t * 1.3) > -0.3).astype(float)
+    return np.clip(speaking * (0.25 + 0.2 * rng.random(frames)), 0, 1)
+
+
+def bench_compute(frames):
+    volumes = volume_trace(frames)
+    animator = BarAnimator(NUM_BARS, HEIGHT)
+    results = {}
+    for mode in ("recording", "thinking"):
+        thinking = mode == "thinking"
+
+        start = time.perf_counter()
+        legacy_calls = 0
+        for n in range(frames):
+            _, calls = legacy_frame(n / FPS, volumes[n], thinking)
+            legacy_calls += calls
+        legacy_sec = time.perf_counter() - start
+
+        start = time.perf_counter()
+        drawn_heights = np.full(NUM_BARS, 4.0)
+        drawn_glow = np.zeros(NUM_BARS, dtype=bool)
+        calls = 0
+        for n in range(frames):
+            if thinking:
+                heights, glow = animator.thinking(n / FPS)
+                calls += int(np.count_nonzero(glow != drawn_glow))
+                drawn_glow = glow
+            else:
+                heights = animator.recording(n / FPS, volumes[n])
+            changed = np.flatnonzero(heights != drawn_heights)
+            calls += len(changed)
+            drawn_heights[changed] = heights[changed]
+        vector_sec = time.perf_counter() - start
+
+        results[mode] = (legacy_sec, legacy_calls, vector_sec, calls)
+    return results
+
+
+def check_parity():
+    """丸め誤差の範囲で旧実装と同じ高さになること"""
+    animator = BarAnimator(NUM_BARS, HEIGHT)
+    for t in np.linspace(0, 5, 50):
+        for volume in (0.0, 0.3, 1.0):
+            legacy, _ = legacy_frame(t, volume, False)
+            assert np.max(np.abs(animator.recording(t, volume) - legacy)) <= BarAnimator.QUANTUM / 2 + 1e-9
+        legacy, _ = legacy_frame(t, 0, True)
+        heights, _ = animator.thinking(t)
+        assert np.max(np.abs(heights - legacy)) <= BarAnimator.QUANTUM / 2 + 1e-9
+
+
+def bench_governor():
+    """遅いフレームが続くとレベルが下がり、軽くなると戻ることを確認する"""
+    governor = FrameGovernor()
+    trace = []
+    phases = [(0.002, 60), (0.012, 120), (0.030, 120), (0.001, 240)]
+    for frame_sec, frames in phases:
+        for _ in range(frames):
+            governor.record(frame_sec)
+        trace.append((frame_sec * 1000, governor.level, governor.interval_ms, governor.stride))
+    return trace, governor
+
+
+def main():
+    frames = FPS * SECONDS
+    check_parity()
+    print(f"Overlay frame benchmark ({NUM_BARS} bars, {frames} frames)")
+    for mode, (legacy_sec, legacy_calls, vector_sec, calls) in bench_compute(frames).items():
+        print(f"  {mode:9s}  compute: legacy {legacy_sec / frames * 1e6:7.1f} us/frame"
+              f" -> numpy {vector_sec / frames * 1e6:6.1f} us/frame"
+              f" | Tcl calls: {legacy_calls / frames:5.1f} -> {calls / frames:5.1f} per frame")
+
+    trace, governor = bench_governor()
+    print("Governor (frame time -> level, interval, stride)")
+    for frame_ms, level, interval, stride in trace:
+        print(f"  {frame_ms:5.1f} ms -> level {level} ({interval} ms, every {stride} bar(s))")
+    stats = governor.stats()
+    print(f"  frame time p50 {stats['p50_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms, "
+          f"{stats['level_changes']} level changes")
+
+
+if __name__ == "__main__":
+    main()
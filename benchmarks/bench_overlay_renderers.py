@@ -0,0 +1,144 @@
+"""
+オーバーレイの描画方式のベンチマーク（ディスプレイ不要）。
+
+canvas 方式（CanvasBarRenderer）と image 方式（ImageBarRenderer と同じく FrameComposer で1枚の画像を合成）について、
+録音中・思考中それぞれの1フレームあたりの CPU 時間と Tcl の呼び出し回数を比べる。
+
+Tk のウィンドウは作らず、canvas の代わりに Tcl インタプリタへ同じ引数で呼び出しを転送する
+TclCanvas を使う。Python 側の処理と Python→Tcl の往復は実際と同じだけかかるが、
+Tk 自身の再描画（canvas のダメージ処理や画像の転送）は含まない。
+
+    python benchmarks/bench_overlay_renderers.py
+"""
+import os
+import sys
+import time
+import tkinter
+
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.ui import CanvasBarRenderer
+from src.visualizer import BarAnimator, BarRaster, FrameComposer
+from bench_overlay import FPS, volume_trace
+
+WIDTH = 320
+HEIGHT = 80
+NUM_BARS = 100
+BAR_WIDTH = 1
+BAR_SPACING = 2
+BG_COLOR = "#1a1a1a"
+SECONDS = 10
+
+
+class TclCanvas:
+    """canvas の呼び出しを何もしない Tcl の proc に転送し、回数を数える"""
+
+    def __init__(self):
+        self.tcl = tkinter.Tcl()
+        self.tcl.eval("proc canvas args {return 1}")
+        self.calls = 0
+
+    def _call(self, *args):
+        self.calls += 1
+        return self.tcl.call("canvas", *args)
+
+    def create_line(self, *coords, **options):
+        return self._call("create", "line", *coords, *self._flatten(options))
+
+    def coords(self, item, *coords):
+        return self._call("coords", item, *coords)
+
+    def itemconfig(self, item, **options):
+        return self._call("itemconfigure", item, *self._flatten(options))
+
+    def paste(self, data):
+        # PhotoImage.paste の代わり（Tk 側でのピクセルの転送は含まない）
+        return self._call("paste", len(data))
+
+    @staticmethod
+    def _flatten(options):
+        return [v for key, value in options.items() for v in ("-" + key, value)]
+
+
+def gradient(start_hex, end_hex, steps):
+    """OverlayWindow._generate_gradient と同じグラデーション"""
+    s = [int(start_hex[i:i+2], 16) for i in (1, 3, 5)]
+    e = [int(end_hex[i:i+2], 16) for i in (1, 3, 5)]
+    colors = []
+    for i in range(steps):
+        ratio = i / (steps - 1)
+        r, g, b = (int(s[k] + (e[k] - s[k]) * ratio) for k in range(3))
+        colors.append(f'#{r:02x}{g:02x}{b:02x}')
+    return colors
+
+
+def bar_positions():
+    total_width = (BAR_WIDTH * NUM_BARS) + (BAR_SPACING * (NUM_BARS - 1))
+    start_x = (WIDTH - total_width) / 2
+    return [start_x + (i * (BAR_WIDTH + BAR_SPACING)) + (BAR_WIDTH / 2) for i in range(NUM_BARS)]
+
+
+def run(draw_recording, draw_thinking, animator, frames, thinking):
+    volumes = volume_trace(frames)
+    start_cpu = time.process_time()
+    start = time.perf_counter()
+    for n in range(frames):
+        t = n / FPS
+        if thinking:
+            draw_thinking(animator.keyframe_index(t))
+        else:
+            draw_recording(animator.recording(t, volumes[n]))
+    return (time.perf_counter() - start) / frames, (time.process_time() - start_cpu) / frames
+
+
+def bench(name, frames, thinking):
+    rec_colors = gradient("#00f5d4", "#9b5de5", NUM_BARS)
+    thinking_colors = gradient("#ff0000", "#ff69b4", NUM_BARS)
+    animator = BarAnimator(NUM_BARS, HEIGHT)
+    canvas = TclCanvas()
+    bar_x = bar_positions()
+
+    if name == "canvas":
+        renderer = CanvasBarRenderer(canvas, HEIGHT, bar_x, BAR_WIDTH, animator, rec_colors, thinking_colors)
+        draw_recording, draw_thinking = renderer.draw_recording, renderer.draw_thinking
+    else:
+        composer = FrameComposer(animator, BarRaster(WIDTH, HEIGHT, bar_x, BAR_WIDTH, BG_COLOR),
+                                 rec_colors, thinking_colors)
+
+        def blit(frame):
+            # ImageBarRenderer と同じく、変化があったときだけ画像を転送する
+            if frame is not None:
+                canvas.paste(frame.tobytes())
+
+        def draw_recording(heights):
+            blit(composer.recording(heights))
+
+        def draw_thinking(index):
+            blit(composer.thinking(index))
+
+    # 思考中の1周期目はキーフレームを作るので別に計る
+    first_cycle = None
+    if thinking:
+        warm = BarAnimator.KEYFRAMES
+        first_cycle, _ = run(draw_recording, draw_thinking, animator, warm, True)
+    canvas.calls = 0
+    wall, cpu = run(draw_recording, draw_thinking, animator, frames, thinking)
+    return wall, cpu, canvas.calls / frames, first_cycle
+
+
+def main():
+    frames = FPS * SECONDS
+    print(f"Overlay renderers ({NUM_BARS} bars, {WIDTH}x{HEIGHT}, {frames} frames; Tk redraw not included)")
+    for mode in ("recording", "thinking"):
+        for name in ("canvas", "image"):
+            wall, cpu, calls, first_cycle = bench(name, frames, mode == "thinking")
+            line = (f"  {mode:9s} {name:6s}: {wall * 1e6:7.1f} us/frame (cpu {cpu * 1e6:7.1f} us),"
+                    f" {calls:5.1f} Tcl calls/frame")
+            if first_cycle is not None:
+                line += f", first cycle {first_cycle * 1e6:7.1f} us/frame"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+ポストプロセスのマイクロベンチマーク。
+
+合成した日本語の文字起こし結果（フィラー・幻覚フレーズ入り）の大きなコーパスに対して、
+従来の実装（フレーズごとに未コンパイルの re.search / re.sub を繰り返す）と
+PostProcessor（全ルールを1つの正規表現に事前コンパイルして1パスで適用）を比較する。
+ユーザー辞書の件数を変えたときの処理時間も計測する。
+
+    python benchmarks/bench_postprocess.py [文数]
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.postprocess import PostProcessor, HALLUCINATION_PHRASES, FILLERS
+
+WORDS = [
+    "今日は", "会議の", "資料を", "確認して", "明日までに", "共有します", "お客様から", "問い合わせが",
+    "ありました", "対応を", "お願いします", "進捗は", "順調です", "来週の", "予定を", "調整したい",
+    "と思います", "すみません", "少し", "遅れます", "ちゃっとじーぴーてぃー", "を使って", "まとめました",
+]
+
+
+def _legacy_post_process(text):
+    """従来の Transcriber._post_process（比較用にそのまま再現）"""
+    clean_text = re.sub(r'[。\.\,、 \? ！ ！ \n\t]', '', text)
+    if len(clean_text) <= 1:
+        return ""
+    for phrase in HALLUCINATION_PHRASES[:9] + HALLUCINATION_PHRASES[10:]:
+        if re.search(f"^{phrase}[。．？！]?$", text) or text == phrase:
+            return ""
+        text = re.sub(phrase, "", text)
+    for filler in FILLERS:
+        text = re.sub(filler, "", text)
+    text = text.strip()
+    final_clean = re.sub(r'[。\.\,、 \? ！ ！]', '', text)
+    if len(final_clean) == 0:
+        return ""
+    return text
+
+
+def make_corpus(size, seed=0):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        parts = []
+        for _ in range(rng.randint(5, 30)):
+            if rng.random() < 0.15:
+                parts.append(rng.choice(FILLERS))
+            parts.append(rng.choice(WORDS))
+            if rng.random() < 0.1:
+                parts.append("、")
+        text = "".join(parts) + "。"
+        roll = rng.random()
+        if roll < 0.03:
+            text = rng.choice(HALLUCINATION_PHRASES) + "。"
+        elif roll < 0.08:
+            text += rng.choice(HALLUCINATION_PHRASES)
+        corpus.append(text)
+    return corpus
+
+
+def _bench(func, corpus):
+    start = time.perf_counter()
+    for text in corpus:
+        func(text)
+    return time.perf_counter() - start
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    corpus = make_corpus(size)
+    chars = sum(len(t) for t in corpus)
+    print(f"corpus: {size} transcripts, {chars / 1000:.0f}k chars")
+
+    processor = PostProcessor()
+    # 「最後までご視聴ありがとうございました」は従来は「最後まで」が残っていたため、意図的に結果が異なる
+    mismatches = [t for t in corpus if _legacy_post_process(t) != processor.process(t)]
+    unexpected = [t for t in mismatches if "最後までご視聴ありがとうございました" not in t]
+    print(f"outputs differing from legacy (no dictionary): {len(mismatches)} ({len(unexpected)} unexpected)")
+
+    legacy = _bench(_legacy_post_process, corpus)
+    print(f"{'legacy (re per rule)':<32} {legacy * 1000:9.1f} ms  {size / legacy:10.0f} texts/s")
+
+    rng = random.Random(1)
+    for entries in (0, 100, 1000):
+        replacements = {"ちゃっとじーぴーてぃー": "ChatGPT"}
+        for i in range(entries):
+            key = "".join(rng.choice("あいうえおかきくけこさしすせそ") for _ in range(rng.randint(3, 8)))
+            replacements[key] = f"WORD{i}"
+        start = time.perf_counter()
+        processor = PostProcessor(replacements, {"署名": "よろしくお願いいたします。"})
+        compile_ms = (time.perf_counter() - start) * 1000
+        elapsed = _bench(processor.process, corpus)
+        label = f"compiled ({len(replacements)} dict entries)"
+        print(f"{label:<32} {elapsed * 1000:9.1f} ms  {size / elapsed:10.0f} texts/s"
+              f"  (compile {compile_ms:.1f} ms, x{legacy / elapsed:.1f})")
+
+
+if __name__ == "__main__":
+    main()
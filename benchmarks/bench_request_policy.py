@@ -0,0 +1,70 @@
+"""
+リクエスト方針（締め切り・リトライ・ヘッジ）のベンチマーク。
+
+レイテンシのテールと失敗を注入したローカルのフェイクサーバーに対して、
+- single: 1回だけ送信（従来の動作に相当。失敗すると文字起こしが失われる）
+- retry:  締め切り内でのジッター付きリトライのみ
+- hedged: リトライ + p95 を超えたらヘッジ
+の成功率とレイテンシのパーセンタイルを比較する。
+
+    python benchmarks/bench_request_policy.py [--requests 100] [--fail-rate 0.1] [--jitter 0.3]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_openai import FakeOpenAIServer
+from bench_backends import make_speech_like
+from src.backends import OpenAIBackend
+from src.request_policy import RequestPolicy, TranscriptionError
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else float("nan")
+
+
+def run(label, policy, backend, audio, count):
+    latencies, failures = [], {}
+    for _ in range(count):
+        start = time.perf_counter()
+        try:
+            policy.execute(lambda timeout: backend.transcribe(audio, timeout=timeout), audio.duration)
+            latencies.append(time.perf_counter() - start)
+        except TranscriptionError as e:
+            failures[e.kind] = failures.get(e.kind, 0) + 1
+    ok = len(latencies)
+    print(f"{label:<7} success {ok / count * 100:5.1f}%  p50 {percentile(latencies, 0.5) * 1000:7.0f} ms"
+          f"  p95 {percentile(latencies, 0.95) * 1000:7.0f} ms  p99 {percentile(latencies, 0.99) * 1000:7.0f} ms"
+          f"  failures {failures or '-'}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.15)
+    parser.add_argument("--jitter", type=float, default=0.3)
+    parser.add_argument("--fail-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    audio = make_speech_like(5)
+    print(f"fake server: latency {args.latency}s + exp(mean {args.jitter}s), "
+          f"fail rate {args.fail_rate:.0%}, {args.requests} requests each")
+    policies = [
+        ("single", RequestPolicy(hedging=False, max_attempts=1)),
+        ("retry", RequestPolicy(hedging=False)),
+        ("hedged", RequestPolicy(hedging=True)),
+    ]
+    for label, policy in policies:
+        with FakeOpenAIServer(latency=args.latency, jitter=args.jitter, fail_rate=args.fail_rate) as server:
+            backend = OpenAIBackend(api_key="sk-bench", base_url=server.base_url)
+            run(label, policy, backend, audio, args.requests)
+            print(f"        server saw {server.requests} requests ({server.failures} injected failures)")
+
+
+if __name__ == "__main__":
+    main()
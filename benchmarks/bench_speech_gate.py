@@ -0,0 +1,156 @@
+"""
+発話の有無の判定（送る・送らない）の誤り率の比較。
+
+ラベル付きの録音（発話あり / 発話なし）に対して、
+- peak: 従来の判定（1ブロックの最大音量 RMS が 0.01 以上なら送る）
+- gate: SpeechGate（デバイスごとのノイズフロアを基準に、発話フレームの割合・長さ・声の高さで判定）
+の、発話を送らなかった率 (false skip) と、発話の無い録音を送った率 (false send) を比べる。
+gate は、ノイズフロアを知らない状態 (cold) と、同じ環境の録音を何回か判定した後 (warm) の両方を測る。
+
+合成した録音のほか、--fixtures で録音済みの WAV を使える（DIR/speech/*.wav と DIR/silence/*.wav）。
+
+    python benchmarks/bench_speech_gate.py [--fixtures DIR] [--verbose]
+"""
+import argparse
+import glob
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.audio import AudioRecorder
+from src.capture import RecordedAudio
+from src.vad import SpeechGate
+from bench_backends import SAMPLE_RATE, make_speech_like
+
+PEAK_THRESHOLD = 0.01 # 従来の stop_and_transcribe の閾値
+
+
+def peak_rule(audio) -> bool:
+    """従来の判定: 録音中のブロックごとの RMS の最大値が閾値以上なら送る"""
+    block = AudioRecorder.BLOCK_SIZE
+    samples = audio.samples.astype(np.float32) / 32768
+    blocks = len(samples) // block
+    if not blocks:
+        return False
+    rms = np.sqrt(np.mean(np.square(samples[:blocks * block].reshape(blocks, -1)), axis=1))
+    return bool(rms.max() >= PEAK_THRESHOLD)
+
+
+def to_audio(signal):
+    samples = (np.clip(signal, -1, 1) * 32767).astype(np.int16).reshape(-1, 1)
+    return RecordedAudio([samples], SAMPLE_RATE, 1, np.int16)
+
+
+def speech(seconds, seed, level=1.0):
+    return make_speech_like(seconds, seed=seed).samples[:, 0].astype(np.float32) / 32767 * level
+
+
+def synthetic_fixtures(seed):
+    """(環境, ラベル, 名前, 音声) の一覧。環境ごとに背景ノイズの大きさが違う"""
+    rng = np.random.default_rng(seed)
+
+    def noise(seconds, rms):
+        return rng.standard_normal(int(seconds * SAMPLE_RATE)).astype(np.float32) * rms
+
+    def place(background, sound, at):
+        start = int(at * SAMPLE_RATE)
+        background[start:start + len(sound)] += sound[:len(background) - start]
+        return background
+
+    def clicks(seconds, rms, count):
+        signal = noise(seconds, rms)
+        for at in rng.uniform(0.1, seconds - 0.1, count):
+            click = rng.standard_normal(int(0.012 * SAMPLE_RATE)) * 0.3 * np.exp(-np.arange(int(0.012 * SAMPLE_RATE)) / 40)
+            place(signal, click.astype(np.float32), at)
+        return signal
+
+    def cough(seconds, rms):
+        # 0.35秒の減衰する広帯域ノイズ（周期性が無い）
+        length = int(0.35 * SAMPLE_RATE)
+        burst = np.convolve(rng.standard_normal(length), np.ones(4) / 4, mode='same') * 0.25
+        burst *= np.exp(-np.arange(length) / (0.12 * SAMPLE_RATE))
+        return place(noise(seconds, rms), burst.astype(np.float32), rng.uniform(0.2, seconds - 0.5))
+
+    def whisper(seconds, rms):
+        # 音節のように変調した周期性の無いノイズ
+        t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+        envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None)
+        return noise(seconds, rms) + (rng.standard_normal(len(t)) * 0.04 * envelope).astype(np.float32)
+
+    fixtures = []
+    for env, rms in (("quiet", 0.0007), ("office", 0.004), ("noisy", 0.013)):
+        fixtures += [
+            (env, False, "silence", noise(2.0, rms)),
+            (env, False, "long silence", noise(12.0, rms)),
+            (env, False, "key clicks", clicks(2.0, rms, 3)),
+            (env, False, "cough", cough(1.5, rms)),
+            (env, False, "click in long clip", clicks(20.0, rms, 1)),
+            (env, True, "sentence", noise(5.0, rms) + speech(5.0, seed)),
+            (env, True, "short reply", place(noise(1.5, rms), speech(0.5, seed), 0.5)),
+            (env, True, "soft voice", noise(3.0, rms) + speech(3.0, seed, level=0.12)),
+            (env, True, "whisper", whisper(2.5, rms)),
+        ]
+    return [(env, label, name, to_audio(signal)) for env, label, name, signal in fixtures]
+
+
+def wav_fixtures(directory):
+    fixtures = []
+    for label in ("speech", "silence"):
+        for path in sorted(glob.glob(os.path.join(directory, label, "*.wav"))):
+            fixtures.append((directory, label == "speech", os.path.basename(path), RecordedAudio.load(path)))
+    return fixtures
+
+
+def evaluate(fixtures, verbose, warm_runs=3):
+    counts = {rule: {"false_skip": 0, "false_send": 0} for rule in ("peak", "gate cold", "gate warm")}
+    speech_total = sum(1 for _, label, _, _ in fixtures if label)
+    silence_total = len(fixtures) - speech_total
+    for env, label, name, audio in fixtures:
+        # warm: 同じ環境の無音の録音を何回か判定してノイズフロアを覚えてから判定する
+        warm = SpeechGate()
+        calibration = [other for other_env, other_label, _, other in fixtures
+                       if other_env == env and not other_label and other is not audio]
+        for other in calibration[:warm_runs]:
+            warm.evaluate(other, device=env)
+        decision = warm.evaluate(audio, device=env)
+        results = {
+            "peak": peak_rule(audio),
+            "gate cold": SpeechGate().evaluate(audio, device=env)["send"],
+            "gate warm": decision["send"],
+        }
+        for rule, send in results.items():
+            if label and not send:
+                counts[rule]["false_skip"] += 1
+            elif not label and send:
+                counts[rule]["false_send"] += 1
+        if verbose:
+            marks = " ".join(f"{rule}={'send' if send else 'skip'}" for rule, send in results.items())
+            print(f"  [{env}] {name:20s} {'speech ' if label else 'silence'} {marks}  {SpeechGate.describe(decision)}")
+    print(f"  {'rule':10s} {'false skip':>14s} {'false send':>14s}")
+    for rule, row in counts.items():
+        print(f"  {rule:10s} {row['false_skip']:4d}/{speech_total:<3d} ({row['false_skip'] / max(1, speech_total) * 100:3.0f}%)"
+              f" {row['false_send']:4d}/{silence_total:<3d} ({row['false_send'] / max(1, silence_total) * 100:3.0f}%)")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixtures", help="speech/ と silence/ に WAV を置いたフォルダ")
+    parser.add_argument("--seeds", type=int, default=5, help="合成する録音のセット数")
+    parser.add_argument("--verbose", action="store_true", help="録音ごとの判定を表示する")
+    args = parser.parse_args()
+
+    if args.fixtures:
+        print(f"Recorded fixtures in {args.fixtures}")
+        evaluate(wav_fixtures(args.fixtures), args.verbose)
+        return
+    fixtures = [fixture for seed in range(args.seeds) for fixture in synthetic_fixtures(seed)]
+    print(f"Synthetic fixtures: {len(fixtures)} clips in quiet / office / noisy rooms")
+    evaluate(fixtures, args.verbose)
+
+
+if __name__ == "__main__":
+    main()
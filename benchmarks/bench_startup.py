@@ -0,0 +1,98 @@
+"""
+起動時間のベンチマーク（ディスプレイ・キーボードフック不要）。
+
+新しいプロセスで src.main を読み込み、起動の各段階をプロセス起動からの経過時間 (ms) で表示する。
+- ready:    main の読み込み + トレイアイコンの用意（トレイとホットキーが有効になるまで）
+- services: バックグラウンドで import_services() と録音・文字起こしの部品の作成が終わるまで
+あわせて python -X importtime の結果から、段階ごとにトップレベルの import の所要時間の内訳を表示する。
+1回目はアイコンのキャッシュが無い状態（初回起動）、2回目以降はキャッシュがある状態。
+
+    python benchmarks/bench_startup.py [--runs 3] [--top 8]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# 子プロセスで実行する起動手順（AudioInputApp と同じ順序。Tk とフックは作らない）
+CHILD = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+marks = {{}}
+import src.main as main
+marks["imported"] = time.time()
+main.load_tray_icon()
+marks["ready"] = time.time()
+sys.stderr.write("PHASE services\\n")
+sys.stderr.flush()
+main.import_services()
+main.AudioRecorder()
+main.Transcriber(cache=main.create_cache())
+marks["services"] = time.time()
+print(json.dumps(marks))
+"""
+
+
+def parse_importtime(stderr) -> dict:
+    """-X importtime の出力を段階ごとに分け、トップレベルの import の累積時間 (ms) を返す"""
+    phases = {"startup": {}, "services": {}}
+    phase = "startup"
+    for line in stderr.splitlines():
+        if line.startswith("PHASE "):
+            phase = line.split()[1]
+            continue
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit() or name.startswith("  "):
+            continue # 見出し行と、他の import の中から読まれたモジュール
+        phases[phase][name.strip()] = int(cumulative) / 1000
+    return phases
+
+
+def run_once(appdata) -> tuple:
+    env = dict(os.environ, APPDATA=appdata)
+    spawned = time.time()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", CHILD.format(root=ROOT)],
+                            capture_output=True, text=True, env=env, cwd=ROOT)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+    marks = json.loads(result.stdout.strip().splitlines()[-1])
+    times = {name: (at - spawned) * 1000 for name, at in marks.items()}
+    return times, parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=8, help="表示する import の数")
+    args = parser.parse_args()
+
+    appdata = tempfile.mkdtemp(prefix="rb10-startup-")
+    runs = [run_once(appdata) for _ in range(max(2, args.runs))]
+
+    print("Startup (ms since process spawn; -X importtime adds some overhead)")
+    first, _ = runs[0]
+    print(f"  first launch (icon rendered): imported {first['imported']:6.0f}, ready {first['ready']:6.0f},"
+          f" services {first['services']:6.0f}")
+    cached = [times for times, _ in runs[1:]]
+    median = {name: statistics.median(t[name] for t in cached) for name in first}
+    print(f"  later launches (icon cached): imported {median['imported']:6.0f}, ready {median['ready']:6.0f},"
+          f" services {median['services']:6.0f}  (median of {len(cached)})")
+
+    _, phases = runs[-1]
+    for phase, label in (("startup", "before ready"), ("services", "background")):
+        imports = phases[phase]
+        print(f"  imports {label}: {sum(imports.values()):.0f} ms")
+        for name, ms in sorted(imports.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"    {ms:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
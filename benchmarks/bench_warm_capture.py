@@ -0,0 +1,159 @@
+"""
+ホットキーを押してから、録音の最初のサンプルが録られた時点までの遅れのベンチマーク（模擬入力デバイス使用）。
+
+- cold: 従来の方式。長押しと確定する (0.3秒) のを待ってから入力ストリームを開く
+- warm: warm_capture。ストリームは開いたままで、キーを押した時点で録音を始め、押す前のプリロールも含める
+模擬デバイスは、開くのに --open-latency 秒かかり、ブロックを実時間で届ける。
+各サンプルの値はそのサンプルが録られた時刻なので、録音の先頭の値からキーを押した時刻を引けば遅れが分かる
+（負なら押す前から録れている。正の分だけ話し始めが欠ける）。
+あわせて、修飾キーとして使われた場合に先行して始めた録音が捨てられること、
+録音していない間のコールバックの処理時間（開いたままにするコスト）を確認する。
+
+    python benchmarks/bench_warm_capture.py [--open-latency 0.1] [--trials 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.audio import AudioRecorder
+
+SAMPLE_RATE = 16000
+HOLD_SEC = 0.3 # main の長押し判定 (_check_hold_start) までの時間
+T0 = time.perf_counter()
+
+
+class FakeInputStream:
+    """sounddevice.InputStream の代わり。各サンプルの値は録られた時刻 (T0 からの秒)"""
+    open_latency = 0.1
+
+    def __init__(self, samplerate, channels, dtype, callback, blocksize):
+        time.sleep(self.open_latency) # デバイスを開く時間
+        self.samplerate = samplerate
+        self.channels = channels
+        self.callback = callback
+        self.blocksize = blocksize
+        self.device = 0
+        self.active = False
+        self._thread = None
+
+    def start(self):
+        self.active = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        block_sec = self.blocksize / self.samplerate
+        offsets = np.arange(self.blocksize) / self.samplerate
+        captured = time.perf_counter()
+        while self.active:
+            # ブロックは全て録り終えてから届く
+            time.sleep(max(0.0, captured + block_sec - time.perf_counter()))
+            if not self.active:
+                break
+            block = (captured - T0 + offsets).astype(np.float32).reshape(-1, 1)
+            self.callback(np.repeat(block, self.channels, axis=1), self.blocksize, None, None)
+            captured += block_sec
+
+    def stop(self):
+        self.active = False
+        if self._thread:
+            self._thread.join()
+
+    def close(self):
+        pass
+
+
+def install_fake_device(open_latency):
+    FakeInputStream.open_latency = open_latency
+    module = types.ModuleType("sounddevice")
+    module.InputStream = FakeInputStream
+    module.query_devices = lambda device=None, kind=None: {"name": "Fake Microphone"}
+    sys.modules["sounddevice"] = module
+
+
+def now() -> float:
+    return time.perf_counter() - T0
+
+
+def first_sample_delay(recorder, mode, speak_sec=0.5):
+    """キーを押してから長押しで録音し、(最初のサンプルの遅れ, 録音の長さ) を返す"""
+    time.sleep(0.5) # 前の録音から間を空ける（プリロールが溜まる）
+    key_down = now()
+    if mode == "warm":
+        recorder.start()                # キーを押した時点で先行して開始
+        time.sleep(HOLD_SEC)
+        recorder.set_segment_callback(None) # 長押しと確定（録音を続ける）
+    else:
+        time.sleep(HOLD_SEC)
+        recorder.start()                # 長押しと確定してからストリームを開く
+    time.sleep(speak_sec)
+    audio = recorder.stop()
+    return (float(audio.samples[0, 0]) - key_down) * 1000, audio.duration
+
+
+def check_chord_discard(recorder):
+    """修飾キーとして使われた（長押しの確定前に他のキーが押された）ら、先行して始めた録音が捨てられること"""
+    time.sleep(0.5)
+    recorder.start()
+    time.sleep(0.1)
+    recorder.discard()
+    assert not recorder.recording and recorder.buffer is None, "speculative capture was not discarded"
+    assert recorder.stream is not None and recorder.stream.active, "warm stream should stay open"
+    time.sleep(0.4)
+    delay, _ = first_sample_delay(recorder, "warm")
+    print(f"  chord: speculative capture discarded, stream kept open; next capture starts {delay:+.0f} ms")
+
+
+def callback_cost(recording, blocks=2000):
+    """1ブロックあたりのコールバックの処理時間 (µs)"""
+    recorder = AudioRecorder(sample_format="float32")
+    recorder.warm = True
+    recorder._ring = np.zeros((int(0.3 * SAMPLE_RATE), 1), dtype=np.float32)
+    block = np.random.default_rng(0).standard_normal((AudioRecorder.BLOCK_SIZE, 1)).astype(np.float32) * 0.1
+    if recording:
+        recorder.start(open_stream=False)
+    start = time.perf_counter()
+    for _ in range(blocks):
+        recorder.feed(block)
+    elapsed = (time.perf_counter() - start) / blocks * 1e6
+    recorder.discard()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--open-latency", type=float, default=0.1, help="模擬デバイスを開くのにかかる時間（秒）")
+    parser.add_argument("--preroll", type=float, default=AudioRecorder.PREROLL_SEC)
+    parser.add_argument("--trials", type=int, default=5)
+    args = parser.parse_args()
+    install_fake_device(args.open_latency)
+
+    print(f"Key-down to first captured sample (hold {HOLD_SEC * 1000:.0f} ms, device open {args.open_latency * 1000:.0f} ms,"
+          f" pre-roll {args.preroll * 1000:.0f} ms; negative = captured before key-down)")
+    print(f"  {'mode':5s} {'p50 ms':>8s} {'max ms':>8s} {'speech lost':>12s}")
+    for mode in ("cold", "warm"):
+        recorder = AudioRecorder(sample_format="float32")
+        if mode == "warm":
+            recorder.open_warm(args.preroll)
+        delays = [first_sample_delay(recorder, mode)[0] for _ in range(args.trials)]
+        lost = max(0.0, statistics.median(delays))
+        print(f"  {mode:5s} {statistics.median(delays):+8.0f} {max(delays):+8.0f} {lost:9.0f} ms")
+        if mode == "warm":
+            check_chord_discard(recorder)
+        recorder.close()
+
+    idle, recording = callback_cost(False), callback_cost(True)
+    print(f"Callback cost per {AudioRecorder.BLOCK_SIZE}-sample block: idle (pre-roll only) {idle:.1f} µs,"
+          f" recording {recording:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+接続ウォームアップのベンチマーク。
+
+ローカルの HTTPS フェイクサーバー（自己署名証明書）に対して、停止後の文字起こしリクエストに
+かかる時間を比較する。connect_delay で新規接続ごとの DNS / TCP / TLS の往復を模擬できる。
+
+- cold:   新しいクライアントでいきなりリクエスト（ハンドシェイク込み）
+- warmed: 録音開始時の warm_up() の後、話している時間だけ待ってからリクエスト
+- reused: 直前のリクエストの接続をそのまま再利用
+
+    python benchmarks/bench_warmup.py [--connect-delay 0.1] [--repeat 10]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_openai import FakeOpenAIServer
+from bench_backends import make_speech_like
+from src.backends import OpenAIBackend
+
+
+def _timed(backend, audio):
+    start = time.perf_counter()
+    backend.transcribe(audio)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connect-delay", type=float, default=0.1)
+    parser.add_argument("--speaking", type=float, default=1.0, help="warm_up から停止までの秒数")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    audio = make_speech_like(3)
+    for connect_delay in sorted({0.0, args.connect_delay}):
+        with FakeOpenAIServer(tls=True, connect_delay=connect_delay) as server:
+            os.environ["SSL_CERT_FILE"] = server.cert_file
+            results = {"cold": [], "warmed": [], "reused": []}
+            for _ in range(args.repeat):
+                backend = OpenAIBackend(api_key="sk-bench", base_url=server.base_url)
+                results["cold"].append(_timed(backend, audio))
+                results["reused"].append(_timed(backend, audio))
+
+                backend = OpenAIBackend(api_key="sk-bench", base_url=server.base_url)
+                backend.warm_up()
+                time.sleep(args.speaking)
+                results["warmed"].append(_timed(backend, audio))
+
+            print(f"connect delay {connect_delay * 1000:.0f} ms (TLS, {server.connections} connections)")
+            cold = statistics.median(results["cold"])
+            for label, values in results.items():
+                median = statistics.median(values)
+                print(f"  {label:<7} median {median * 1000:8.2f} ms  max {max(values) * 1000:8.2f} ms"
+                      f"  saved {(cold - median) * 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
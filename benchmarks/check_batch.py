@@ -0,0 +1,71 @@
+"""
+一括文字起こし (src.batch) の確認スクリプト（フェイクサーバー使用）。
+
+- 長いファイル（分割して送られる）を含めても、同時に送るリクエスト数が --workers を超えないこと
+- --format text で、別のフォルダの同じ名前のファイルや拡張子だけが違うファイルの結果が上書きし合わないこと
+
+    python benchmarks/check_batch.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ["APPDATA"] = tempfile.mkdtemp(prefix="rb10-batch-")
+os.environ["OPENAI_API_KEY"] = "sk-test"
+
+from src import batch
+from src.chunking import split_at_silences
+from src.config import ConfigManager
+from bench_backends import make_speech_like
+from fake_openai import FakeOpenAIServer
+
+
+def write_wav(path, seconds, seed=0):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    audio = make_speech_like(seconds, seed=seed)
+    audio.save(path)
+    return audio
+
+
+def check_concurrency_cap(workers=2):
+    """長いファイルのチャンクの並行送信で、同時リクエスト数が --workers を超えないこと"""
+    root = tempfile.mkdtemp(prefix="rb10-batch-long-")
+    chunks = 0
+    for i in range(4):
+        audio = write_wav(os.path.join(root, f"long{i}.wav"), 300, seed=i)
+        chunks += len(split_at_silences(audio, ConfigManager.get_chunk_sec()))
+    output = os.path.join(root, "out.jsonl")
+    with FakeOpenAIServer(latency=0.2) as server:
+        batch.main([root, "--output", output, "--workers", str(workers), "--base-url", server.base_url, "--no-cache"])
+        peak, requests = server.peak_in_flight, server.requests
+    assert requests == chunks, f"expected {chunks} chunk requests, got {requests}"
+    assert peak <= workers, f"{peak} requests in flight with --workers {workers}"
+    print(f"  concurrency: 4 long files sent as {requests} chunks, peak {peak} in flight (--workers {workers})")
+
+
+def check_text_output_names():
+    """a/x.wav・b/x.wav・a/x.mp3 の結果が、入力のフォルダ構成を保った別々の .txt に書かれること"""
+    root = tempfile.mkdtemp(prefix="rb10-batch-names-")
+    inputs = [os.path.join(root, "a", "x.wav"), os.path.join(root, "b", "x.wav"), os.path.join(root, "a", "x.mp3")]
+    for i, path in enumerate(inputs):
+        write_wav(path, 2, seed=i) # フェイクサーバーは中身を解釈しないので .mp3 も WAV のままでよい
+    output = os.path.join(tempfile.mkdtemp(prefix="rb10-batch-text-"), "transcripts")
+    with FakeOpenAIServer(latency=0.01) as server:
+        batch.main([root, "--format", "text", "--output", output, "--base-url", server.base_url, "--no-cache"])
+    written = sorted(os.path.relpath(os.path.join(directory, name), output).replace(os.sep, "/")
+                     for directory, _, names in os.walk(output) for name in names if name.endswith(".txt"))
+    expected = ["a/x.mp3.txt", "a/x.wav.txt", "b/x.txt"]
+    assert written == expected, f"expected {expected}, got {written}"
+    print(f"  text output: {len(inputs)} inputs -> {', '.join(written)}")
+
+
+def main():
+    print("Batch transcription checks")
+    check_concurrency_cap()
+    check_text_output_names()
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
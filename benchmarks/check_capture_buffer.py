@@ -0,0 +1,83 @@
+"""
+キャプチャバッファ (CaptureBuffer) の確認スクリプト。
+
+- チャンクの確保（メモリマップに逃がす分のファイル作成を含む）が、書き込むスレッド（コールバック）ではなく
+  別スレッドで行われること
+- チャンク・メモリマップの境界をまたいでも、書き込んだ内容が欠けずに順に読み出せること
+- 別スレッドの確保が間に合わない場合も、その場で確保して書き込みを続けられること
+
+    python benchmarks/check_capture_buffer.py
+"""
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.capture import CaptureBuffer
+
+SAMPLE_RATE = 16000
+BLOCK = 1024
+
+
+class TracedBuffer(CaptureBuffer):
+    """チャンクを確保したスレッドを記録する。delay を指定すると別スレッドでの確保を遅らせる"""
+
+    def __init__(self, *args, delay=0.0, **kwargs):
+        self.allocations = []
+        self.delay = delay
+        super().__init__(*args, **kwargs)
+
+    def _allocate_chunk(self, start):
+        if self.delay and threading.current_thread().name == "capture-alloc":
+            time.sleep(self.delay)
+        chunk = super()._allocate_chunk(start)
+        self.allocations.append((threading.current_thread().name, start, isinstance(chunk, np.memmap)))
+        return chunk
+
+
+def write_counter(buffer, seconds, realtime):
+    """値が通し番号のブロックを書き込み、書き込んだフレーム数を返す（realtime なら実時間の20倍速で）"""
+    frames = int(seconds * SAMPLE_RATE)
+    block_sec = BLOCK / SAMPLE_RATE / 20
+    writer = threading.current_thread().name
+    for start in range(0, frames, BLOCK):
+        count = min(BLOCK, frames - start)
+        buffer.write(np.arange(start, start + count, dtype=np.float32).reshape(-1, 1))
+        if realtime:
+            time.sleep(block_sec)
+    return frames, writer
+
+
+def read_back(buffer):
+    return np.concatenate(buffer.split())[:, 0]
+
+
+def check(name, delay, realtime):
+    buffer = TracedBuffer(SAMPLE_RATE, 1, dtype="float32", chunk_sec=0.5, spill_after_sec=1.0, delay=delay)
+    frames, writer = write_counter(buffer, 3.2, realtime)
+    samples = read_back(buffer)
+    assert np.array_equal(samples, np.arange(frames, dtype=np.float32)), f"{name}: samples out of order or missing"
+    inline = [start for thread, start, _ in buffer.allocations[1:] if thread == writer]
+    spilled = [start for _, start, memmap in buffer.allocations if memmap]
+    assert buffer.spilled and spilled and min(spilled) >= buffer.spill_after_frames, f"{name}: spill not applied"
+    print(f"  {name}: {frames} frames in {len(buffer._chunks)} chunks ({len(spilled)} memmapped),"
+          f" {len(inline)} allocated on the writer thread")
+    return buffer, inline
+
+
+def main():
+    print("Capture buffer checks (0.5 s chunks, memmap after 1 s)")
+    buffer, inline = check("realtime", 0.0, True)
+    assert not inline and buffer.inline_allocations == 0, "chunks were allocated on the writer thread"
+    # 確保を遅らせて、間に合わなかった分をその場で確保しても内容が正しいこと
+    buffer, inline = check("slow allocator", 0.2, False)
+    assert inline and buffer.inline_allocations == len(inline)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+APIキーのキャッシュの確認スクリプト。
+
+keyring のバックエンドを呼び出し回数を数えるインメモリ実装に差し替え、
+ホットキー操作 1,000 サイクル分（ダブルタップ判定と toggle_recording が呼ぶ has_valid_key）を
+模擬して、Credential Manager へのアクセスが初回の1回だけであることを確認する。
+途中で save_api_key / reload_api_key したときにキャッシュが正しく切り替わることも確認する。
+
+    python benchmarks/check_credential_cache.py
+"""
+import os
+import sys
+import time
+
+import keyring
+from keyring.backend import KeyringBackend
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.config import ConfigManager
+
+CYCLES = 1000
+
+
+class CountingKeyring(KeyringBackend):
+    """呼び出し回数を数えるインメモリの keyring バックエンド（OSのストアの遅さを delay で模擬）"""
+    priority = 1
+
+    def __init__(self, delay=0.0):
+        super().__init__()
+        self.delay = delay
+        self.store = {}
+        self.gets = 0
+        self.sets = 0
+
+    def get_password(self, service, username):
+        self.gets += 1
+        time.sleep(self.delay)
+        return self.store.get((service, username))
+
+    def set_password(self, service, username, password):
+        self.sets += 1
+        self.store[(service, username)] = password
+
+    def delete_password(self, service, username):
+        self.store.pop((service, username), None)
+
+
+def main():
+    backend = CountingKeyring(delay=0.005)
+    backend.store[(ConfigManager.SERVICE_NAME, ConfigManager.USER_NAME)] = "sk-" + "a" * 40
+    keyring.set_keyring(backend)
+
+    start = time.perf_counter()
+    for _ in range(CYCLES):
+        # 1サイクル = ダブルタップでの開始 + toggle_recording での停止
+        assert ConfigManager.has_valid_key()
+        assert ConfigManager.has_valid_key()
+    elapsed = time.perf_counter() - start
+    print(f"{CYCLES} hotkey cycles: {backend.gets} keyring reads, {elapsed * 1e6 / (CYCLES * 2):.2f} us per check")
+    assert backend.gets == 1, f"expected 1 keyring read, got {backend.gets}"
+
+    # 保存するとキャッシュが更新され、読み直しは発生しない
+    ConfigManager.save_api_key("invalid")
+    assert not ConfigManager.has_valid_key()
+    ConfigManager.save_api_key("sk-" + "b" * 40)
+    assert ConfigManager.has_valid_key()
+    assert ConfigManager.load_api_key() == "sk-" + "b" * 40
+    assert backend.gets == 1 and backend.sets == 2
+
+    # 明示的な再読み込みでのみストアを読み直す
+    backend.store[(ConfigManager.SERVICE_NAME, ConfigManager.USER_NAME)] = "sk-" + "c" * 40
+    assert ConfigManager.load_api_key() == "sk-" + "b" * 40
+    assert ConfigManager.reload_api_key() == "sk-" + "c" * 40
+    assert backend.gets == 2
+    print("OK: keyring is read once per load, and only save_api_key / reload_api_key change the cache")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+トレイアプリ側の DaemonBackend と口述デーモン (src.server) のやり取りの確認スクリプト（フェイクサーバー使用）。
+
+- トレイで無音を削った音声は、デーモンで削り直さないこと（削っていない音声は従来どおりデーモンで削る）
+- デーモンでの処理（待ち行列を含む）がトレイ側の締め切りより長くかかっても、打ち切って再送せずに結果を受け取ること
+- トレイアプリと同じくジョブの待ち行列 (AsyncTranscriptionQueue) に投入しても、ジョブの打ち切りで結果を捨てないこと
+
+    python benchmarks/check_daemon_client.py
+"""
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("APPDATA", tempfile.mkdtemp(prefix="rb10-daemon-"))
+
+from src import server as daemon
+from src.async_jobs import AsyncTranscriptionQueue, EventLoopThread
+from src.backends import DaemonBackend, OpenAIBackend
+from src.request_policy import RequestPolicy
+from src.server import DictationServer, DictationService
+from src.transcriber import Transcriber
+from src.vad import trim_silence
+from bench_backends import make_speech_like
+from fake_openai import FakeOpenAIServer
+
+daemon_trims = []
+
+
+def counting_trim(audio, *args, **kwargs):
+    daemon_trims.append(audio.duration)
+    return trim_silence(audio, *args, **kwargs)
+
+
+def start_daemon(upstream):
+    info_path = os.path.join(tempfile.mkdtemp(prefix="rb10-daemon-info-"), "server.json")
+    backend = OpenAIBackend(api_key="sk-test", base_url=upstream.base_url)
+    service = DictationService(Transcriber(backend, cache=None), workers=1, trim=True)
+    return DictationServer(service, port=0, info_path=info_path), info_path
+
+
+def check_trim_once(upstream):
+    """トレイで削った音声はデーモンで削らず、削っていない音声だけを削る"""
+    server, info_path = start_daemon(upstream)
+    with server:
+        client = Transcriber(DaemonBackend(info_path=info_path), cache=None)
+        audio = make_speech_like(3, seed=1)
+        trimmed, _, _ = trim_silence(audio)
+        client.transcribe(trimmed)
+        assert not daemon_trims, f"daemon trimmed pre-trimmed audio again ({len(daemon_trims)} time(s))"
+        client.transcribe(make_speech_like(3, seed=2))
+        assert len(daemon_trims) == 1, f"daemon should trim untrimmed audio once, trimmed {len(daemon_trims)} time(s)"
+    print("  trim: pre-trimmed audio sent as-is (daemon trims 0), untrimmed audio trimmed once by the daemon")
+
+
+def check_no_client_deadline(upstream):
+    """デーモンの処理がトレイの締め切り (音声の長さから決まる) を超えても、再送せずに結果を受け取る"""
+    server, info_path = start_daemon(upstream)
+    with server:
+        client = Transcriber(DaemonBackend(info_path=info_path), cache=None)
+        # デーモン側の処理 (上流 1.0 秒) より短い締め切りにする
+        client.policy.BASE_DEADLINE_SEC = 0.3
+        client.policy.DEADLINE_PER_AUDIO_SEC = 0.0
+        before = upstream.requests
+        text = client.transcribe(make_speech_like(2, seed=3))
+        sent = upstream.requests - before
+    assert text and sent == 1, f"expected one upstream request and a result, got {sent} request(s), {text!r}"
+    timeout = client.backend._http.timeout
+    assert timeout.read is None and timeout.connect, f"daemon client should only time out connecting: {timeout}"
+    print(f"  deadline: daemon took longer than the tray deadline ({client.policy.deadline_for(2.0):.1f}s),"
+          f" result received with {sent} upstream request")
+
+
+def check_no_job_timeout(upstream, margin=0.2):
+    """トレイアプリの stop_and_transcribe と同じく、ポリシーの job_timeout を付けて投入したジョブが打ち切られない"""
+    server, info_path = start_daemon(upstream)
+    loop = EventLoopThread()
+    results = []
+    done = threading.Event()
+    with server:
+        client = Transcriber(DaemonBackend(info_path=info_path), cache=None)
+        client.attach_loop(loop)
+        client.policy.BASE_DEADLINE_SEC = 0.3
+        client.policy.DEADLINE_PER_AUDIO_SEC = 0.0
+        audio = make_speech_like(2, seed=4)
+        timeout = client.policy.job_timeout(audio.duration, margin)
+        jobs = AsyncTranscriptionQueue(loop, on_result=lambda text, error: (results.append((text, error)), done.set()))
+        jobs.submit(lambda: client.transcribe_async(audio), timeout=timeout)
+        done.wait(30)
+    loop.stop()
+    openai_policy = RequestPolicy(deadlines=OpenAIBackend.client_deadline)
+    assert openai_policy.job_timeout(2.0, margin) is not None, "API jobs should keep their timeout"
+    assert timeout is None, f"daemon job got a {timeout:.1f}s timeout"
+    assert results and results[0][1] is None and results[0][0], f"daemon job result was dropped: {results}"
+    print("  job timeout: none for daemon jobs; result delivered after the daemon took 1.0s")
+
+
+def main():
+    print("Daemon client checks")
+    daemon.trim_silence = counting_trim
+    with FakeOpenAIServer(latency=0.05) as upstream:
+        check_trim_once(upstream)
+    with FakeOpenAIServer(latency=1.0) as upstream:
+        check_no_client_deadline(upstream)
+        check_no_job_timeout(upstream)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
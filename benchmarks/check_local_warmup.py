@@ -0,0 +1,74 @@
+"""
+ローカルモデル (LocalWhisperBackend) の先読み (warm_up) の確認スクリプト（模擬の faster-whisper を使う）。
+
+warm_up は録音開始のたびに呼ばれるため、
+- 読み込み中に何度呼ばれても、読み込みは1回だけであること
+- 読み込みに失敗したら、その後の warm_up では読み直さず、スレッドが例外で終わらない（トレースバックを出さない）こと
+- 失敗した後の文字起こしでは改めて読み込み、失敗を呼び出し元に伝えること
+を確かめる。
+
+    python benchmarks/check_local_warmup.py
+"""
+import os
+import sys
+import threading
+import time
+import types
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.backends import LocalWhisperBackend
+
+
+class FakeWhisperModel:
+    """読み込みに 0.1 秒かかる模擬モデル。fail なら読み込みに失敗する"""
+    loads = 0
+    fail = False
+
+    def __init__(self, model_size, device, compute_type):
+        FakeWhisperModel.loads += 1
+        time.sleep(0.1)
+        if self.fail:
+            raise RuntimeError("model files are missing")
+
+
+def install_fake_faster_whisper():
+    module = types.ModuleType("faster_whisper")
+    module.WhisperModel = FakeWhisperModel
+    sys.modules["faster_whisper"] = module
+
+
+def warm_up_repeatedly(backend, times=5):
+    for _ in range(times):
+        backend.warm_up()
+        time.sleep(0.05)
+    time.sleep(0.3)
+
+
+def main():
+    print("Local model warm-up checks")
+    install_fake_faster_whisper()
+    unhandled = []
+    threading.excepthook = lambda args: unhandled.append(args.exc_value)
+
+    FakeWhisperModel.loads, FakeWhisperModel.fail = 0, False
+    warm_up_repeatedly(LocalWhisperBackend(model_size="tiny"))
+    assert FakeWhisperModel.loads == 1, f"expected one load, got {FakeWhisperModel.loads}"
+    print("  success: 5 warm-ups -> 1 load")
+
+    FakeWhisperModel.loads, FakeWhisperModel.fail = 0, True
+    backend = LocalWhisperBackend(model_size="base")
+    warm_up_repeatedly(backend)
+    assert not unhandled, f"warm-up thread died with {unhandled[0]!r}"
+    assert FakeWhisperModel.loads == 1, f"failed load retried on every warm-up ({FakeWhisperModel.loads} loads)"
+    try:
+        backend.transcribe(None)
+    except RuntimeError as e:
+        print(f"  failure: 5 warm-ups -> 1 load, logged; transcribe() retried the load and raised {e!r}")
+    else:
+        raise AssertionError("transcribe() should raise when the model cannot be loaded")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
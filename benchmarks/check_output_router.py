@@ -0,0 +1,96 @@
+"""
+出力の振り分け (OutputRouter) の確認スクリプト。
+
+- 同じ種類の出力先が複数ある場合（例: file:a.txt と file:b.txt）に、所要時間の統計が混ざらず
+  出力先ごとに別々に記録されること
+- ペースト後のクリップボードの復元が、復元の後にユーザーがコピーした内容を消さないこと
+  （模擬のクリップボードを使う）
+
+    python benchmarks/check_output_router.py
+"""
+import os
+import sys
+import tempfile
+import time
+import types
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.sinks import ClipboardPasteSink, FileSink, OutputRouter, StdoutSink
+
+DELIVERIES = 20
+
+
+class SlowFileSink(FileSink):
+    """書き込みの遅いディスクを模した FileSink"""
+
+    def deliver(self, text) -> None:
+        time.sleep(0.02)
+        super().deliver(text)
+
+
+def install_fake_clipboard():
+    """pyperclip / pyautogui の代わり。貼り付けは記録するだけ"""
+    clipboard = {"text": "", "pasted": []}
+    pyperclip = types.ModuleType("pyperclip")
+    pyperclip.copy = lambda text: clipboard.update(text=text)
+    pyperclip.paste = lambda: clipboard["text"]
+    pyautogui = types.ModuleType("pyautogui")
+    pyautogui.hotkey = lambda *keys: clipboard["pasted"].append(clipboard["text"])
+    sys.modules["pyperclip"] = pyperclip
+    sys.modules["pyautogui"] = pyautogui
+    return clipboard
+
+
+def check_clipboard_restore():
+    """元の内容 A に戻した後でユーザーが B をコピーしたら、次のペーストの後は B に戻す"""
+    clipboard = install_fake_clipboard()
+    sink = ClipboardPasteSink(restore=True)
+    sink.RESTORE_DELAY_SEC = 0.05
+    clipboard["text"] = "A"
+    sink.deliver("one")
+    time.sleep(0.2)
+    assert clipboard["text"] == "A", f"first restore: clipboard is {clipboard['text']!r}"
+    clipboard["text"] = "B" # ユーザーがコピー
+    sink.deliver("two")
+    time.sleep(0.2)
+    assert clipboard["text"] == "B", f"user's copy lost: clipboard restored to {clipboard['text']!r}"
+    # 復元の前に続けて貼り付けた場合は、最初の元の内容に戻す
+    sink.RESTORE_DELAY_SEC = 1.0
+    sink.deliver("three")
+    sink.deliver("four")
+    sink.close()
+    assert clipboard["text"] == "B", f"back-to-back pastes: clipboard restored to {clipboard['text']!r}"
+    assert clipboard["pasted"] == ["one", "two", "three", "four"], clipboard["pasted"]
+    print("  clipboard: restored to A, then to the user's later copy B, also across back-to-back pastes")
+
+
+def main():
+    print("Output router checks")
+    check_clipboard_restore()
+    directory = tempfile.mkdtemp(prefix="rb10-sinks-")
+    fast, slow = os.path.join(directory, "fast.txt"), os.path.join(directory, "slow.txt")
+    router = OutputRouter([FileSink(fast), SlowFileSink(slow), StdoutSink()])
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w", encoding="utf-8")
+    try:
+        for i in range(DELIVERIES):
+            router.deliver(f"line {i}")
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    router.close()
+
+    stats = router.stats()
+    assert list(stats) == ["file#1", "file#2", "stdout"], f"unexpected labels {list(stats)}"
+    assert all(row["n"] == DELIVERIES for row in stats.values()), {label: row["n"] for label, row in stats.items()}
+    assert stats["file#1"]["p50_ms"] < 10 <= stats["file#2"]["p50_ms"], "fast and slow file sinks were mixed"
+    for path in (fast, slow):
+        with open(path, encoding="utf-8") as f:
+            assert len(f.readlines()) == DELIVERIES
+    print(f"  {OutputRouter.format_stats(stats)}")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+セグメントパイプライン (src.pipeline) の確認スクリプト。
+
+スレッド版とイベントループ版 (loop を渡した場合) のそれぞれで、
+finish() / finish_async() がセグメントを録音順に連結して返すこと、cancel() が例外を出さないことを確かめる。
+
+    python benchmarks/check_pipeline.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.async_jobs import EventLoopThread
+from src.pipeline import SegmentPipeline
+
+
+class FakeTranscriber:
+    """セグメント（文字列）をそのまま返す。先に投入したものほど遅く終わる"""
+
+    def transcribe_raw(self, audio):
+        time.sleep(0.05 if audio == "a" else 0.0)
+        return audio
+
+    async def transcribe_raw_async(self, audio):
+        await asyncio.sleep(0.05 if audio == "a" else 0.0)
+        return audio
+
+    def _post_process(self, text):
+        return text.upper()
+
+
+def check_finish(name, make_pipeline, finish):
+    pipeline = make_pipeline()
+    pipeline.submit("a")
+    pipeline.submit("b")
+    text = finish(pipeline, "c")
+    assert text == "ABC", f"{name}: got {text!r}"
+    make_pipeline().cancel()
+    print(f"  {name}: {pipeline.segment_count} segments -> {text!r}, cancel ok")
+
+
+def main():
+    print("Segment pipeline checks")
+    transcriber = FakeTranscriber()
+    check_finish("threads finish()", lambda: SegmentPipeline(transcriber),
+                 lambda pipeline, last: pipeline.finish(last))
+    loop = EventLoopThread()
+    try:
+        check_finish("loop finish()", lambda: SegmentPipeline(transcriber, loop=loop),
+                     lambda pipeline, last: pipeline.finish(last))
+        check_finish("loop finish_async()", lambda: SegmentPipeline(transcriber, loop=loop),
+                     lambda pipeline, last: loop.submit(pipeline.finish_async(last)).result())
+    finally:
+        loop.stop()
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+プリロール（warm_capture のリングバッファ）の確認スクリプト。
+
+マイクの代わりに feed() で入力を渡し、録音の先頭に含まれるプリロールが
+直前の入力を古い順に正しく並べたものになることを確認する。
+リングが一周した後・取り出した後に一部だけ書き足した場合（書き込み位置がリングの先頭をまたぐ場合）も確かめる。
+あわせて、入力デバイスを開けなかった場合に開いたままの扱い (warm) にならず、
+録音のたびにストリームを開いて閉じる動作に戻ることを確かめる（模擬のデバイスを使う）。
+
+    python benchmarks/check_preroll.py
+"""
+import os
+import sys
+import types
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.audio import AudioRecorder
+
+BLOCK = AudioRecorder.BLOCK_SIZE
+RING_FRAMES = 3000 # BLOCK の倍数にしない（書き込みがリングの末尾をまたぐようにする）
+
+
+def make_recorder():
+    recorder = AudioRecorder(sample_format="float32")
+    recorder.warm = True
+    recorder._ring = np.zeros((RING_FRAMES, 1), dtype=np.float32)
+    return recorder
+
+
+def feed_counter(recorder, start, frames):
+    """値が通し番号のブロックを渡し、次の番号を返す"""
+    end = start + frames
+    for offset in range(start, end, BLOCK):
+        count = min(BLOCK, end - offset)
+        recorder.feed(np.arange(offset, offset + count, dtype=np.float32).reshape(-1, 1))
+    return end
+
+
+def take_preroll(recorder) -> np.ndarray:
+    """録音を始めて、先頭に入ったプリロールの値を返す（録音は捨てる）"""
+    recorder.start(open_stream=False)
+    preroll = recorder.buffer.split()
+    recorder.discard()
+    return np.concatenate(preroll)[:, 0] if preroll else np.zeros(0, dtype=np.float32)
+
+
+def check(name, preroll, expected):
+    assert np.array_equal(preroll, expected), f"{name}: got {len(preroll)} frames {preroll[:3]}..., expected {expected[:3]}..."
+    print(f"  {name}: {len(preroll)} frames, {int(expected[0]) if len(expected) else '-'}..{int(expected[-1]) if len(expected) else '-'} in order")
+
+
+class FakeInputStream:
+    """sounddevice.InputStream の代わり。fail が "open" / "start" ならその時点で失敗する"""
+    fail = None
+    opened = []
+
+    def __init__(self, samplerate, channels, dtype, callback, blocksize):
+        if self.fail == "open":
+            raise RuntimeError("device unavailable")
+        self.device = 0
+        self.active = False
+        self.closed = False
+        FakeInputStream.opened.append(self)
+
+    def start(self):
+        if self.fail == "start":
+            raise RuntimeError("device busy")
+        self.active = True
+
+    def stop(self):
+        self.active = False
+
+    def close(self):
+        self.closed = True
+
+
+def check_open_failure():
+    """open_warm が失敗したら warm にならず、録音ごとにストリームを開いて閉じる"""
+    module = types.ModuleType("sounddevice")
+    module.InputStream = FakeInputStream
+    module.query_devices = lambda device=None, kind=None: {"name": "Fake Microphone"}
+    sys.modules["sounddevice"] = module
+    for fail in ("open", "start"):
+        FakeInputStream.fail = fail
+        recorder = AudioRecorder(sample_format="float32")
+        try:
+            recorder.open_warm()
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError(f"open_warm should raise when the device fails to {fail}")
+        assert not recorder.warm and recorder._ring is None and recorder.stream is None, \
+            f"failed open ({fail}) left the recorder warm={recorder.warm}, stream={recorder.stream}"
+        assert all(stream.closed for stream in FakeInputStream.opened), "a stream that failed to start was left open"
+        # デバイスが使えるようになったら、録音のたびに開いて停止で閉じる
+        FakeInputStream.fail = None
+        recorder.start()
+        stream = recorder.stream
+        recorder.stop()
+        assert stream is not None and stream.closed and recorder.stream is None, "stream was not closed after recording"
+        print(f"  open failure ({fail}): not warm, stream opened per recording and closed on stop")
+
+
+def main():
+    print(f"Pre-roll ring of {RING_FRAMES} frames, {BLOCK}-frame blocks")
+    recorder = make_recorder()
+
+    # リングが埋まる前
+    n = feed_counter(recorder, 0, 2 * BLOCK)
+    check("partial fill", take_preroll(recorder), np.arange(0, n, dtype=np.float32))
+
+    # 一周以上書いた後（直近 RING_FRAMES フレームだけが残る）
+    n = feed_counter(recorder, n, 5 * BLOCK)
+    check("wrapped", take_preroll(recorder), np.arange(n - RING_FRAMES, n, dtype=np.float32))
+
+    # 書き込み位置をリングの末尾の手前まで進めて取り出し、先頭をまたぐように一部だけ書き足す
+    n = feed_counter(recorder, n, (RING_FRAMES - recorder._ring_pos) - BLOCK // 2)
+    take_preroll(recorder)
+    start = n
+    n = feed_counter(recorder, n, BLOCK)
+    assert recorder._ring_pos < BLOCK, "refill should cross the end of the ring"
+    check("refill across wrap", take_preroll(recorder), np.arange(start, n, dtype=np.float32))
+
+    # 録音していない時間が無ければプリロールは空
+    check("empty", take_preroll(recorder), np.zeros(0, dtype=np.float32))
+    check_open_failure()
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
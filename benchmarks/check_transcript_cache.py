@@ -0,0 +1,81 @@
+"""
+文字起こしキャッシュの確認スクリプト。
+
+フェイクサーバーに対して同じ録音を繰り返し文字起こしし、
+2回目以降はリクエストが送られないこと、整形ルール（置換辞書）を変えても
+キャッシュが使われたまま新しいルールが適用されること、
+上限サイズを超えると最後に使われたのが古いものから削除されることを確認する。
+あわせて、音声の長さごとのハッシュ計算の時間とヒット時の応答時間を表示する。
+
+    python benchmarks/check_transcript_cache.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ["APPDATA"] = tempfile.mkdtemp(prefix="rb10-cache-")
+
+from src.backends import OpenAIBackend
+from src.config import ConfigManager
+from src.transcriber import Transcriber
+from src.transcript_cache import TranscriptCache, audio_digest
+from bench_backends import make_speech_like
+from fake_openai import FakeOpenAIServer
+
+
+def main():
+    directory = tempfile.mkdtemp(prefix="rb10-cache-store-")
+    with FakeOpenAIServer(latency=0.3, text="ちゃっとじーぴーてぃーを使います。") as server:
+        backend = OpenAIBackend(api_key="sk-test", base_url=server.base_url)
+        transcriber = Transcriber(backend, cache=TranscriptCache(directory))
+        audio = make_speech_like(5, seed=1)
+
+        start = time.perf_counter()
+        first = transcriber.transcribe(audio)
+        miss_sec = time.perf_counter() - start
+        start = time.perf_counter()
+        second = transcriber.transcribe(audio)
+        hit_sec = time.perf_counter() - start
+        assert first == second and server.requests == 1
+
+        # 整形ルールを変えても生のテキストはキャッシュから読まれ、新しいルールで整形される
+        config = ConfigManager.load_config()
+        config["replacements"] = {"ちゃっとじーぴーてぃー": "ChatGPT"}
+        ConfigManager.save_config(config)
+        third = transcriber.transcribe(audio)
+        assert third.startswith("ChatGPT") and server.requests == 1
+
+        # 別の録音はキャッシュされていない
+        transcriber.transcribe(make_speech_like(5, seed=2))
+        assert server.requests == 2
+
+        # プロセスを起動し直しても使える
+        restarted = Transcriber(backend, cache=TranscriptCache(directory))
+        restarted.transcribe(audio)
+        assert server.requests == 2
+
+    print(f"5 s recording: miss {miss_sec * 1000:.1f} ms, hit {hit_sec * 1000:.1f} ms")
+    print("Cache: " + transcriber.cache.format_stats(transcriber.cache.stats()))
+
+    # LRU: 上限 3 件分で 4 件目を入れると、最後に使われたのが一番古いものが消える
+    lru = TranscriptCache(tempfile.mkdtemp(prefix="rb10-cache-lru-"), max_bytes=3 * 100)
+    for key in "abc":
+        lru.put(key, "x" * 100)
+    lru.get("a")
+    lru.put("d", "x" * 100)
+    assert lru.get("b") is None and lru.get("a") and lru.get("c") and lru.get("d")
+    assert TranscriptCache(lru.directory, max_bytes=lru.max_bytes).stats()["entries"] == 3
+    print("LRU eviction: ok")
+
+    for seconds in (5, 60, 600):
+        audio = make_speech_like(seconds, seed=0)
+        start = time.perf_counter()
+        audio_digest(audio, backend.identity())
+        print(f"hash {seconds:4d} s recording ({audio.nbytes / 1024 / 1024:5.1f} MB):"
+              f" {(time.perf_counter() - start) * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
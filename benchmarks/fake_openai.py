@@ -0,0 +1,174 @@
+"""
+ベンチマーク用の OpenAI 互換フェイクサーバー（/v1/audio/transcriptions のみ）。
+
+レイテンシ・ジッター・接続確立の遅延・失敗の注入を設定でき、
+HTTPS（自己署名証明書）にも対応する。別スクリプトから import して使う。
+
+    with FakeOpenAIServer(latency=0.2, tls=True) as server:
+        backend = OpenAIBackend(api_key="sk-test", base_url=server.base_url)
+"""
+import json
+import os
+import random
+import shutil
+import ssl
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_self_signed_cert(directory):
+    """127.0.0.1 用の自己署名証明書を openssl で作り、(cert, key) のパスを返す"""
+    if not shutil.which("openssl"):
+        raise RuntimeError("openssl command is required for TLS")
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-keyout", key, "-out", cert, "-subj", "/CN=127.0.0.1",
+         "-addext", "subjectAltName=IP:127.0.0.1"],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+def wav_duration(body: bytes) -> float:
+    """multipart 本文に含まれる WAV のヘッダから長さ（秒）を求める"""
+    start = body.find(b"RIFF")
+    if start < 0 or len(body) < start + 44:
+        return 0.0
+    (byte_rate,) = struct.unpack_from("<I", body, start + 28)
+    (data_size,) = struct.unpack_from("<I", body, start + 40)
+    return data_size / byte_rate if byte_rate else 0.0
+
+
+class FakeOpenAIServer:
+    """
+    latency:               1リクエストあたりの固定遅延（秒）
+    latency_per_audio_sec: 音声1秒あたりに追加する遅延（秒）
+    jitter:                遅延に加える指数分布の揺らぎの平均（秒）。時々大きく遅れるテールを模擬する
+    connect_delay:         新規接続ごとの遅延（DNS / TCP / TLS の往復を模擬）
+    fail_rate:             失敗させる割合 (0.0-1.0)。fail_status のHTTPエラーを返す
+    text:                  返す文字起こし結果。関数を渡すと (音声秒数) -> str で生成する
+    """
+
+    def __init__(self, latency=0.0, latency_per_audio_sec=0.0, jitter=0.0, connect_delay=0.0,
+                 fail_rate=0.0, fail_status=503, text="テストです。", tls=False, seed=0):
+        self.latency = latency
+        self.latency_per_audio_sec = latency_per_audio_sec
+        self.jitter = jitter
+        self.connect_delay = connect_delay
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.text = text
+        self.tls = tls
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self._cert_dir = None
+        self.cert_file = None
+        self.requests = 0
+        self.failures = 0
+        self.connections = 0
+        self.in_flight = 0      # 処理中のリクエスト数
+        self.peak_in_flight = 0 # 同時に処理したリクエスト数の最大
+
+    @property
+    def base_url(self) -> str:
+        scheme = "https" if self.tls else "http"
+        host, port = self._server.server_address[:2]
+        return f"{scheme}://{host}:{port}/v1"
+
+    def _draw(self):
+        """今回のリクエストの遅延と失敗有無を決める"""
+        with self._lock:
+            self.requests += 1
+            delay = self.latency
+            if self.jitter:
+                delay += self._random.expovariate(1.0 / self.jitter)
+            fail = self._random.random() < self.fail_rate
+            if fail:
+                self.failures += 1
+            return delay, fail
+
+    def start(self) -> str:
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                with owner._lock:
+                    owner.connections += 1
+                if owner.connect_delay:
+                    time.sleep(owner.connect_delay)
+                if owner.tls:
+                    self.request.do_handshake()
+                super().setup()
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                duration = wav_duration(body)
+                delay, fail = owner._draw()
+                with owner._lock:
+                    owner.in_flight += 1
+                    owner.peak_in_flight = max(owner.peak_in_flight, owner.in_flight)
+                try:
+                    time.sleep(delay + duration * owner.latency_per_audio_sec)
+                finally:
+                    with owner._lock:
+                        owner.in_flight -= 1
+                if fail:
+                    self._send_json(owner.fail_status, {"error": {"message": "injected failure", "type": "server_error"}})
+                    return
+                text = owner.text(duration) if callable(owner.text) else owner.text
+                self._send_json(200, {"text": text})
+
+            def _send_json(self, status, payload):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        if self.tls:
+            self._cert_dir = tempfile.mkdtemp()
+            self.cert_file, key_file = make_self_signed_cert(self._cert_dir)
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(self.cert_file, key_file)
+            # ハンドシェイクは接続ごとのスレッドで行う（accept ループを止めない）
+            self._server.socket = context.wrap_socket(
+                self._server.socket, server_side=True, do_handshake_on_connect=False)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        if self._cert_dir:
+            shutil.rmtree(self._cert_dir, ignore_errors=True)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
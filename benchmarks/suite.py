@@ -0,0 +1,423 @@
+"""
+文字起こしパイプライン全体のベンチマークスイート（ディスプレイ・マイク・APIキー不要）。
+
+決定的に生成した音声（話し声風 / 無音）を AudioRecorder にブロック単位で流し込み、
+停止後はアプリと同じ流れ（無音除去 → Transcriber → ポストプロセス）をイベントループ上で処理する。
+Transcriber はローカルのフェイク OpenAI サーバー（レイテンシ設定可）に接続する。
+
+結果はアプリと同じ出力の仕組み (OutputRouter) でローカルソケットの受信側に送る。
+シナリオごとに、キーを離してからテキストが受信側に届くまでのレイテンシ (p50/p95/p99)、
+スループット、ピークメモリ（tracemalloc で計測した Python / NumPy の確保量）を出力する。
+
+    python benchmarks/suite.py                      # 実行して結果を表示
+    python benchmarks/suite.py --save-baseline      # 結果を benchmarks/baseline.json に保存
+    python benchmarks/suite.py --compare            # baseline.json と比較し、劣化があれば終了コード 1
+    python benchmarks/suite.py --quick --json out.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import queue
+import socket
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# ユーザーの設定（辞書など）の影響を受けないよう、一時フォルダの設定で動かす
+os.environ["APPDATA"] = tempfile.mkdtemp(prefix="rb10-bench-")
+
+from src.async_jobs import AsyncTranscriptionQueue, EventLoopThread
+from src.audio import AudioRecorder
+from src.backends import OpenAIBackend
+from src.pipeline import SegmentPipeline
+from src.sinks import FileSink, OutputRouter, SocketSink, StdoutSink
+from src.transcriber import Transcriber
+from src.vad import trim_silence
+from bench_backends import SAMPLE_RATE, make_speech_like
+from bench_postprocess import make_corpus
+from fake_openai import FakeOpenAIServer
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+BLOCK = AudioRecorder.BLOCK_SIZE
+
+# 比較時に「大きいほど良い」指標。それ以外は小さいほど良い
+HIGHER_IS_BETTER = {"throughput"}
+# レイテンシなどのごく小さい値は揺らぎが相対的に大きいため、この差(ms / MB)以下は劣化とみなさない
+ABSOLUTE_SLACK = {"ms": 5.0, "mb": 0.5}
+# 出力先 (sink_*) はマイクロ秒単位の処理で実行ごとの揺らぎが大きいため、ベースラインと相対比較せず、
+# 1件の出力の p95 がこの時間 (ms) 以下に収まっているかだけを見る
+SINK_P95_BOUND_MS = 1.0
+
+
+def make_silence(seconds, seed=0):
+    """ホワイトノイズ程度の無音（録音停止後にスキップされる入力）"""
+    rng = np.random.default_rng(seed)
+    samples = (rng.standard_normal(int(seconds * SAMPLE_RATE)) * 0.001 * 32767).astype(np.int16)
+    return samples.reshape(-1, 1)
+
+
+def speech_samples(seconds, seed):
+    return make_speech_like(seconds, seed=seed).samples
+
+
+def fake_text(duration):
+    """音声の長さに応じた、フィラーや幻覚フレーズを含む文字起こし結果（ポストプロセスの負荷用）"""
+    corpus = make_corpus(max(1, int(duration / 5)), seed=int(duration * 10))
+    return "".join(corpus)
+
+
+def prepare(audio):
+    """AudioInputApp._prepare_audio と同じ前処理"""
+    trimmed, _, _ = trim_silence(audio)
+    return trimmed
+
+
+def percentile(values, p):
+    return float(np.percentile(values, p)) if values else 0.0
+
+
+class SinkListener:
+    """SocketSink の受信側。届いた行を (受信時刻, テキスト) としてキューに入れる"""
+
+    def __init__(self):
+        self._server = socket.create_server(("127.0.0.1", 0))
+        self.port = self._server.getsockname()[1]
+        self.received = queue.Queue()
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._read, args=(conn,), daemon=True).start()
+
+    def _read(self, conn):
+        with conn, conn.makefile("r", encoding="utf-8") as lines:
+            for line in lines:
+                self.received.put((time.perf_counter(), json.loads(line)["text"]))
+
+    def close(self):
+        self._server.close()
+
+
+class Dictation:
+    """
+    アプリの録音 → 停止 → 文字起こし → 出力の流れを、マイクの代わりに音声配列で再現する。
+    出力はソケットに送り、受信側に届くまでを計る。
+    """
+
+    def __init__(self, transcriber, loop, speed, listener):
+        self.transcriber = transcriber
+        self.loop = loop
+        self.speed = speed # 実時間の何倍の速さでブロックを流し込むか
+        self.listener = listener
+        self.output = OutputRouter([SocketSink("127.0.0.1", listener.port)])
+
+    def record(self, samples, pipelined):
+        recorder = AudioRecorder(sample_rate=SAMPLE_RATE)
+        pipeline = SegmentPipeline(self.transcriber, preprocess=prepare, loop=self.loop) if pipelined else None
+        recorder.start(segment_callback=pipeline.submit if pipeline else None, open_stream=False)
+        block_sec = BLOCK / SAMPLE_RATE / self.speed
+        next_at = time.perf_counter()
+        for start in range(0, len(samples), BLOCK):
+            recorder.feed(samples[start:start + BLOCK])
+            next_at += block_sec
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return recorder, pipeline
+
+    def finish(self, recorder, pipeline):
+        """キーを離した後の処理。テキスト（無音でスキップした場合は None）を返す"""
+        audio = recorder.stop()
+        if recorder.max_volume < 0.01 or (audio is None and not pipeline):
+            if pipeline:
+                pipeline.cancel()
+            return None
+        return self.loop.submit(self._transcribe(audio, pipeline)).result()
+
+    async def _transcribe(self, audio, pipeline):
+        if pipeline:
+            return await pipeline.finish_async(audio)
+        return await self.transcriber.transcribe_async(prepare(audio))
+
+    def run(self, samples, pipelined):
+        """(キーを離してから受信側に届くまでの秒, テキスト) を返す"""
+        recorder, pipeline = self.record(samples, pipelined)
+        key_up = time.perf_counter()
+        text = self.finish(recorder, pipeline)
+        if not text:
+            return time.perf_counter() - key_up, text
+        self.output.deliver(text)
+        received_at, received = self.listener.received.get(timeout=5)
+        assert received == text
+        return received_at - key_up, text
+
+
+def measure_peak(fn):
+    """fn を1回実行したときの確保メモリのピーク (MB)"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (peak - base) / (1024 * 1024)
+
+
+def scenario_dictations(dictation, name, seconds, count, pipelined):
+    fixtures = [speech_samples(seconds, seed) for seed in range(count)]
+    latencies = []
+    start = time.perf_counter()
+    for samples in fixtures:
+        latency, text = dictation.run(samples, pipelined)
+        assert text, f"{name}: empty transcription"
+        latencies.append(latency)
+    elapsed = time.perf_counter() - start
+    peak = measure_peak(lambda: dictation.run(fixtures[0], pipelined))
+    return {
+        "n": count,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        # 録音（の流し込み）を含めた、音声1秒あたりの処理能力 (audio sec / wall sec)
+        "throughput": seconds * count / elapsed,
+        "peak_mb": peak,
+    }
+
+
+def scenario_silence(dictation, seconds, count):
+    fixtures = [make_silence(seconds, seed) for seed in range(count)]
+    latencies = []
+    start = time.perf_counter()
+    for samples in fixtures:
+        latency, text = dictation.run(samples, pipelined=True)
+        assert text is None, "silence: should be skipped"
+        latencies.append(latency)
+    elapsed = time.perf_counter() - start
+    peak = measure_peak(lambda: dictation.run(fixtures[0], pipelined=True))
+    return {
+        "n": count,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "throughput": seconds * count / elapsed,
+        "peak_mb": peak,
+    }
+
+
+def scenario_queue(transcriber, loop, seconds, count, workers):
+    """録音済みの口述をまとめてジョブキューに投入し、投入順に受け取るまで"""
+    recorded = []
+    for seed in range(count):
+        recorder = AudioRecorder(sample_rate=SAMPLE_RATE)
+        recorder.start(open_stream=False)
+        recorder.feed(speech_samples(seconds, seed))
+        recorded.append(recorder.stop())
+
+    done = []
+    queue = AsyncTranscriptionQueue(loop, max_jobs=workers,
+                                    on_result=lambda text, error: done.append(time.perf_counter()))
+    start = time.perf_counter()
+    for audio in recorded:
+        queue.submit(lambda audio=audio: transcriber.transcribe_async(prepare(audio)))
+    while len(done) < count:
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    queue.shutdown()
+    latencies = [t - start for t in done]
+    return {
+        "n": count,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "throughput": count / elapsed, # dictations / sec
+    }
+
+
+def scenario_postprocess(transcriber, size):
+    corpus = make_corpus(size, seed=1)
+    transcriber._post_process("") # 辞書のコンパイルを計測から除く
+    latencies = []
+    start = time.perf_counter()
+    for text in corpus:
+        t0 = time.perf_counter()
+        transcriber._post_process(text)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    peak = measure_peak(lambda: [transcriber._post_process(text) for text in corpus[:1000]])
+    return {
+        "n": size,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "throughput": size / elapsed, # texts / sec
+        "peak_mb": peak,
+    }
+
+
+def scenario_sinks(count):
+    """ヘッドレスの出力先ごとに、1件の出力にかかる時間（OutputRouter の計測値）"""
+    listener = SinkListener()
+    directory = tempfile.mkdtemp(prefix="rb10-sinks-")
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        sinks = [FileSink(os.path.join(directory, "out.txt")), StdoutSink(devnull),
+                 SocketSink("127.0.0.1", listener.port)]
+        router = OutputRouter(sinks)
+        for text in make_corpus(count, seed=2):
+            router.deliver(text)
+        router.close()
+    listener.close()
+    results = {}
+    for name, row in router.stats().items():
+        results[f"sink_{name}"] = {"n": row["n"], "p50_ms": row["p50_ms"], "p95_ms": row["p95_ms"],
+                                   "p99_ms": row["p99_ms"],
+                                   "throughput": 1000 / row["mean_ms"]} # texts / sec (その出力先だけの時間で)
+    return results
+
+
+def run_suite(args):
+    server_options = dict(latency=args.latency, latency_per_audio_sec=args.latency_per_audio_sec,
+                          jitter=args.jitter, text=fake_text, seed=0)
+    count = 5 if args.quick else 20
+    results = {}
+    listener = SinkListener()
+    with FakeOpenAIServer(**server_options) as server:
+        loop = EventLoopThread()
+        transcriber = Transcriber(OpenAIBackend(api_key="sk-bench", base_url=server.base_url))
+        transcriber.attach_loop(loop.loop)
+        dictation = Dictation(transcriber, loop, args.speed, listener)
+        dictation.run(speech_samples(1, 99), pipelined=False) # 接続確立・初回の import を除く
+
+        print("Running short dictations...", file=sys.stderr)
+        results["short_5s"] = scenario_dictations(dictation, "short_5s", 5, count, pipelined=False)
+        print("Running long pipelined dictations...", file=sys.stderr)
+        results["long_60s_pipelined"] = scenario_dictations(
+            dictation, "long_60s_pipelined", 60, max(3, count // 4), pipelined=True)
+        print("Running silence...", file=sys.stderr)
+        results["silence_5s"] = scenario_silence(dictation, 5, count)
+        print("Running queue throughput...", file=sys.stderr)
+        results["queue_3s_x20"] = scenario_queue(transcriber, loop, 3, 20, workers=2)
+        print("Running post-processing...", file=sys.stderr)
+        results["postprocess"] = scenario_postprocess(transcriber, 2000 if args.quick else 10000)
+        print("Running output sinks...", file=sys.stderr)
+        results.update(scenario_sinks(200 if args.quick else 1000))
+    dictation.output.close()
+    listener.close()
+    loop.stop()
+
+    return {
+        "config": {
+            "latency": args.latency,
+            "latency_per_audio_sec": args.latency_per_audio_sec,
+            "jitter": args.jitter,
+            "speed": args.speed,
+            "quick": args.quick,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def _ms(value) -> str:
+    return f"{value:>10.1f}" if value >= 10 else f"{value:>10.3f}"
+
+
+def format_results(report) -> str:
+    lines = [f"{'scenario':<22}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'throughput':>13}{'peak MB':>10}"]
+    for name, row in report["results"].items():
+        peak = f"{row['peak_mb']:>10.2f}" if "peak_mb" in row else f"{'-':>10}"
+        lines.append(f"{name:<22}{row['n']:>5}{_ms(row['p50_ms'])}{_ms(row['p95_ms'])}"
+                     f"{_ms(row['p99_ms'])}{row['throughput']:>13.2f}{peak}")
+    lines.append("throughput: audio sec/s (dictations), dictations/s (queue), texts/s (postprocess, sinks)")
+    return "\n".join(lines)
+
+
+def compare(report, baseline, tolerance) -> list:
+    """baseline より tolerance (割合) を超えて悪化した指標を返す（出力先は SINK_P95_BOUND_MS と比べる）"""
+    regressions = []
+    if report["config"] != baseline.get("config"):
+        print(f"Warning: config differs from baseline ({baseline.get('config')})", file=sys.stderr)
+    for name, row in report["results"].items():
+        if name.startswith("sink_"):
+            value = row["p95_ms"]
+            worse = value > SINK_P95_BOUND_MS
+            status = "REGRESSION" if worse else "ok"
+            print(f"  {name:<22}{'p95_ms':<12}{'bound':>10} <= {SINK_P95_BOUND_MS:>10.2f} ({value:>7.3f}) {status}")
+            if worse:
+                regressions.append((name, "p95_ms", SINK_P95_BOUND_MS, value))
+            continue
+        base_row = baseline.get("results", {}).get(name)
+        if not base_row:
+            continue
+        for metric, value in row.items():
+            base = base_row.get(metric)
+            if base is None or metric == "n":
+                continue
+            unit = metric.rsplit("_", 1)[-1]
+            slack = ABSOLUTE_SLACK.get(unit, 0.0)
+            if metric in HIGHER_IS_BETTER:
+                worse = value < base * (1 - tolerance)
+            else:
+                worse = value > base * (1 + tolerance) + slack
+            change = (value - base) / base * 100 if base else 0.0
+            status = "REGRESSION" if worse else "ok"
+            print(f"  {name:<22}{metric:<12}{base:>10.2f} -> {value:>10.2f} ({change:+6.1f}%) {status}")
+            if worse:
+                regressions.append((name, metric, base, value))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.15, help="フェイクサーバーの固定レイテンシ（秒）")
+    parser.add_argument("--latency-per-audio-sec", type=float, default=0.01, help="音声1秒あたりの追加レイテンシ（秒）")
+    parser.add_argument("--jitter", type=float, default=0.02, help="レイテンシの揺らぎの平均（秒）")
+    parser.add_argument("--speed", type=float, default=20.0, help="録音を実時間の何倍で流し込むか")
+    parser.add_argument("--quick", action="store_true", help="件数を減らして短時間で実行する")
+    parser.add_argument("--json", help="結果をJSONで保存するパス")
+    parser.add_argument("--save-baseline", action="store_true", help=f"結果を {BASELINE_PATH} に保存する")
+    parser.add_argument("--compare", nargs="?", const=BASELINE_PATH, help="ベースラインと比較する（既定: baseline.json）")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="劣化とみなす割合（既定 25%%）")
+    args = parser.parse_args()
+
+    # アプリ側のログ出力は結果の表と混ざらないよう stderr に出す
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run_suite(args)
+    print(format_results(report))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved: {BASELINE_PATH}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.compare} (tolerance {args.tolerance * 100:.0f}%):")
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) found")
+            return 1
+        print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
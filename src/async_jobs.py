@@ -0,0 +1,143 @@
+"""
+録音停止後の処理（送信前の加工・アップロード・整形・出力）を実行する asyncio のコア。
+
+処理は1本の専用スレッドで動くイベントループ上のタスクとして実行するため、
+処理中の口述がいくつあってもスレッドは増えず、口述ごとにキャンセル・タイムアウトできる。
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from src import tracing
+from src.request_policy import TranscriptionError
+
+
+class EventLoopThread:
+    """専用スレッドでイベントループを動かし、他のスレッドからコルーチンを投入する"""
+
+    def __init__(self, name="asyncio"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, coro) -> Future:
+        """
+        coro をループで実行し、結果を受け取る Future を返す。
+        呼び出し元のコンテキスト（トレース）を引き継ぎ、Future をキャンセルするとタスクもキャンセルされる。
+        """
+        context = contextvars.copy_context()
+
+        async def run():
+            return await asyncio.get_running_loop().create_task(coro, context=context)
+
+        return asyncio.run_coroutine_threadsafe(run(), self.loop)
+
+    def stop(self) -> None:
+        """残っているタスクをキャンセルし、後始末を終えてからループを止める"""
+        async def shutdown():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.loop.stop()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self.loop)
+        self._thread.join(timeout=1.0)
+
+
+class AsyncTranscriptionQueue:
+    """
+    TranscriptionQueue のイベントループ版。ジョブ（コルーチン）を max_jobs 件まで並行して実行し、
+    結果は完了順ではなく投入順に on_result へ届ける。
+    on_result は出力（ペーストなど）でブロックするため、ループではなく受け渡し用の1本のスレッドで順に呼ぶ。
+    """
+
+    def __init__(self, loop_thread, max_jobs=2, on_result=None, on_depth_changed=None):
+        self.loop_thread = loop_thread
+        self.on_result = on_result               # (text: str, error: Exception | None) -> None
+        self.on_depth_changed = on_depth_changed # (depth: int) -> None
+        self._semaphore = asyncio.Semaphore(max_jobs)
+        self._delivery = ThreadPoolExecutor(max_workers=1, thread_name_prefix="deliver")
+        self._lock = threading.Lock()
+        self._next_seq = 0
+        self._deliver_seq = 0
+        self._last_delivered = None              # 直前に投入したジョブの結果を届け終えたら完了する Future
+        self._running = {}                       # seq -> 実行中のジョブ本体のタスク（ループのスレッドからのみ触る）
+
+    @property
+    def depth(self) -> int:
+        """投入済みで、まだ結果を届けていないジョブの数"""
+        with self._lock:
+            return self._next_seq - self._deliver_seq
+
+    def submit(self, work, timeout=None) -> int:
+        """
+        work() -> コルーチン をジョブとして投入し、投入順の番号を返す。
+        timeout 秒以内に終わらなければ kind="timeout" の TranscriptionError として届ける。
+        """
+        delivered = Future()
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            previous, self._last_delivered = self._last_delivered, delivered
+        self._notify_depth()
+        self.loop_thread.submit(self._run(seq, work, timeout, time.perf_counter(), previous, delivered))
+        return seq
+
+    async def _run(self, seq, work, timeout, submitted, previous, delivered):
+        task = asyncio.ensure_future(self._execute(work, timeout, submitted))
+        self._running[seq] = task
+        try:
+            result = (await task, None)
+        except asyncio.CancelledError:
+            result = ("", TranscriptionError("Transcription cancelled", kind="cancelled"))
+        except Exception as e:
+            result = ("", e)
+        finally:
+            del self._running[seq]
+
+        try:
+            # 前のジョブの結果を届け終えてから届ける（投入順を保つ）
+            if previous is not None:
+                await asyncio.wrap_future(previous)
+            context = contextvars.copy_context()
+            await asyncio.get_running_loop().run_in_executor(self._delivery, context.run, self._deliver, *result)
+        finally:
+            with self._lock:
+                self._deliver_seq += 1
+            delivered.set_result(None)
+            self._notify_depth()
+
+    async def _execute(self, work, timeout, submitted):
+        async with self._semaphore:
+            trace = tracing.current()
+            if trace is not None:
+                trace.add_span("queue", submitted, time.perf_counter())
+            try:
+                return await asyncio.wait_for(work(), timeout)
+            except asyncio.TimeoutError:
+                raise TranscriptionError(f"Transcription timed out after {timeout:.1f}s", kind="timeout")
+
+    def _deliver(self, text, error):
+        try:
+            if self.on_result:
+                self.on_result(text, error)
+        except Exception as e:
+            print(f"Job Result Error: {e}")
+
+    def cancel_all(self) -> None:
+        """待ち・実行中のジョブを全てキャンセルする（結果は kind="cancelled" のエラーとして届く）"""
+        def cancel():
+            for task in list(self._running.values()):
+                task.cancel()
+        self.loop_thread.loop.call_soon_threadsafe(cancel)
+
+    def _notify_depth(self):
+        if self.on_depth_changed:
+            self.on_depth_changed(self.depth)
+
+    def shutdown(self):
+        self.cancel_all()
+        self._delivery.shutdown(wait=False, cancel_futures=True)
@@ -1,82 +1,356 @@
-import sounddevice as sd
 import numpy as np
-import scipy.io.wavfile as wav
 import tempfile
 import threading
 import queue
 import os
+import math
+
+from src.capture import CaptureBuffer, RecordedAudio
+
+
+class LevelMeter:
+    """
+    オーディオスレッドが書き込み、UIスレッドが描画フレームごとに1回読む音量のスロット。
+    ブロックごとにUIへイベントを投げる代わりに値を上書きしていき、
+    読む側は前回読んでから届いた中の最大値を受け取る（短い音の立ち上がりを取りこぼさない）。
+    値の読み書きは float の代入だけなのでロックは使わない。
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.level = 0.0     # 最新の音量 (0.0-1.0)
+        self._peak = 0.0     # 前回 read() してからの最大値
+        self._pending = False
+        self.updates = 0     # publish された回数（オーディオのブロック数）
+
+    def publish(self, level):
+        """オーディオスレッドから呼ばれる"""
+        self._peak = level if not self._pending or level > self._peak else self._peak
+        self._pending = True
+        self.level = level
+        self.updates += 1
+
+    def read(self) -> float:
+        """UIスレッドから呼ばれる。新しい値が無ければ最新値をそのまま返す"""
+        if not self._pending:
+            return self.level
+        self._pending = False
+        return self._peak
+
 
 class AudioRecorder:
-    def __init__(self, sample_rate=16000, channels=1):
+    # セグメント分割（パイプライン文字起こし）用のパラメータ
+    SEGMENT_MIN_SEC = 8.0      # これより短いセグメントは切らない
+    SEGMENT_PAUSE_SEC = 0.5    # この長さの無音が続いたら区切りとみなす
+    SEGMENT_SILENCE_RMS = 0.01 # 無音判定の閾値 (speech_gate を使わない場合のスキップ判定と同じ)
+
+    # サンプル形式ごとの、RMSを 0.0-1.0 のフルスケールに換算する係数
+    LEVEL_SCALES = {"int16": 1.0 / 32768, "float32": 1.0}
+    BLOCK_SIZE = 1024
+    PREROLL_SEC = 0.3 # ストリームを開いたままにする場合に、録音の開始前から残しておく長さ
+
+    def __init__(self, sample_rate=16000, channels=1, sample_format="int16", save_to_file=False):
+        if sample_format not in self.LEVEL_SCALES:
+            raise ValueError(f"Unsupported sample format: {sample_format}")
         self.sample_rate = sample_rate
         self.channels = channels
+        self.sample_format = sample_format # Whisperには16bit PCMで十分（float32の半分のサイズ）
+        self._level_scale = self.LEVEL_SCALES[sample_format]
+        self.save_to_file = save_to_file # デバッグ用: 録音を一時WAVファイルにも残す
         self.recording = False
-        self.frames = []
+        self.buffer = None # CaptureBuffer
         self.stream = None
-        self.volume_callback = None # (volume: float) -> None
+        self.warm = False # ストリームを開いたままにしているか (open_warm)
+        # 録音していない間の直近の入力（プリロール）。warm のときだけ確保する
+        self._ring = None
+        self._ring_pos = 0
+        self._ring_filled = 0
+        # 録音の開始・停止とオーディオスレッドの書き込み先の切り替えを揃える
+        self._lock = threading.Lock()
+        self.meter = LevelMeter() # 表示用の音量。オーバーレイが描画フレームごとに読む
+        self.segment_callback = None # (audio: RecordedAudio | str) -> None
+        self.device_name = None # 録音に使った入力デバイスの名前（ノイズフロアをデバイスごとに覚えるため）
         self.max_volume = 0.0 # 録音中の最大音量を追跡
+        # コールバックが間に合わず入力が欠けた回数（PortAudio の input overflow）
+        self.overruns = 0
+        self.last_status = None
+
+        # 音量計算用の作業領域（コールバック内でメモリを確保しないよう事前に用意する）
+        self._level_scratch = np.zeros((self.BLOCK_SIZE, channels), dtype=np.float32)
+        self._level_flat = self._level_scratch.reshape(-1)
+
+        self._segment_queue = None
+        self._segment_thread = None
+        self._segment_samples = 0
+        self._segment_voiced = False
+        self._silent_samples = 0
 
-    def start(self, volume_callback=None):
-        """録音を開始する"""
+    def open_warm(self, preroll_sec=None):
+        """
+        入力ストリームを開いたままにする（録音開始時にデバイスを開く待ち時間をなくす）。
+        録音していない間は直近 preroll_sec 秒の入力だけをリングバッファに上書きしていき、
+        start() ではストリームを開き直さず、その分を録音の先頭に含める（話し始めの欠けを防ぐ）。
+        """
+        preroll_sec = self.PREROLL_SEC if preroll_sec is None else preroll_sec
+        dtype = np.dtype(self.sample_format)
+        # 開けなかった場合は例外を送出し、開いたままにしない（録音のたびに開く）
+        if self.stream is None:
+            self._open_stream()
+        with self._lock:
+            self._ring = np.zeros((max(1, int(preroll_sec * self.sample_rate)), self.channels), dtype=dtype)
+            self._ring_pos = 0
+            self._ring_filled = 0
+            self.warm = True
+
+    def close(self):
+        """開いたままのストリームを閉じる（録音中なら録音も止める）"""
+        self.warm = False
         if self.recording:
-            return
-        
-        self.recording = True
-        self.frames = []
-        self.max_volume = 0.0 # リセット
-        self.volume_callback = volume_callback
-        
-        # ストリームの開始
-        self.stream = sd.InputStream(
+            self.discard()
+        self._close_stream()
+        self._ring = None
+
+    def _open_stream(self):
+        # PortAudio はマイクを使うときだけ読み込む（ストリームを使わない処理はPortAudio無しでも動く）
+        import sounddevice as sd
+        stream = sd.InputStream(
             samplerate=self.sample_rate,
             channels=self.channels,
+            dtype=self.sample_format,
             callback=self._audio_callback,
-            blocksize=1024
+            blocksize=self.BLOCK_SIZE
         )
-        self.stream.start()
+        try:
+            stream.start()
+        except Exception:
+            stream.close()
+            raise
+        self.stream = stream
+        try:
+            self.device_name = sd.query_devices(self.stream.device)["name"]
+        except Exception:
+            self.device_name = None
 
-    def stop(self) -> str:
-        """
-        録音を停止し、WAVファイルを保存してパスを返す
-        """
-        if not self.recording:
-            return None
-            
-        self.recording = False
+    def reopen_stream(self):
+        """開いたままのストリームを開き直す（スリープ復帰で入力デバイスが変わった場合など）。録音中は何もしない"""
+        if not self.warm or self.recording:
+            return
+        self._close_stream()
+        self._open_stream()
+
+    def _close_stream(self):
         if self.stream:
             self.stream.stop()
             self.stream.close()
             self.stream = None
-            
-        # 録音データを結合
-        if not self.frames:
+
+    def start(self, segment_callback=None, open_stream=True):
+        """
+        録音を開始する。
+        segment_callback を渡すと、発話の切れ目ごとにセグメントの音声を
+        録音順に通知する（録音と並行して文字起こしするため）。
+        open_stream=False の場合はマイクを開かず、feed() で渡された音声を録音として扱う。
+        ストリームを開いたままにしている場合 (open_warm) は、プリロールを先頭に含めて録音を始める。
+        """
+        if self.recording:
+            return
+
+        self.max_volume = 0.0 # リセット
+        self.meter.reset()
+        self.overruns = 0
+        self.last_status = None
+        self._segment_samples = 0
+        self._segment_voiced = False
+        self._silent_samples = 0
+        buffer = CaptureBuffer(self.sample_rate, self.channels, dtype=self.sample_format)
+        with self._lock:
+            if self._ring is not None:
+                buffer.write(self._take_preroll())
+            self.buffer = buffer
+            self.recording = True
+
+        self.set_segment_callback(segment_callback)
+
+        # 開いたままのストリームが止まっていたら（デバイスの切断・スリープなど）開き直す
+        if self.stream is not None and not getattr(self.stream, "active", True):
+            print("Input stream is no longer active. Reopening...")
+            self._close_stream()
+        if open_stream and self.stream is None:
+            self._open_stream()
+
+    def set_segment_callback(self, segment_callback):
+        """
+        録音中のセグメント分割を始める（キーを押した時点で先行して始めた録音を、録音として確定したときにも使う）。
+        """
+        if not segment_callback or self._segment_thread:
+            return
+        self.segment_callback = segment_callback
+        # WAV書き出しと通知はオーディオスレッドの外で、録音順に行う
+        self._segment_queue = queue.Queue()
+        self._segment_thread = threading.Thread(target=self._segment_worker, daemon=True)
+        self._segment_thread.start()
+
+    def _take_preroll(self) -> np.ndarray:
+        """リングバッファの内容を古い順に取り出して空にする（ロックを取って呼ぶ）"""
+        filled, pos = self._ring_filled, self._ring_pos
+        self._ring_filled = 0
+        # 書き込み位置の直前の filled フレーム（リングの先頭をまたぐ場合は末尾から続ける）
+        return np.take(self._ring, np.arange(pos - filled, pos), axis=0, mode='wrap')
+
+    def _write_ring(self, indata):
+        """録音していない間の入力をリングバッファに上書きする（オーディオスレッド）"""
+        ring = self._ring
+        n = min(len(indata), len(ring))
+        indata = indata[len(indata) - n:]
+        end = self._ring_pos + n
+        if end <= len(ring):
+            ring[self._ring_pos:end] = indata
+        else:
+            head = len(ring) - self._ring_pos
+            ring[self._ring_pos:] = indata[:head]
+            ring[:n - head] = indata[head:]
+        self._ring_pos = end % len(ring)
+        self._ring_filled = min(len(ring), self._ring_filled + n)
+
+    def _halt(self):
+        """録音を止め、区切り済みのセグメントを通知し終える（ストリームは warm なら開いたまま）"""
+        with self._lock:
+            self.recording = False
+        if not self.warm:
+            self._close_stream()
+        self.meter.reset()
+        if self.overruns:
+            print(f"Audio input overflowed {self.overruns} time(s) (last status: {self.last_status})")
+
+        # 区切り済みセグメントを全て通知し終える
+        if self._segment_thread:
+            self._segment_queue.put(None)
+            self._segment_thread.join()
+            self._segment_thread = None
+            self._segment_queue = None
+        self.segment_callback = None
+
+    def stop(self):
+        """
+        録音を停止し、録音データ (RecordedAudio) を返す。
+        save_to_file が有効な場合は一時WAVファイルに保存してそのパスを返す。
+        セグメント分割中の場合は、未通知の最後のセグメントを返す。
+        """
+        if not self.recording:
             return None
+        self._halt()
             
-        recording_data = np.concatenate(self.frames, axis=0)
-        
-        # 一時ファイルに保存
+        # 録音データ（キャプチャバッファのビュー。結合やコピーは行わない）
+        chunks = self.buffer.split()
+        self.buffer = None
+        if not chunks:
+            return None
+        return self._save_chunks(chunks)
+
+    def discard(self):
+        """録音を止めて録音データを捨てる（キーを押した時点で先行して始めた録音が、ショートカットの修飾キーだった場合）"""
+        if not self.recording:
+            return
+        self._halt()
+        self.buffer = None
+
+    def feed(self, indata):
+        """
+        マイクの代わりに音声ブロック (frames, channels) を渡す。
+        start(open_stream=False) と組み合わせ、ベンチマークや録音済み音声の処理に使う。
+        """
+        self._audio_callback(indata, len(indata), None, None)
+
+    def _save_chunks(self, chunks):
+        """バッファのビューを RecordedAudio (またはデバッグ用の一時WAVファイル) にする"""
+        audio = RecordedAudio(chunks, self.sample_rate, self.channels, chunks[0].dtype)
+        if not self.save_to_file:
+            return audio
+
+        # 一時ファイルに保存（デバッグ用。確認できるよう削除はしない）
         temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-        wav.write(temp_file.name, self.sample_rate, recording_data)
+        temp_file.close()
+        audio.save(temp_file.name)
+        print(f"Debug: recording saved to {temp_file.name}")
         return temp_file.name
 
+    def _segment_worker(self):
+        """区切られたセグメントをWAVに書き出し、録音順にコールバックへ渡す"""
+        while True:
+            chunks = self._segment_queue.get()
+            if chunks is None:
+                break
+            try:
+                self.segment_callback(self._save_chunks(chunks))
+            except Exception as e:
+                print(f"Segment Error: {e}")
+
+    def _update_segment(self, rms, frames):
+        """発話の切れ目を検出し、十分な長さがあればセグメントを切り出す"""
+        self._segment_samples += frames
+        if rms >= self.SEGMENT_SILENCE_RMS:
+            self._segment_voiced = True
+            self._silent_samples = 0
+            return
+
+        self._silent_samples += frames
+        if not self._segment_voiced:
+            return
+        if self._segment_samples < self.SEGMENT_MIN_SEC * self.sample_rate:
+            return
+        if self._silent_samples < self.SEGMENT_PAUSE_SEC * self.sample_rate:
+            return
+
+        # ビューを切り出すだけなのでコールバック内でも軽い
+        segment = self.buffer.split()
+        self._segment_samples = 0
+        self._segment_voiced = False
+        self._silent_samples = 0
+        self._segment_queue.put(segment)
+
+    def _block_rms(self, indata) -> float:
+        """ブロックの RMS (フルスケール 1.0 換算)。事前確保した作業領域で計算し、配列を新たに確保しない"""
+        if indata.shape != self._level_scratch.shape:
+            # 想定と異なる大きさのブロックが来た場合のみ作業領域を作り直す
+            self._level_scratch = np.zeros(indata.shape, dtype=np.float32)
+            self._level_flat = self._level_scratch.reshape(-1)
+        # int16 の二乗はオーバーフローするため float32 にコピーしてから内積で二乗和を求める
+        np.copyto(self._level_scratch, indata, casting='unsafe')
+        return math.sqrt(float(np.dot(self._level_flat, self._level_flat)) / indata.size) * self._level_scale
+
     def _audio_callback(self, indata, frames, time, status):
-        """ストリームからのコールバック"""
+        """
+        ストリームからのコールバック（PortAudio のオーディオスレッド）。
+        ここではバッファへの書き込みと音量の計算だけを行い、UI へのイベント送信や出力はしない。
+        """
         if status:
-            print(status)
-        if self.recording:
-            self.frames.append(indata.copy())
+            # print は遅く、次のブロックの取りこぼしを招くため記録だけして停止時に出力する
+            self.last_status = status
+            if status.input_overflow:
+                self.overruns += 1
+        with self._lock:
+            if not self.recording:
+                # 録音していない間（ストリームを開いたまま）は、直近の入力をリングバッファに残すだけ
+                if self._ring is not None:
+                    self._write_ring(indata)
+                return
+
+            # 事前確保したチャンクへ直接書き込む（ブロックごとのコピーを保持しない）
+            self.buffer.write(indata)
             
-            # 音量計算 (RMS)
-            rms = float(np.sqrt(np.mean(indata**2)))
+            # 音量計算 (RMS)。サンプル形式によらずフルスケール 1.0 に換算する
+            rms = self._block_rms(indata)
             
             # 最大音量を更新
             if rms > self.max_volume:
                 self.max_volume = rms
+
+            if self._segment_queue is not None:
+                self._update_segment(rms, frames)
             
             # 正規化 (適当な係数で0.0-1.0に近づける。入力レベルによるが調整必要)
             # ここではクリッピングも考慮して簡易的に
-            volume = rms * 5
-            volume = min(1.0, volume)
-            
-            if self.volume_callback:
-                self.volume_callback(volume)
+            # 表示用の値はスロットに置くだけ。オーバーレイが描画のたびに読みに来る
+            self.meter.publish(min(1.0, rms * 5))
@@ -0,0 +1,423 @@
+import asyncio
+import json
+import os
+import threading
+import time
+
+import numpy as np
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, OpenAI, DefaultHttpxClient
+import httpx
+
+from src.config import ConfigManager
+from src.request_policy import TranscriptionError
+from src import tracing
+
+# Whisper API に渡す共通のパラメータ
+LANGUAGE = "ja"
+PROMPT = "こんにちは。" # 最小限のプロンプトで日本語であることを示す
+
+
+class TranscriptionBackend:
+    """文字起こしバックエンドの基底クラス。生のテキストを返し、整形は Transcriber 側で行う"""
+
+    name = ""
+    model = ""
+    requires_api_key = False
+    hedging = False # 同じリクエストを重複して投げてよいか（ネットワーク越しのAPI向け）
+    split_long_audio = False # 長い音声を分割して並行して送るか（アップロードサイズに上限のあるAPI向け）
+    client_deadline = True # 呼び出し側で音声の長さに応じた締め切りを設けてリトライするか（送り先が自分で管理する場合は False）
+
+    def is_ready(self) -> bool:
+        """文字起こしできる状態か"""
+        return True
+
+    def reload_key(self) -> None:
+        """APIキーなどの認証情報を再読み込みする"""
+
+    def warm_up(self) -> None:
+        """初回の文字起こしが遅くならないよう事前準備する（録音開始時にも呼ばれる）"""
+
+    def reset_connection(self) -> None:
+        """スリープ復帰後など、保持している接続が使えなくなったときに作り直す"""
+
+    def identity(self) -> str:
+        """同じ音声から同じ結果が返る条件（モデル・言語・プロンプト）。キャッシュのキーに含める"""
+        return f"{self.name}:{self.model}|{LANGUAGE}|{PROMPT}"
+
+    def transcribe(self, audio, timeout=None) -> str:
+        """
+        audio (RecordedAudio またはWAVファイルのパス) を文字起こしする。
+        timeout はこの呼び出しに使える残り時間（秒）。リトライは RequestPolicy が行う。
+        """
+        raise NotImplementedError
+
+    def attach_loop(self, loop) -> None:
+        """transcribe_async を実行するイベントループ（専用スレッドで動いているもの）を知らせる"""
+
+    async def transcribe_async(self, audio, timeout=None) -> str:
+        """transcribe() の asyncio 版。既定ではスレッドで transcribe() を実行する（CPU で動くモデル向け）"""
+        return await asyncio.to_thread(self.transcribe, audio, timeout)
+
+
+class OpenAIBackend(TranscriptionBackend):
+    """
+    OpenAI Whisper API (whisper-1)。
+    HTTP接続はプールして使い回し、録音開始時に先行して確立しておくことで
+    停止後のリクエストで DNS / TCP / TLS のハンドシェイクを待たないようにする。
+    """
+
+    name = "openai"
+    model = "whisper-1"
+    requires_api_key = True
+    hedging = True
+    split_long_audio = True
+
+    KEEPALIVE_SEC = 30.0   # アイドル接続を保持する上限
+    MAX_CONNECTIONS = 4
+
+    def __init__(self, api_key=None, base_url=None):
+        # api_key / base_url はベンチマークやテスト用サーバー向け。通常は Credential Manager から読む
+        self._fixed_api_key = api_key
+        self.base_url = base_url
+        self.api_key = ""
+        self.client = None
+        self._http = None
+        # イベントループから使う非同期クライアント（attach_loop 後）。接続プールは同期版と別に持つ
+        self._loop = None
+        self.async_client = None
+        self._async_http = None
+        self._last_activity = 0.0 # 最後に接続を使った（確立した）時刻
+        self.reload_key()
+
+    def is_ready(self) -> bool:
+        return self.client is not None
+
+    def reload_key(self) -> None:
+        self.api_key = self._fixed_api_key or ConfigManager.load_api_key()
+        if self.api_key:
+            self._build_client()
+
+    def _build_client(self) -> None:
+        """キープアライブ上限付きの接続プールでクライアントを作り直す"""
+        old_http = self._http
+        self._http = DefaultHttpxClient(
+            limits=self._limits(),
+            # 送信開始と応答ヘッダ受信の時点をトレースに記録する（トレース外の接続確立では何もしない）
+            event_hooks={
+                "request": [lambda request: tracing.mark("upload_start")],
+                "response": [lambda response: tracing.mark("first_byte")],
+            },
+        )
+        # リトライは RequestPolicy 側で行うため、クライアント組み込みのリトライは無効にする
+        self.client = OpenAI(api_key=self.api_key, base_url=self.base_url, timeout=30.0,
+                             max_retries=0, http_client=self._http)
+        self._last_activity = 0.0
+        if old_http:
+            old_http.close()
+        if self._loop:
+            self._build_async_client()
+
+    def _limits(self):
+        return httpx.Limits(max_connections=self.MAX_CONNECTIONS, max_keepalive_connections=self.MAX_CONNECTIONS,
+                            keepalive_expiry=self.KEEPALIVE_SEC)
+
+    def _build_async_client(self) -> None:
+        old_http = self._async_http
+
+        async def on_request(request):
+            tracing.mark("upload_start")
+
+        async def on_response(response):
+            tracing.mark("first_byte")
+
+        self._async_http = DefaultAsyncHttpxClient(
+            limits=self._limits(),
+            event_hooks={"request": [on_request], "response": [on_response]},
+        )
+        self.async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, timeout=30.0,
+                                        max_retries=0, http_client=self._async_http)
+        if old_http:
+            # 非同期クライアントはループ上で閉じる
+            asyncio.run_coroutine_threadsafe(old_http.aclose(), self._loop)
+
+    def attach_loop(self, loop) -> None:
+        self._loop = loop
+        if self.api_key:
+            self._build_async_client()
+
+    def warm_up(self) -> None:
+        if not self.client:
+            return
+        # 直近に使った接続がまだプールに残っているはずなら何もしない
+        now = time.monotonic()
+        if now - self._last_activity < self.KEEPALIVE_SEC / 2:
+            return
+        self._last_activity = now
+        if self._loop:
+            # 文字起こしはループ上の非同期クライアントで行うため、そちらの接続を確立する
+            asyncio.run_coroutine_threadsafe(self._warm_connection_async(self._async_http), self._loop)
+            return
+        threading.Thread(target=self._warm_connection, args=(self._http,), daemon=True).start()
+
+    def _warm_connection(self, http) -> None:
+        """軽いリクエストで接続を確立し、プールに残す（応答内容は使わない）"""
+        try:
+            http.head(str(self.client.base_url), timeout=10.0)
+        except Exception as e:
+            print(f"Warm-up Error: {e}")
+
+    async def _warm_connection_async(self, http) -> None:
+        try:
+            await http.head(str(self.async_client.base_url), timeout=10.0)
+        except Exception as e:
+            print(f"Warm-up Error: {e}")
+
+    def reset_connection(self) -> None:
+        if not self.client:
+            return
+        self._build_client()
+        self.warm_up()
+
+    async def transcribe_async(self, audio, timeout=None) -> str:
+        if not self.async_client:
+            self.reload_key()
+            if not self.async_client:
+                if self._loop is None:
+                    return await super().transcribe_async(audio, timeout)
+                raise ValueError("API Key is not set.")
+
+        client = self.async_client if timeout is None else self.async_client.with_options(timeout=timeout)
+        with tracing.span("request"), self._open_audio(audio) as audio_file:
+            transcript = await client.audio.transcriptions.create(
+                model=self.model,
+                file=(self._file_name(audio), audio_file),
+                language=LANGUAGE,
+                prompt=PROMPT,
+            )
+        tracing.mark("response")
+        self._last_activity = time.monotonic()
+        return transcript.text
+
+    def transcribe(self, audio, timeout=None) -> str:
+        if not self.client:
+            self.reload_key()
+            if not self.client:
+                raise ValueError("API Key is not set.")
+
+        client = self.client if timeout is None else self.client.with_options(timeout=timeout)
+        with tracing.span("request"), self._open_audio(audio) as audio_file:
+            # Whisper API 呼び出し
+            # promptを簡略化してAIによる過剰な推測（幻覚）を抑制
+            transcript = client.audio.transcriptions.create(
+                model=self.model,
+                file=(self._file_name(audio), audio_file),
+                language=LANGUAGE,
+                prompt=PROMPT,
+            )
+        tracing.mark("response")
+        self._last_activity = time.monotonic()
+        return transcript.text
+
+    @staticmethod
+    def _file_name(audio) -> str:
+        """API は拡張子で形式を判別するため、ファイルはその名前のまま送る"""
+        if isinstance(audio, str):
+            return os.path.basename(audio)
+        return "audio.wav"
+
+    @staticmethod
+    def _open_audio(audio):
+        """RecordedAudio はメモリから、パスはファイルから読み出す"""
+        if isinstance(audio, str):
+            return open(audio, "rb")
+        return audio.open()
+
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """
+    ローカルCPUで動かす Whisper 系モデル (faster-whisper)。
+    モデルはプロセス内で一度だけロードし、以降の文字起こしで使い回す。
+    オフラインでも動作し、WAN の往復が発生しない。
+    """
+
+    name = "local"
+
+    # モデルはロードが重いので、設定が同じならインスタンス間でも共有する
+    _models = {}
+    _models_lock = threading.Lock()
+    # 起動時の先読み (warm_up) の状態。読み込み中のものは重ねて読み込まず、失敗したものは読み直さない
+    # （録音開始のたびに呼ばれるため。文字起こしのときは改めて読み込み、失敗はそこで伝える）
+    _warming = set()
+    _warm_errors = {}
+    _warm_lock = threading.Lock()
+
+    def __init__(self, model_size="small", device="cpu", compute_type="int8"):
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        # 実行デバイスでは結果が変わらないが、演算精度では変わりうる
+        self.model = f"{model_size}/{compute_type}"
+
+    def warm_up(self) -> None:
+        key = (self.model_size, self.device, self.compute_type)
+        with self._warm_lock:
+            if key in self._models or key in self._warming or key in self._warm_errors:
+                return
+            self._warming.add(key)
+        # ロードは数秒かかるため、起動直後にバックグラウンドで済ませておく
+        threading.Thread(target=self._warm_model, args=(key,), daemon=True).start()
+
+    def _warm_model(self, key):
+        try:
+            self._get_model()
+        except Exception as e:
+            self._warm_errors[key] = str(e)
+            print(f"Local Model Load Error: {e}")
+        finally:
+            with self._warm_lock:
+                self._warming.discard(key)
+
+    def _get_model(self):
+        key = (self.model_size, self.device, self.compute_type)
+        with self._models_lock:
+            model = self._models.get(key)
+            if model is None:
+                try:
+                    from faster_whisper import WhisperModel
+                except ImportError:
+                    raise RuntimeError("faster-whisper is not installed. Run: pip install faster-whisper")
+                print(f"Loading local model: {self.model_size} ({self.device}, {self.compute_type})")
+                model = WhisperModel(self.model_size, device=self.device, compute_type=self.compute_type)
+                self._models[key] = model
+            return model
+
+    def transcribe(self, audio, timeout=None) -> str:
+        model = self._get_model()
+        with tracing.span("request"):
+            tracing.mark("upload_start")
+            segments, _ = model.transcribe(
+                self._to_input(audio),
+                language=LANGUAGE,
+                initial_prompt=PROMPT,
+                beam_size=1,
+            )
+            # segments は遅延評価なので、最初のセグメントが出た時点を first_byte とする
+            texts = []
+            for segment in segments:
+                tracing.mark("first_byte")
+                texts.append(segment.text)
+        tracing.mark("response")
+        return "".join(texts)
+
+    @staticmethod
+    def _to_input(audio):
+        """
+        RecordedAudio はメモリ上のサンプルを float32 モノラルに変換してそのまま渡す。
+        モデルは 16kHz を前提とする（録音側の既定値と同じ）。
+        """
+        if isinstance(audio, str):
+            return audio
+        if audio.sample_rate != 16000:
+            raise ValueError(f"Local backend requires 16 kHz audio (got {audio.sample_rate} Hz)")
+        samples = audio.samples.astype(np.float32)
+        if audio.dtype.kind == 'i':
+            samples /= 32768.0
+        return samples.mean(axis=1) if audio.channels > 1 else samples[:, 0]
+
+
+class DaemonBackend(TranscriptionBackend):
+    """
+    ローカルの口述デーモン (src.server) に音声を送る。
+    接続先とトークンはデーモンが書き出す server.json から読み、デーモンが起動し直したら読み直す。
+    リトライ・ヘッジ・キャッシュはデーモン側の Transcriber が行う。
+    デーモンの待ち行列にいる間にこちらで打ち切って再送すると同じ音声を重複して処理させるため、
+    こちらでは締め切りを設けず、受け付けられなかった (429) 場合だけリトライする。
+    """
+
+    name = "daemon"
+    client_deadline = False
+
+    def __init__(self, client_id="tray", info_path=None):
+        self.client_id = client_id
+        self.info_path = info_path or ConfigManager.get_server_info_path()
+        self.info = {}
+        # 応答の待ち時間に上限を設けない（デーモンの待ち行列や長い録音の処理中に打ち切らない）。接続だけは早く諦める
+        self._http = httpx.Client(timeout=httpx.Timeout(None, connect=2.0))
+
+    def reload_key(self) -> None:
+        self._read_info()
+
+    def reset_connection(self) -> None:
+        old_http = self._http
+        self._http = httpx.Client(timeout=old_http.timeout)
+        old_http.close()
+
+    def _reconnect(self) -> bool:
+        """接続先を読み直し、変わっていれば True"""
+        previous = self.info
+        return bool(self._read_info()) and self.info != previous
+
+    def _read_info(self) -> dict:
+        try:
+            with open(self.info_path, encoding="utf-8") as f:
+                self.info = json.load(f)
+        except (OSError, ValueError):
+            self.info = {}
+        return self.info
+
+    def transcribe(self, audio, timeout=None) -> str:
+        # 締め切りはデーモン側の RequestPolicy が音声の長さから決める (client_deadline = False)
+        trimmed = getattr(audio, "silence_trimmed", False)
+        if isinstance(audio, str):
+            with open(audio, "rb") as f:
+                data = f.read()
+        else:
+            with audio.open() as f:
+                data = f.read()
+        name = OpenAIBackend._file_name(audio)
+        with tracing.span("request"):
+            # 繋がらない・トークンが違う・終了処理中なら、デーモンが起動し直していないか接続先を読み直す
+            try:
+                response = self._post(data, name, trimmed)
+            except httpx.TransportError:
+                if not self._reconnect():
+                    raise
+                response = self._post(data, name, trimmed)
+            else:
+                if response.status_code in (401, 503) and self._reconnect():
+                    response = self._post(data, name, trimmed)
+        tracing.mark("response")
+        payload = response.json() if response.headers.get("Content-Type", "").startswith("application/json") else {}
+        if response.status_code == 502:
+            # デーモンでリトライを尽くした結果なので、種類をそのまま引き継ぐ
+            raise TranscriptionError(payload.get("error", "Daemon transcription failed"), payload.get("kind", "unknown"))
+        response.raise_for_status()
+        return payload["raw"]
+
+    def _post(self, data, name, trimmed=False):
+        if not self.info and not self._read_info():
+            raise ConnectionError("Dictation daemon is not running")
+        params = {"name": name, "raw": "1"}
+        if trimmed:
+            # 無音はこちらで削り済みなので、デーモンでは削り直さない
+            params["trimmed"] = "1"
+        tracing.mark("upload_start")
+        response = self._http.post(
+            f"{self.info['url']}/v1/transcribe",
+            params=params,
+            content=data,
+            headers={"Authorization": f"Bearer {self.info['token']}", "X-Client-Id": self.client_id},
+        )
+        tracing.mark("first_byte")
+        return response
+
+
+def create_backend(name: str = None) -> TranscriptionBackend:
+    """設定に応じたバックエンドを生成する"""
+    name = name or ConfigManager.get_backend()
+    if name == DaemonBackend.name:
+        return DaemonBackend(client_id=f"pid-{os.getpid()}")
+    if name == LocalWhisperBackend.name:
+        options = ConfigManager.get_local_model_options()
+        return LocalWhisperBackend(**options)
+    return OpenAIBackend()
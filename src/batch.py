@@ -0,0 +1,342 @@
+"""
+録音済みの音声ファイルをまとめて文字起こしするコマンドラインツール。
+
+ホットキーでの口述と同じ Transcriber（リトライ・締め切り・整形・辞書）を使い、
+同時に投げるリクエスト数と1分あたりのファイル数を上限として並列に処理する。
+完了したファイルはチェックポイントに記録するため、中断しても続きから再開できる。
+
+    python -m src.batch "D:\\memos" --output memos.jsonl
+    python -m src.batch "D:\\memos\\**\\*.m4a" --format text --output out --workers 8 --max-rate 60
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from src.backends import DaemonBackend, OpenAIBackend, create_backend
+from src.capture import RecordedAudio
+from src.config import ConfigManager
+from src.request_policy import RequestPolicy, TranscriptionError
+from src.transcriber import Transcriber
+from src.transcript_cache import create_cache
+from src.vad import trim_silence
+
+# Whisper API が受け付ける形式
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".m4a", ".mp4", ".mpeg", ".mpga", ".webm", ".ogg", ".flac"}
+
+
+def collect_files(inputs) -> list:
+    """ディレクトリ（サブフォルダも含む）・グロブ・ファイルのパスから音声ファイルを集める"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                files.extend(os.path.join(root, name) for name in names
+                             if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS)
+        elif os.path.isfile(item):
+            files.append(item)
+        else:
+            files.extend(path for path in glob.glob(item, recursive=True)
+                         if os.path.isfile(path) and os.path.splitext(path)[1].lower() in AUDIO_EXTENSIONS)
+    # 重複を除き、処理順を毎回同じにする
+    return sorted({os.path.abspath(path) for path in files})
+
+
+class Checkpoint:
+    """
+    完了したファイルを1行ずつ追記する。ファイルはパス・サイズ・更新時刻で識別し、
+    同じ名前でも中身が変わったファイルは処理し直す。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(path) -> str:
+        stat = os.stat(path)
+        return f"{os.path.abspath(path)}\t{stat.st_size}\t{stat.st_mtime_ns}"
+
+    def load(self) -> set:
+        if not os.path.exists(self.path):
+            return set()
+        with open(self.path, encoding="utf-8") as f:
+            return {line.rstrip("\n") for line in f if line.strip()}
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def add(self, key) -> None:
+        # 1件ごとに書き出し、強制終了されても完了分は失われないようにする
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(key + "\n")
+            f.flush()
+
+
+class RateLimiter:
+    """リクエストの開始間隔を空け、1分あたりの件数を上限以下に抑える（0 なら無制限）"""
+
+    def __init__(self, per_minute=0.0):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class ResultWriter:
+    """
+    結果の出力先。jsonl は1ファイルに1行ずつ追記し、
+    text はディレクトリに、入力のフォルダ構成を保って元のファイル名と同じ名前の .txt を書く。
+    """
+
+    def __init__(self, output, fmt, files=()):
+        self.output = output
+        self.format = fmt
+        self._names = {} # 入力ファイルの絶対パス -> output からの相対パス (text)
+        if fmt == "text":
+            os.makedirs(output, exist_ok=True)
+            self._names = self.text_names(files)
+        else:
+            directory = os.path.dirname(os.path.abspath(output))
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def text_names(files) -> dict:
+        """
+        text の出力名を決める。入力の共通のフォルダからの相対パスを保ち（a/x.wav → a/x.txt、b/x.wav → b/x.txt）、
+        拡張子だけが違うファイルは拡張子を残して区別する（x.wav.txt, x.mp3.txt）。
+        再開したときに名前が変わらないよう、処理済みも含めた全ファイルから決める。
+        """
+        files = [os.path.abspath(path) for path in files]
+        if not files:
+            return {}
+        try:
+            root = os.path.commonpath([os.path.dirname(path) for path in files])
+            relative = {path: os.path.relpath(path, root) for path in files}
+        except ValueError:
+            # ドライブが異なる場合はドライブ名のフォルダから始める
+            relative = {}
+            for path in files:
+                drive, rest = os.path.splitdrive(path)
+                relative[path] = os.path.join(drive.rstrip(":"), rest.lstrip("\\/"))
+        stems = {path: os.path.splitext(name)[0] for path, name in relative.items()}
+        counts = Counter(os.path.normcase(stem) for stem in stems.values())
+        return {path: (relative[path] if counts[os.path.normcase(stems[path])] > 1 else stems[path]) + ".txt"
+                for path in files}
+
+    def clear(self) -> None:
+        """最初からやり直すときに jsonl の前回の結果を消す（text は上書きされる）"""
+        if self.format == "jsonl" and os.path.exists(self.output):
+            os.remove(self.output)
+
+    def write(self, record) -> None:
+        if self.format == "text":
+            if record["error"] is None:
+                name = self._names.get(os.path.abspath(record["file"]))
+                if name is None:
+                    name = os.path.splitext(os.path.basename(record["file"]))[0] + ".txt"
+                path = os.path.join(self.output, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(record["text"] + "\n")
+            return
+        with open(self.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class BatchTranscriber:
+    """
+    ファイルごとに Transcriber.transcribe（リトライ・整形込み）を呼び、
+    同時実行数 workers・毎分 max_rate 件を上限として並列に処理する。
+    """
+
+    def __init__(self, transcriber, workers=4, max_rate=0.0, trim=True):
+        self.transcriber = transcriber
+        self.workers = max(1, workers)
+        self.limiter = RateLimiter(max_rate)
+        self.trim = trim
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _load(self, path):
+        """WAV はメモリに読み込んで無音を削る。それ以外（圧縮形式）はファイルのまま送る"""
+        if not self.trim or os.path.splitext(path)[1].lower() != ".wav":
+            return path
+        try:
+            audio = RecordedAudio.load(path)
+        except ValueError:
+            return path
+        trimmed, _, _ = trim_silence(audio)
+        return trimmed
+
+    def transcribe_file(self, path) -> dict:
+        self.limiter.wait()
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        start = time.perf_counter()
+        record = {"file": path, "text": "", "duration": round(Transcriber.audio_duration(path), 2),
+                  "elapsed": 0.0, "error": None}
+        try:
+            record["text"] = self.transcriber.transcribe(self._load(path))
+        except TranscriptionError as e:
+            record["error"] = f"{e.kind}: {e}"
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        record["elapsed"] = round(time.perf_counter() - start, 3)
+        return record
+
+    def run(self, files, on_result) -> bool:
+        """
+        files を処理し、完了した順に on_result(record) を呼ぶ（呼び出し元のスレッドで）。
+        Ctrl+C で中断した場合は未着手のファイルを取り消して False を返す。
+        """
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch")
+        futures = [executor.submit(self.transcribe_file, path) for path in files]
+        try:
+            for future in as_completed(futures):
+                on_result(future.result())
+        except KeyboardInterrupt:
+            # 実行中のリクエストは待たずに抜ける（チェックポイントには完了分だけが残る）
+            executor.shutdown(wait=False, cancel_futures=True)
+            return False
+        executor.shutdown()
+        return True
+
+
+class BatchReport:
+    """進捗の表示と最後の集計"""
+
+    def __init__(self, total):
+        self.total = total
+        self.records = []
+        self.started = time.perf_counter()
+
+    def add(self, record) -> None:
+        self.records.append(record)
+        status = "error: " + record["error"] if record["error"] else f"{len(record['text'])} chars"
+        print(f"[{len(self.records)}/{self.total}] {os.path.basename(record['file'])}"
+              f" ({record['duration']:.1f}s audio, {record['elapsed']:.2f}s) {status}", flush=True)
+
+    def summary(self, skipped, peak_in_flight) -> dict:
+        elapsed = time.perf_counter() - self.started
+        ok = [r for r in self.records if r["error"] is None]
+        latencies = np.array([r["elapsed"] for r in ok]) if ok else np.zeros(1)
+        return {
+            "ok": len(ok),
+            "failed": len(self.records) - len(ok),
+            "skipped": skipped,
+            "remaining": self.total - len(self.records),
+            "elapsed_sec": round(elapsed, 2),
+            "files_per_min": round(len(self.records) / elapsed * 60, 2) if elapsed > 0 else 0.0,
+            "audio_min": round(sum(r["duration"] for r in ok) / 60, 2),
+            "peak_in_flight": peak_in_flight,
+            "p50_sec": round(float(np.percentile(latencies, 50)), 3),
+            "p95_sec": round(float(np.percentile(latencies, 95)), 3),
+        }
+
+    @staticmethod
+    def format_summary(summary) -> str:
+        return (f"{summary['ok']} ok, {summary['failed']} failed, {summary['skipped']} skipped (checkpoint), "
+                f"{summary['remaining']} remaining\n"
+                f"{summary['elapsed_sec']:.1f}s, {summary['files_per_min']:.1f} files/min, "
+                f"{summary['audio_min']:.1f} audio min, peak in-flight {summary['peak_in_flight']}, "
+                f"latency p50 {summary['p50_sec']:.2f}s / p95 {summary['p95_sec']:.2f}s")
+
+
+def build_transcriber(backend_name=None, base_url=None, cache=True) -> Transcriber:
+    if backend_name == DaemonBackend.name:
+        # キャッシュはデーモン側で持つ
+        backend, cache = create_backend(backend_name), False
+    elif base_url or os.environ.get("OPENAI_API_KEY"):
+        # 環境変数のキーがあればそれを使い、無ければ Credential Manager から読む
+        backend = OpenAIBackend(api_key=os.environ.get("OPENAI_API_KEY"), base_url=base_url)
+    else:
+        backend = create_backend(backend_name)
+    # 同じファイルを処理し直すときは送信済みの結果を使う
+    transcriber = Transcriber(backend, cache=create_cache() if cache else None)
+    # 一括処理では同時リクエスト数を --workers で決めるため、ヘッジや長いファイルの分割の並行送信で上限を超えないようにする
+    # （長いファイルも分割はするが、チャンクは1つずつ送る）
+    transcriber.policy = RequestPolicy(hedging=False, deadlines=transcriber.backend.client_deadline)
+    transcriber.chunk_parallelism = 1
+    return transcriber
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="音声ファイルをまとめて文字起こしする")
+    parser.add_argument("inputs", nargs="+", help="音声ファイル・ディレクトリ・グロブ（例: memos/**/*.m4a）")
+    parser.add_argument("--output", "-o", default="transcripts.jsonl",
+                        help="出力先。jsonl はファイル、text はディレクトリ (既定: transcripts.jsonl)")
+    parser.add_argument("--format", choices=["jsonl", "text"], default="jsonl")
+    parser.add_argument("--workers", "-j", type=int, default=4, help="同時に送るリクエスト数の上限 (既定: 4)")
+    parser.add_argument("--max-rate", type=float, default=0.0,
+                        help="1分あたりに開始するファイル数の上限。0 は無制限 (既定: 0)")
+    parser.add_argument("--checkpoint", help="完了したファイルの記録先 (既定: 出力先 + .done)")
+    parser.add_argument("--restart", action="store_true", help="チェックポイントを消して最初から処理する")
+    parser.add_argument("--backend", choices=["openai", "local", "daemon"], help="文字起こしエンジン (既定: 設定ファイルの値)")
+    parser.add_argument("--base-url", help="OpenAI 互換APIのURL")
+    parser.add_argument("--no-trim", action="store_true", help="WAVの無音を削らずに送る")
+    parser.add_argument("--no-cache", action="store_true", help="文字起こしキャッシュを使わない")
+    args = parser.parse_args(argv)
+
+    files = collect_files(args.inputs)
+    if not files:
+        print("No audio files found.", file=sys.stderr)
+        return 1
+
+    checkpoint = Checkpoint(args.checkpoint or args.output.rstrip("/\\") + ".done")
+    done = set() if args.restart else checkpoint.load()
+    pending = [path for path in files if Checkpoint.key(path) not in done]
+    skipped = len(files) - len(pending)
+    print(f"{len(files)} file(s), {skipped} already done, {len(pending)} to transcribe "
+          f"(workers {args.workers}, max rate {args.max_rate or 'unlimited'}/min)", flush=True)
+
+    transcriber = build_transcriber(args.backend, args.base_url, cache=not args.no_cache)
+    batch = BatchTranscriber(transcriber, workers=args.workers, max_rate=args.max_rate,
+                             trim=not args.no_trim and ConfigManager.get_trim_silence())
+    writer = ResultWriter(args.output, args.format, files)
+    if args.restart:
+        checkpoint.clear()
+        writer.clear()
+    report = BatchReport(len(pending))
+
+    def on_result(record):
+        writer.write(record)
+        if record["error"] is None:
+            checkpoint.add(Checkpoint.key(record["file"]))
+        report.add(record)
+
+    completed = batch.run(pending, on_result)
+    if not completed:
+        print("Interrupted. Run the same command again to resume.", file=sys.stderr)
+    print(BatchReport.format_summary(report.summary(skipped, batch.peak_in_flight)))
+    if transcriber.cache is not None:
+        print("Cache: " + transcriber.cache.format_stats(transcriber.cache.stats()))
+    if not completed:
+        return 130
+    return 0 if all(r["error"] is None for r in report.records) else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
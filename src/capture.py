@@ -0,0 +1,331 @@
+import numpy as np
+import os
+import queue
+import tempfile
+import threading
+import struct
+import io
+
+WAV_HEADER_SIZE = 44
+
+
+def _wav_header(data_size, sample_rate, channels, dtype) -> bytes:
+    """PCM / IEEE float 形式の44バイトWAVヘッダを生成する"""
+    dtype = np.dtype(dtype)
+    sample_width = dtype.itemsize
+    format_tag = 3 if dtype.kind == 'f' else 1 # 3: IEEE float, 1: PCM
+    block_align = channels * sample_width
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, format_tag, channels, sample_rate,
+        sample_rate * block_align, block_align, sample_width * 8,
+        b'data', data_size,
+    )
+
+
+def _parse_wav(f, total_size) -> tuple:
+    """
+    WAVのチャンクを読み、(dtype, チャンネル数, サンプルレート, データの位置, フレーム数) を返す。
+    16bit PCM / 32bit float 以外は ValueError を送出する。
+    """
+    try:
+        riff, _, wave_id = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave_id != b'WAVE':
+            raise ValueError("Not a WAV file")
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError("No data chunk")
+            chunk_id, size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                body = f.read(size)
+                format_tag, channels, sample_rate = struct.unpack_from('<HHI', body)
+                (bits,) = struct.unpack_from('<H', body, 14)
+                if format_tag == 0xFFFE and size >= 26:
+                    # WAVE_FORMAT_EXTENSIBLE: サブフォーマットGUIDの先頭2バイトが実際の形式
+                    (format_tag,) = struct.unpack_from('<H', body, 24)
+                fmt = (format_tag, channels, sample_rate, bits)
+            elif chunk_id == b'data':
+                offset = f.tell()
+                break
+            else:
+                f.seek(size + (size & 1), io.SEEK_CUR)
+    except struct.error:
+        raise ValueError("Truncated WAV header")
+
+    if fmt is None:
+        raise ValueError("No fmt chunk")
+    format_tag, channels, sample_rate, bits = fmt
+    dtypes = {(1, 16): np.int16, (3, 32): np.float32}
+    dtype = dtypes.get((format_tag, bits))
+    if dtype is None:
+        raise ValueError(f"Unsupported WAV format (tag {format_tag}, {bits} bit)")
+    frame_size = channels * np.dtype(dtype).itemsize
+    # data チャンクのサイズが壊れている（録音途中で止まったなど）場合は末尾までとする
+    frames = min(size, total_size - offset) // frame_size
+    return dtype, channels, sample_rate, offset, frames
+
+
+class _BufferReader(io.RawIOBase):
+    """複数の memoryview を連結した1つのファイルとして、コピーせずに読ませるリーダー"""
+
+    def __init__(self, views):
+        self._views = [v for v in views if len(v)]
+        self._size = sum(len(v) for v in self._views)
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        written = 0
+        offset = 0
+        for view in self._views:
+            end = offset + len(view)
+            if self._pos < end and written < len(b):
+                start = self._pos - offset
+                n = min(len(b) - written, len(view) - start)
+                b[written:written + n] = view[start:start + n]
+                written += n
+                self._pos += n
+            offset = end
+        return written
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        else:
+            self._pos = self._size + offset
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+
+class RecordedAudio:
+    """
+    録音データ。キャプチャバッファのチャンクをそのまま参照し（コピーしない）、
+    WAVヘッダはその前に論理的に連結される。
+    ディスクを経由せずにメモリ上からそのままアップロードできる。
+    """
+
+    def __init__(self, chunks, sample_rate, channels, dtype):
+        self.chunks = chunks # (frames, channels) の配列ビューのリスト
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+        self.num_frames = sum(len(c) for c in chunks)
+        self.silence_trimmed = False # trim_silence で無音を削った後か（送り先で削り直さないため）
+
+    @classmethod
+    def from_frames(cls, frames, sample_rate, channels):
+        """ブロックのリストから生成する（1つの配列に結合される）"""
+        return cls([np.concatenate(frames, axis=0)], sample_rate, channels, frames[0].dtype)
+
+    @classmethod
+    def load(cls, path: str) -> "RecordedAudio":
+        """
+        WAVファイル（16bit PCM / 32bit float）を読み込む。
+        データ部分はメモリマップで参照するため、長いファイルでも全体を読み込まない。
+        対応していない形式の場合は ValueError を送出する。
+        """
+        with open(path, "rb") as f:
+            dtype, channels, sample_rate, offset, frames = _parse_wav(f, os.path.getsize(path))
+        if frames == 0:
+            return cls([], sample_rate, channels, dtype)
+        samples = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(frames, channels))
+        return cls([samples], sample_rate, channels, dtype)
+
+    @classmethod
+    def from_wav_bytes(cls, data) -> "RecordedAudio":
+        """メモリ上のWAV（load と同じ形式）を、コピーせずにサンプルとして参照する"""
+        dtype, channels, sample_rate, offset, frames = _parse_wav(io.BytesIO(data), len(data))
+        samples = np.frombuffer(data, dtype=dtype, count=frames * channels, offset=offset)
+        return cls([samples.reshape(frames, channels)] if frames else [], sample_rate, channels, dtype)
+
+    @property
+    def samples(self) -> np.ndarray:
+        """
+        サンプル配列 (frames, channels)。
+        チャンクが1つならバッファのビュー、複数にまたがる場合のみ結合したコピーを返す。
+        """
+        if len(self.chunks) == 1:
+            return self.chunks[0]
+        if not self.chunks:
+            return np.empty((0, self.channels), dtype=self.dtype)
+        return np.concatenate(self.chunks, axis=0)
+
+    @property
+    def duration(self) -> float:
+        return self.num_frames / self.sample_rate
+
+    def slice(self, start, end) -> "RecordedAudio":
+        """フレーム [start, end) の部分。チャンクをまたいでもコピーせずにビューで参照する"""
+        chunks = []
+        offset = 0
+        for chunk in self.chunks:
+            lo, hi = max(start - offset, 0), min(end - offset, len(chunk))
+            if lo < hi:
+                chunks.append(chunk[lo:hi])
+            offset += len(chunk)
+        sliced = RecordedAudio(chunks, self.sample_rate, self.channels, self.dtype)
+        sliced.silence_trimmed = self.silence_trimmed
+        return sliced
+
+    @property
+    def data_size(self) -> int:
+        return self.num_frames * self.channels * self.dtype.itemsize
+
+    @property
+    def nbytes(self) -> int:
+        """ヘッダを含むWAVのサイズ"""
+        return WAV_HEADER_SIZE + self.data_size
+
+    def header(self) -> bytes:
+        return _wav_header(self.data_size, self.sample_rate, self.channels, self.dtype)
+
+    def open(self):
+        """WAVデータをファイルオブジェクトとして開く（メモリ上から読み出す）"""
+        views = [memoryview(self.header())]
+        views += [memoryview(c).cast('B') for c in self.chunks]
+        return _BufferReader(views)
+
+    def save(self, path: str) -> None:
+        """WAVファイルとして書き出す（デバッグ用）"""
+        with open(path, "wb") as f:
+            f.write(self.header())
+            for chunk in self.chunks:
+                f.write(memoryview(chunk).cast('B'))
+
+
+class _ChunkAllocator:
+    """
+    キャプチャバッファの次のチャンクを、コールバック（オーディオスレッド）の外で確保するスレッド。
+    全てのバッファで1本を共有し、最初のバッファを作るときに起動する。
+    """
+
+    def __init__(self):
+        self._requests = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="capture-alloc", daemon=True)
+                self._thread.start()
+
+    def request(self, buffer, start) -> None:
+        """start フレーム目から始まるチャンクの確保を依頼する（コールバックから呼ぶ。ブロックしない）"""
+        self._requests.put((buffer, start))
+
+    def _run(self):
+        while True:
+            buffer, start = self._requests.get()
+            try:
+                buffer._next_chunk = (start, buffer._allocate_chunk(start))
+            except Exception as e:
+                # 確保できなければ write がその場で確保する
+                print(f"Capture buffer allocation error: {e}")
+
+
+_allocator = _ChunkAllocator()
+
+
+class CaptureBuffer:
+    """
+    録音用のチャンクアリーナ。
+    大きめのチャンクを事前確保し、コールバックのブロックをその場で書き込む。
+    ブロックごとのコピーや停止時の結合を行わないため、ピークメモリが録音サイズの1倍に収まる。
+    長時間の録音では一定時間を超えた分をメモリマップドファイルに逃がす。
+    次のチャンクは現在のチャンクが半分埋まった時点で別スレッドに確保させ、コールバックでは差し替えるだけにする。
+    """
+    CHUNK_SEC = 30.0         # 1チャンクの長さ
+    SPILL_AFTER_SEC = 600.0  # これを超えた分はメモリマップドファイルに書き込む
+
+    def __init__(self, sample_rate, channels, dtype='float32', chunk_sec=None, spill_after_sec=None):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+        self.chunk_frames = int((chunk_sec or self.CHUNK_SEC) * sample_rate)
+        spill_after_sec = self.SPILL_AFTER_SEC if spill_after_sec is None else spill_after_sec
+        self.spill_after_frames = int(spill_after_sec * sample_rate)
+
+        self._chunks = []
+        self._pos = 0           # 現在のチャンク内の書き込み位置
+        self._split_chunk = 0   # 前回 split した位置（チャンク番号, オフセット）
+        self._split_pos = 0
+        self.num_frames = 0     # 書き込まれた総フレーム数
+        self.spilled = False
+        self._next_chunk = None # 別スレッドで確保した次のチャンク (開始フレーム, 配列)
+        self._requested = False # 次のチャンクの確保を依頼済みか
+        self.inline_allocations = 0 # 確保が間に合わずコールバック内で確保した回数
+
+        # 最初のチャンクはコールバック開始前に確保しておく
+        _allocator.start()
+        self._chunks.append(self._allocate_chunk(0))
+
+    def _allocate_chunk(self, start) -> np.ndarray:
+        """start フレーム目から始まるチャンクを確保する"""
+        shape = (self.chunk_frames, self.channels)
+        if start >= self.spill_after_frames:
+            # 長時間録音: ページキャッシュ経由でディスクに逃がせるメモリマップに確保
+            # （ファイルはクローズ時に自動削除される）
+            self.spilled = True
+            return np.memmap(tempfile.TemporaryFile(suffix=".pcm"), dtype=self.dtype, mode='w+', shape=shape)
+        # np.empty はゼロ埋めしないため、ページは書き込まれた分だけ実メモリを消費する
+        return np.empty(shape, dtype=self.dtype)
+
+    def _next(self) -> np.ndarray:
+        """次のチャンクに切り替える。別スレッドで確保済みならそれを使う"""
+        start = len(self._chunks) * self.chunk_frames
+        prepared, self._next_chunk = self._next_chunk, None
+        self._requested = False
+        if prepared is not None and prepared[0] == start:
+            return prepared[1]
+        self.inline_allocations += 1
+        return self._allocate_chunk(start)
+
+    def write(self, block) -> None:
+        """コールバックのブロックを現在のチャンクへ直接書き込む"""
+        n = len(block)
+        offset = 0
+        while offset < n:
+            chunk = self._chunks[-1]
+            count = min(n - offset, self.chunk_frames - self._pos)
+            chunk[self._pos:self._pos + count] = block[offset:offset + count]
+            self._pos += count
+            offset += count
+            self.num_frames += count
+            if self._pos == self.chunk_frames:
+                self._chunks.append(self._next())
+                self._pos = 0
+        if not self._requested and self._pos * 2 >= self.chunk_frames:
+            self._requested = True
+            _allocator.request(self, len(self._chunks) * self.chunk_frames)
+
+    def split(self) -> list:
+        """
+        前回の split 以降に書き込まれた範囲を、チャンクのビューのリストとして返す（コピーなし）。
+        以降の書き込みは同じチャンクの続きから行われる。
+        """
+        views = []
+        last = len(self._chunks) - 1
+        for i in range(self._split_chunk, last + 1):
+            start = self._split_pos if i == self._split_chunk else 0
+            end = self._pos if i == last else self.chunk_frames
+            if end > start:
+                views.append(self._chunks[i][start:end])
+        # 切り出し済みのチャンクはビュー側だけが参照するようにし、不要になれば解放されるようにする
+        for i in range(self._split_chunk, last):
+            self._chunks[i] = None
+        self._split_chunk = last
+        self._split_pos = self._pos
+        return views
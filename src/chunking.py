@@ -0,0 +1,88 @@
+"""
+長い録音の分割と、分割して文字起こししたテキストの連結。
+
+API の1リクエストのサイズ上限を超えないよう、また1本の長いリクエストより速く終わるよう、
+長い音声を発話の切れ目（無音）で分割して並行して送る。
+区切りの付近に無音が見つからなかった場合だけ、語の途中で切れても補えるよう少し重ねて分割し、
+連結するときに重なった部分の重複したテキストを取り除く。
+"""
+import difflib
+
+import numpy as np
+
+from src.vad import SPEECH_RMS, audio_levels
+
+OVERLAP_SEC = 1.0         # 無音で切れなかった区切りで前のチャンクと重ねる長さ
+SEARCH_SEC = 10.0         # 上限の手前のこの範囲から、最も静かな位置を区切りに選ぶ
+QUIET_WINDOW_SEC = 0.3    # 静かさはこの長さで平均して判定する（単発の静かなフレームで切らない）
+MAX_UPLOAD_BYTES = 24 * 1024 * 1024 # API の上限 (25 MB) に余裕を持たせた1チャンクのサイズの上限
+
+OVERLAP_WINDOW_CHARS = 24 # 重複を探す範囲（前のテキストの末尾・次のテキストの先頭の文字数）
+MIN_OVERLAP_CHARS = 4     # これより短い一致は偶然の一致とみなして取り除かない
+
+
+def max_chunk_frames(audio, chunk_sec) -> int:
+    """1チャンクのフレーム数の上限（設定の長さと、アップロードサイズの上限の小さい方）"""
+    frame_bytes = audio.channels * audio.dtype.itemsize
+    return max(1, min(int(chunk_sec * audio.sample_rate), MAX_UPLOAD_BYTES // frame_bytes))
+
+
+def split_at_silences(audio, chunk_sec, overlap_sec=OVERLAP_SEC):
+    """
+    audio (RecordedAudio) を chunk_sec 以下のチャンクに分割し、[(チャンク, 前と重なっているか)] を返す。
+    区切りは上限の手前 SEARCH_SEC の範囲で最も静かな位置にする。短ければ [(audio, False)] を返す。
+    チャンクは元の音声のビュー（コピーしない）。
+    """
+    limit = max_chunk_frames(audio, chunk_sec)
+    total = audio.num_frames
+    if total <= limit:
+        return [(audio, False)]
+
+    levels, starts = audio_levels(audio)
+    sample_rate = audio.sample_rate
+    frame_len = int(starts[1] - starts[0]) if len(starts) > 1 else 1
+    window = max(1, int(QUIET_WINDOW_SEC * sample_rate / frame_len))
+    quietness = np.convolve(levels, np.ones(window) / window, mode='same') if len(levels) else levels
+    overlap = int(overlap_sec * sample_rate)
+    search = int(min(SEARCH_SEC * sample_rate, limit // 2))
+
+    chunks = []
+    start, overlapped = 0, False
+    while total - start > limit:
+        # 重ねた分を含めても上限を超えない範囲で、最も静かなフレームの位置で切る
+        hi = start + limit
+        candidates = np.flatnonzero((starts >= hi - search) & (starts + frame_len <= hi))
+        if len(candidates):
+            best = candidates[np.argmin(quietness[candidates])]
+            cut = int(starts[best]) + frame_len // 2
+            silent = quietness[best] < SPEECH_RMS
+        else:
+            cut, silent = hi, False
+        chunks.append((audio.slice(start, cut), overlapped))
+        # 無音で切れなかった場合は、次のチャンクを少し手前から始める
+        overlapped = not silent and overlap > 0
+        start = cut - overlap if overlapped else cut
+    chunks.append((audio.slice(start, total), overlapped))
+    return chunks
+
+
+def merge_texts(texts, overlapped) -> str:
+    """
+    チャンクごとのテキストを連結する。overlapped[i] が真のチャンクは前のチャンクと音声が重なっているため、
+    前のテキストの末尾と次のテキストの先頭で最も長く一致する部分を1回分だけ残す。
+    """
+    merged = ""
+    for text, overlaps in zip(texts, overlapped):
+        text = text.strip()
+        if not merged or not overlaps:
+            merged += text
+            continue
+        tail = merged[-OVERLAP_WINDOW_CHARS:]
+        head = text[:OVERLAP_WINDOW_CHARS]
+        match = difflib.SequenceMatcher(None, tail, head, autojunk=False).find_longest_match(0, len(tail), 0, len(head))
+        if match.size < MIN_OVERLAP_CHARS:
+            merged += text
+            continue
+        # 一致部分より後ろの前のテキスト（重なりで途切れた語）と、一致部分より前の次のテキストを捨てる
+        merged = merged[:len(merged) - len(tail) + match.a] + text[match.b:]
+    return merged
@@ -1,6 +1,6 @@
 import os
-import keyring
 import json
+import threading
 from pathlib import Path
 
 class ConfigManager:
@@ -9,30 +9,66 @@ class ConfigManager:
     SERVICE_NAME = "rb10-whisper"
     USER_NAME = "user_api_key" # 単一ユーザー想定なので固定
     _config_cache = None
+    _api_key_cache = None # None は未読み込み
+    _api_key_valid = False
+    _key_lock = threading.Lock()
+    config_version = 0 # 設定が読み込み・保存されるたびに増える（派生キャッシュの無効化用）
 
     @classmethod
     def load_api_key(cls) -> str:
-        """OSのCredential ManagerからOpenAI APIキーを取得する。"""
-        try:
-            key = keyring.get_password(cls.SERVICE_NAME, cls.USER_NAME)
-            return key if key else ""
-        except Exception as e:
-            print(f"Keyring Load Error: {e}")
-            return ""
+        """
+        OpenAI APIキーを取得する。
+        OSのCredential Managerは遅く固まることもあるため、読むのは初回（と明示的な再読み込み時）だけで、
+        以降はプロセス内のキャッシュを返す。
+        """
+        with cls._key_lock:
+            if cls._api_key_cache is None:
+                try:
+                    # keyring は読み込みが重いので、起動時のホットキー登録に必要な設定の読み込みでは import しない
+                    import keyring
+                    key = keyring.get_password(cls.SERVICE_NAME, cls.USER_NAME)
+                except Exception as e:
+                    # 読み込みに失敗した場合はキャッシュせず、次回また読みに行く
+                    print(f"Keyring Load Error: {e}")
+                    return ""
+                cls._set_api_key_cache(key or "")
+            return cls._api_key_cache
+
+    @classmethod
+    def reload_api_key(cls) -> str:
+        """キャッシュを破棄してCredential Managerから読み直す"""
+        with cls._key_lock:
+            cls._api_key_cache = None
+            cls._api_key_valid = False
+        return cls.load_api_key()
 
     @classmethod
     def save_api_key(cls, api_key: str) -> None:
-        """APIキーをOSのCredential Managerに保存する。"""
+        """APIキーをOSのCredential Managerに保存する（キャッシュも更新）。"""
         try:
+            import keyring
             keyring.set_password(cls.SERVICE_NAME, cls.USER_NAME, api_key)
         except Exception as e:
             print(f"Keyring Save Error: {e}")
+            # 保存できたか分からないため、次回は読み直す
+            with cls._key_lock:
+                cls._api_key_cache = None
+                cls._api_key_valid = False
+            return
+        with cls._key_lock:
+            cls._set_api_key_cache(api_key)
+
+    @classmethod
+    def _set_api_key_cache(cls, key: str) -> None:
+        cls._api_key_cache = key
+        cls._api_key_valid = key.startswith("sk-") and len(key) > 20
 
     @classmethod
     def has_valid_key(cls) -> bool:
-        """有効そうなAPIキーが存在するか簡易チェック。"""
-        key = cls.load_api_key()
-        return key.startswith("sk-") and len(key) > 20
+        """有効そうなAPIキーが存在するか簡易チェック。ホットキーの処理から呼ばれるため、通常はキャッシュを見るだけ。"""
+        if cls._api_key_cache is None:
+            cls.load_api_key()
+        return cls._api_key_valid
 
     @classmethod
     def _get_config_path(cls) -> Path:
@@ -49,7 +85,35 @@ class ConfigManager:
             return cls._config_cache
 
         path = cls._get_config_path()
-        defaults = {"hotkey": "shift"}
+        defaults = {
+            "hotkey": "shift",
+            "pipelined": True,
+            "sample_format": "int16",
+            "warm_capture": False,
+            "preroll_sec": 0.3,
+            "trim_silence": True,
+            "speech_gate": True,
+            "speech_gate_log": True,
+            "debug_save_wav": False,
+            "replacements": {},
+            "snippets": {},
+            "max_parallel_jobs": 2,
+            "backend": "openai",
+            "local_model": "small",
+            "local_device": "cpu",
+            "local_compute_type": "int8",
+            "overlay_renderer": "canvas",
+            "latency_trace": True,
+            "transcript_cache": True,
+            "transcript_cache_mb": 50,
+            "output_sinks": ["paste"],
+            "restore_clipboard": True,
+            "chunk_sec": 120,
+            "chunk_parallelism": 4,
+            "daemon": "off",
+            "daemon_port": 8765,
+        }
+        cls.config_version += 1
         if not path.exists():
             cls._config_cache = defaults
             return defaults
@@ -72,6 +136,7 @@ class ConfigManager:
     def save_config(cls, config: dict) -> None:
         """一般設定をセーブ（キャッシュも更新）"""
         cls._config_cache = config
+        cls.config_version += 1
         path = cls._get_config_path()
         try:
             with open(path, "w", encoding="utf-8") as f:
@@ -91,3 +156,198 @@ class ConfigManager:
         config = cls.load_config()
         config["hotkey"] = hotkey
         cls.save_config(config)
+
+    @classmethod
+    def get_pipelined(cls) -> bool:
+        """録音中にセグメント単位で文字起こしを進めるか"""
+        config = cls.load_config()
+        return bool(config.get("pipelined", True))
+
+    @classmethod
+    def get_warm_capture(cls) -> bool:
+        """マイクの入力ストリームを開いたままにし、ホットキーを押した時点から録音を始めるか"""
+        config = cls.load_config()
+        return bool(config.get("warm_capture", False))
+
+    @classmethod
+    def get_preroll_sec(cls) -> float:
+        """warm_capture のとき、ホットキーを押す前から録音に含める長さ（秒）"""
+        config = cls.load_config()
+        try:
+            return min(2.0, max(0.0, float(config.get("preroll_sec", 0.3))))
+        except (TypeError, ValueError):
+            return 0.3
+
+    @classmethod
+    def get_debug_save_wav(cls) -> bool:
+        """デバッグ用に録音を一時WAVファイルとして残すか"""
+        config = cls.load_config()
+        return bool(config.get("debug_save_wav", False))
+
+    @classmethod
+    def get_sample_format(cls) -> str:
+        """録音・送信するサンプル形式 ("int16" または "float32")"""
+        config = cls.load_config()
+        sample_format = config.get("sample_format", "int16")
+        if sample_format not in ("int16", "float32"):
+            return "int16"
+        return sample_format
+
+    @classmethod
+    def get_trim_silence(cls) -> bool:
+        """送信前に前後の無音を削り、長い間を詰めるか"""
+        config = cls.load_config()
+        return bool(config.get("trim_silence", True))
+
+    @classmethod
+    def get_speech_gate(cls) -> bool:
+        """発話の有無をノイズフロア基準で判定するか（False なら従来どおり最大音量で判定する）"""
+        config = cls.load_config()
+        return bool(config.get("speech_gate", True))
+
+    @classmethod
+    def get_speech_gate_log(cls) -> bool:
+        """発話の有無の判定を speech_gate.jsonl に記録するか"""
+        config = cls.load_config()
+        return bool(config.get("speech_gate_log", True))
+
+    @classmethod
+    def get_speech_gate_log_path(cls) -> Path:
+        """発話の有無の判定の記録の保存先（設定ファイルと同じフォルダ）"""
+        return cls._get_config_path().parent / "speech_gate.jsonl"
+
+    @classmethod
+    def get_noise_floor_path(cls) -> Path:
+        """入力デバイスごとのノイズフロアの保存先（設定ファイルと同じフォルダ）"""
+        return cls._get_config_path().parent / "noise_floor.json"
+
+    @classmethod
+    def get_dictionaries(cls) -> tuple:
+        """ユーザー辞書 (置換辞書, スニペット辞書) を取得"""
+        config = cls.load_config()
+        return config.get("replacements") or {}, config.get("snippets") or {}
+
+    @classmethod
+    def get_backend(cls) -> str:
+        """文字起こしバックエンド ("openai" または "local")"""
+        config = cls.load_config()
+        return config.get("backend", "openai")
+
+    @classmethod
+    def get_local_model_options(cls) -> dict:
+        """ローカルバックエンドのモデル設定"""
+        config = cls.load_config()
+        return {
+            "model_size": config.get("local_model", "small"),
+            "device": config.get("local_device", "cpu"),
+            "compute_type": config.get("local_compute_type", "int8"),
+        }
+
+    @classmethod
+    def get_max_parallel_jobs(cls) -> int:
+        """同時に文字起こしするジョブ数の上限"""
+        config = cls.load_config()
+        try:
+            return max(1, int(config.get("max_parallel_jobs", 2)))
+        except (TypeError, ValueError):
+            return 2
+
+    @classmethod
+    def get_overlay_renderer(cls) -> str:
+        """オーバーレイの描画方式 ("canvas" または "image")"""
+        config = cls.load_config()
+        renderer = config.get("overlay_renderer", "canvas")
+        if renderer not in ("canvas", "image"):
+            return "canvas"
+        return renderer
+
+    @classmethod
+    def get_latency_trace(cls) -> bool:
+        """口述ごとのレイテンシを latency.jsonl に記録するか"""
+        config = cls.load_config()
+        return bool(config.get("latency_trace", True))
+
+    @classmethod
+    def get_latency_log_path(cls) -> Path:
+        """レイテンシ記録の保存先（設定ファイルと同じフォルダ）"""
+        return cls._get_config_path().parent / "latency.jsonl"
+
+    @classmethod
+    def get_output_sinks(cls) -> list:
+        """文字起こし結果の出力先 ("paste" / "stdout" / "file:パス" / "socket:ホスト:ポート") のリスト"""
+        config = cls.load_config()
+        sinks = config.get("output_sinks", ["paste"])
+        if isinstance(sinks, str):
+            return [sinks]
+        return list(sinks) or ["paste"]
+
+    @classmethod
+    def get_restore_clipboard(cls) -> bool:
+        """ペースト後に元のクリップボードの内容に戻すか"""
+        config = cls.load_config()
+        return bool(config.get("restore_clipboard", True))
+
+    @classmethod
+    def get_transcript_cache(cls) -> bool:
+        """同じ音声の文字起こし結果をキャッシュして再送信しないか"""
+        config = cls.load_config()
+        return bool(config.get("transcript_cache", True))
+
+    @classmethod
+    def get_transcript_cache_bytes(cls) -> int:
+        """文字起こしキャッシュの合計サイズの上限（バイト）"""
+        config = cls.load_config()
+        try:
+            return max(0, int(config.get("transcript_cache_mb", 50))) * 1024 * 1024
+        except (TypeError, ValueError):
+            return 50 * 1024 * 1024
+
+    @classmethod
+    def get_transcript_cache_dir(cls) -> Path:
+        """文字起こしキャッシュの保存先（設定ファイルと同じフォルダの cache）"""
+        return cls._get_config_path().parent / "cache"
+
+    @classmethod
+    def get_chunk_sec(cls) -> float:
+        """長い音声を分割して送るときの1チャンクの長さの上限（秒）"""
+        config = cls.load_config()
+        try:
+            return max(10.0, float(config.get("chunk_sec", 120)))
+        except (TypeError, ValueError):
+            return 120.0
+
+    @classmethod
+    def get_chunk_parallelism(cls) -> int:
+        """分割したチャンクを同時に送る数"""
+        config = cls.load_config()
+        try:
+            return max(1, int(config.get("chunk_parallelism", 4)))
+        except (TypeError, ValueError):
+            return 4
+
+    @classmethod
+    def get_daemon_mode(cls) -> str:
+        """
+        ローカルの口述デーモンの使い方。
+        "off": 使わない / "serve": このアプリでデーモンを起動し、自身もそのクライアントになる /
+        "connect": 別に起動しているデーモンに送る
+        """
+        config = cls.load_config()
+        mode = config.get("daemon", "off")
+        if mode not in ("off", "serve", "connect"):
+            return "off"
+        return mode
+
+    @classmethod
+    def get_daemon_port(cls) -> int:
+        """口述デーモンが待ち受けるポート (127.0.0.1)"""
+        config = cls.load_config()
+        try:
+            return int(config.get("daemon_port", 8765))
+        except (TypeError, ValueError):
+            return 8765
+
+    @classmethod
+    def get_server_info_path(cls) -> Path:
+        """起動中の口述デーモンの接続先とトークンを書くファイル（設定ファイルと同じフォルダ）"""
+        return cls._get_config_path().parent / "server.json"
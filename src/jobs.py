@@ -0,0 +1,85 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src import tracing
+
+
+class TranscriptionQueue:
+    """
+    録音ごとの文字起こしジョブを有限個のワーカーで並行処理し、
+    結果は完了順ではなく投入順に on_result へ届けるキュー。
+    前の文字起こしを待たずに次の録音を始められるようにするためのもの。
+    """
+
+    def __init__(self, max_workers=2, on_result=None, on_depth_changed=None):
+        self.on_result = on_result               # (text: str, error: Exception | None) -> None
+        self.on_depth_changed = on_depth_changed # (depth: int) -> None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._delivery_lock = threading.Lock()   # 結果の受け渡し（ペースト）を1件ずつ行う
+        self._next_seq = 0
+        self._deliver_seq = 0
+        self._results = {}                       # seq -> (text, error)
+
+    @property
+    def depth(self) -> int:
+        """投入済みで、まだ結果を届けていないジョブの数"""
+        with self._lock:
+            return self._next_seq - self._deliver_seq
+
+    def submit(self, work) -> int:
+        """
+        work() -> str をジョブとして投入し、投入順の番号を返す。
+        work と結果の受け渡し (on_result) は投入時のコンテキスト（トレース）で実行する。
+        """
+        context = contextvars.copy_context()
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+        self._notify_depth()
+        self._executor.submit(self._run, seq, work, context, time.perf_counter())
+        return seq
+
+    def _run(self, seq, work, context, submitted):
+        context.run(self._record_wait, submitted)
+        try:
+            result = (context.run(work), None)
+        except Exception as e:
+            result = ("", e)
+        with self._lock:
+            self._results[seq] = (result, context)
+        self._deliver_ready()
+
+    @staticmethod
+    def _record_wait(submitted):
+        trace = tracing.current()
+        if trace is not None:
+            trace.add_span("queue", submitted, time.perf_counter())
+
+    def _deliver_ready(self):
+        """先頭から連続して完了しているジョブの結果を順番に届ける"""
+        with self._delivery_lock:
+            while True:
+                with self._lock:
+                    entry = self._results.pop(self._deliver_seq, None)
+                if entry is None:
+                    return
+                result, context = entry
+                try:
+                    if self.on_result:
+                        context.run(self.on_result, *result)
+                except Exception as e:
+                    print(f"Job Result Error: {e}")
+                finally:
+                    with self._lock:
+                        self._deliver_seq += 1
+                    self._notify_depth()
+
+    def _notify_depth(self):
+        if self.on_depth_changed:
+            self.on_depth_changed(self.depth)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,22 +1,27 @@
+import time
+# 起動時間の計測の起点（以降の import も含めて計る）
+STARTUP_AT = time.perf_counter()
+
 import tkinter as tk
 import threading
+import queue
 import keyboard
-import pyperclip
-import pyautogui
 import os
-import time
 import sys
 import traceback
 
 # 3rd party
 import pystray
-from PIL import Image, ImageDraw
 
 # ログ出力用関数
 def log_error(msg):
     with open("error.log", "a", encoding="utf-8") as f:
         f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {msg}\n")
 
+def log_startup(label):
+    """起動の節目をプロセス開始（main の読み込み開始）からの経過時間とともに出力する"""
+    print(f"Startup: {label} at {(time.perf_counter() - STARTUP_AT) * 1000:.0f} ms")
+
 # プロジェクトルートパスをsys.pathに追加して、srcモジュールを解決できるようにする
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
@@ -30,18 +35,13 @@ if not getattr(sys, 'frozen', False):
         os.environ["TCL_LIBRARY"] = tcl_lib
         os.environ["TK_LIBRARY"] = tk_lib
 
+# トレイとホットキーの登録に必要なものだけを先に読み込む
 try:
     try:
-        from src.ui import OverlayWindow, SettingsWindow
-        from src.audio import AudioRecorder
-        from src.transcriber import Transcriber
         from src.config import ConfigManager
     except ImportError:
         # exe化された場合や src 内部から実行された場合のフォールバック
         # PyInstallerでは構造がフラットになることが多いため
-        from ui import OverlayWindow, SettingsWindow
-        from audio import AudioRecorder
-        from transcriber import Transcriber
         from config import ConfigManager
 except ImportError as e:
     log_error(f"Import Error: {e}\n{traceback.format_exc()}")
@@ -54,8 +54,67 @@ except ImportError as e:
         pass
     sys.exit(1)
 
+def import_services():
+    """
+    録音・文字起こし・UI部品・出力先に使う重いモジュール（openai, numpy, PIL など）を読み込む。
+    トレイとホットキーを先に有効にするため、起動後にバックグラウンドのスレッドから呼ぶ。
+    """
+    global OverlayWindow, SettingsWindow, AudioRecorder, Transcriber, TranscriptionError
+    global SegmentPipeline, EventLoopThread, AsyncTranscriptionQueue, trim_silence, SpeechGate, create_cache, tracing
+    global OutputRouter, create_sinks, DaemonBackend, DictationServer, DictationService
+    try:
+        from src.ui import OverlayWindow, SettingsWindow
+        from src.audio import AudioRecorder
+        from src.transcriber import Transcriber
+        from src.request_policy import TranscriptionError
+        from src.pipeline import SegmentPipeline
+        from src.async_jobs import EventLoopThread, AsyncTranscriptionQueue
+        from src.vad import trim_silence, SpeechGate
+        from src.transcript_cache import create_cache
+        from src.sinks import OutputRouter, create_sinks
+        from src.backends import DaemonBackend
+        from src.server import DictationServer, DictationService
+        from src import tracing
+    except ImportError:
+        from ui import OverlayWindow, SettingsWindow
+        from audio import AudioRecorder
+        from transcriber import Transcriber
+        from request_policy import TranscriptionError
+        from pipeline import SegmentPipeline
+        from async_jobs import EventLoopThread, AsyncTranscriptionQueue
+        from vad import trim_silence, SpeechGate
+        from transcript_cache import create_cache
+        from sinks import OutputRouter, create_sinks
+        from backends import DaemonBackend
+        from server import DictationServer, DictationService
+        import tracing
+
+# アイコンのデザインを変えたら上げる（ディスクに保存した古い画像を使わないように）
+ICON_VERSION = 1
+
+def load_tray_icon():
+    """
+    トレイアイコンの画像。描画と縮小は初回だけ行い、PNG として設定フォルダに保存したものを次回から読み込む。
+    """
+    from PIL import Image
+    path = ConfigManager._get_config_path().parent / f"tray_icon_v{ICON_VERSION}.png"
+    try:
+        with Image.open(path) as cached:
+            cached.load()
+            return cached.copy()
+    except (OSError, ValueError):
+        pass
+    image = create_icon_image()
+    try:
+        image.save(path)
+    except OSError as e:
+        print(f"Icon Cache Error: {e}")
+    return image
+
 def create_icon_image():
     """システムトレイ用のアイコン画像を生成する"""
+    from PIL import Image, ImageDraw
+
     # 64x64のアイコンを作成
     # 高解像度で描画してから縮小してアンチエイリアスを効かせる
     size = 256
@@ -124,17 +183,28 @@ def create_icon_image():
     return image
 
 class AudioInputApp:
+    JOB_TIMEOUT_MARGIN_SEC = 15.0
     def __init__(self):
         self.root = tk.Tk()
         self.root.withdraw() # メインウィンドウは隠す
 
-        self.recorder = AudioRecorder()
-        self.transcriber = Transcriber()
-        self.overlay = OverlayWindow(self.root)
+        # 録音・文字起こしの部品は、トレイとホットキーを有効にした後でバックグラウンドで読み込む
+        self.ready = False
+        self.recorder = None
+        self.speech_gate = None # 録音に発話が含まれるかの判定 (SpeechGate)
+        self.transcriber = None
+        self.overlay = None
+        self.jobs = None
+        self.output = None # 文字起こし結果の出力先（ペーストなど）
+        self.daemon = None # このアプリで起動した口述デーモン（daemon = "serve" のとき）
+        self.pipeline = None # 録音中に並行して文字起こしするパイプライン
+        self.loop = None # 録音停止後の処理を実行するイベントループ (EventLoopThread)
+        # 他のスレッドから Tk スレッドへの依頼（_call_in_ui）
+        self._ui_calls = queue.SimpleQueue()
+        self._ui_lock = threading.Lock()
+        self._ui_drain_pending = False
         
         self.is_recording = False
-        self.processing = False
-        self.processing_start_time = 0
         self.last_toggle_time = 0
         self.tray_icon = None
         
@@ -146,15 +216,127 @@ class AudioInputApp:
         self._last_press_time = 0
         self._other_key_pressed_during_hold = False
         self._hold_timer = None
+        # 長押しと確定する前に、キーを押した時点から先行して始めた録音があるか（warm_capture のとき）
+        self._speculative = False
         
         self.reload_hotkeys()
         
         self.last_watchdog_time = time.time()
         self._monitor_watchdog()
         
-        self._check_api_key_on_startup()
         self._setup_tray_icon()
 
+    def _load_services(self):
+        """（バックグラウンドスレッド）重いモジュールを読み込み、録音と文字起こしの部品を作る"""
+        try:
+            import_services()
+            recorder = AudioRecorder(
+                sample_format=ConfigManager.get_sample_format(),
+                save_to_file=ConfigManager.get_debug_save_wav(),
+            )
+            if ConfigManager.get_warm_capture():
+                # 録音開始のたびにデバイスを開く待ち時間をなくす（失敗したら録音のたびに開く）
+                try:
+                    recorder.open_warm(ConfigManager.get_preroll_sec())
+                except Exception as e:
+                    print(f"Warm Capture Error: {e}")
+            speech_gate = SpeechGate(
+                ConfigManager.get_noise_floor_path(),
+                log_path=ConfigManager.get_speech_gate_log_path() if ConfigManager.get_speech_gate_log() else None,
+            )
+            transcriber = self._create_transcriber()
+            # 録音停止後の処理（加工・送信・整形・出力）はこのループ上で実行する
+            loop = EventLoopThread()
+            transcriber.attach_loop(loop.loop)
+            # ペースト用の pyperclip / pyautogui もここで読み込まれる
+            output = OutputRouter(create_sinks(ConfigManager.get_output_sinks(),
+                                               restore_clipboard=ConfigManager.get_restore_clipboard()))
+        except Exception as e:
+            log_error(f"Service Load Error: {e}\n{traceback.format_exc()}")
+            self._call_in_ui(self._on_services_failed, e)
+            return
+        self._call_in_ui(self._on_services_loaded, recorder, speech_gate, transcriber, output, loop)
+
+    def _create_transcriber(self):
+        """
+        設定の daemon に応じた Transcriber を作る。
+        "serve" ではデーモンを起動し、このアプリも他のクライアントと同じくデーモンに音声を送る。
+        ポートが使用中（別のデーモンが起動済み）なら、そのデーモンに送る。
+        """
+        mode = ConfigManager.get_daemon_mode()
+        if mode == "serve":
+            service = DictationService(Transcriber(cache=create_cache()), trim=ConfigManager.get_trim_silence())
+            try:
+                self.daemon = DictationServer(service, port=ConfigManager.get_daemon_port())
+            except OSError as e:
+                print(f"Daemon Start Error: {e}. Connecting to the running daemon instead.")
+                service.shutdown()
+            else:
+                self.daemon.start()
+        if mode == "off":
+            return Transcriber(cache=create_cache())
+        # 整形・辞書はこのアプリの設定で行い、キャッシュはデーモン側で持つ
+        return Transcriber(DaemonBackend(client_id="tray"), cache=None)
+
+    def _on_services_loaded(self, recorder, speech_gate, transcriber, output, loop):
+        """Tk の部品（オーバーレイ）は Tk スレッドで作る"""
+        self.recorder = recorder
+        self.speech_gate = speech_gate
+        self.transcriber = transcriber
+        self.output = output
+        self.loop = loop
+        # 音量はオーディオスレッドから通知せず、オーバーレイが描画フレームごとに読みに行く
+        self.overlay = OverlayWindow(self.root, level_source=self.recorder.meter.read)
+        # 文字起こしジョブのキュー。前の文字起こしを待たずに次の録音を始められる
+        self.jobs = AsyncTranscriptionQueue(
+            self.loop,
+            max_jobs=ConfigManager.get_max_parallel_jobs(),
+            on_result=self._deliver_result,
+            on_depth_changed=lambda depth: self._call_in_ui(self._on_queue_changed),
+        )
+        self.ready = True
+        log_startup("services ready")
+        self._check_api_key_on_startup()
+
+    def _on_services_failed(self, error):
+        try:
+            import tkinter.messagebox
+            tkinter.messagebox.showerror("Startup Error", f"Failed to load components:\n{error}")
+        except:
+            pass
+        self._on_exit()
+
+    def _call_in_ui(self, fn, *args):
+        """
+        他のスレッド（キーボードフック・トレイ・イベントループ・出力）から Tk スレッドへ処理を渡す唯一の窓口。
+        依頼はキューに積み、Tk スレッドで積まれた順にまとめて実行する。
+        """
+        self._ui_calls.put((fn, args))
+        with self._ui_lock:
+            if self._ui_drain_pending:
+                return
+            self._ui_drain_pending = True
+        self.root.after(0, self._drain_ui_calls)
+
+    def _drain_ui_calls(self):
+        with self._ui_lock:
+            self._ui_drain_pending = False
+        while True:
+            try:
+                fn, args = self._ui_calls.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                fn(*args)
+            except Exception as e:
+                log_error(f"UI Call Error: {e}\n{traceback.format_exc()}")
+
+    def _services_ready(self) -> bool:
+        """起動直後でまだ読み込み中なら、操作を受け付けずにその旨を出力する"""
+        if not self.ready:
+            print("Still starting up. Please try again in a moment.")
+        return self.ready
+
     def _on_key_event(self, event):
         """全てのキーイベントを監視し、対象ホットキーとの相互作用を管理する"""
         if not self._hotkey_name:
@@ -162,7 +344,7 @@ class AudioInputApp:
 
         # ESCキーでのキャンセル
         if event.name == "esc" and event.event_type == keyboard.KEY_DOWN:
-            self.root.after(0, self.cancel_recording)
+            self._call_in_ui(self.cancel_recording)
             return
 
         is_target_key = (event.name.lower() == self._hotkey_name)
@@ -172,6 +354,8 @@ class AudioInputApp:
                 # 対象外のキーが押された場合、修飾キーとしての利用（ショートカット等）とみなす
                 if self._key_held:
                     self._other_key_pressed_during_hold = True
+                    # ショートカットの修飾キーとして使われたため、先行して始めた録音を捨てる
+                    self._call_in_ui(self._discard_speculative_capture)
             else:
                 # 対象ホットキーが押下された
                 if not self._key_held:
@@ -182,21 +366,28 @@ class AudioInputApp:
                     if self._hold_timer:
                         self.root.after_cancel(self._hold_timer)
                     self._hold_timer = self.root.after(300, self._check_hold_start)
+                    # ストリームを開いたままなら、長押しの確定を待たずに録音を始めておく
+                    if self.ready and self.recorder.warm:
+                        self._call_in_ui(self._begin_speculative_capture)
 
         elif event.event_type == keyboard.KEY_UP:
             if is_target_key:
                 self._key_held = False
+                # レイテンシ計測の起点（キーを離した時刻）
+                key_up_at = time.perf_counter()
                 
                 # ホールド録音中だがトグル状態でないなら終了
                 if self.is_recording and not self._is_toggled:
-                    self.root.after(0, self.stop_and_transcribe)
+                    self._call_in_ui(self.stop_and_transcribe, key_up_at)
+                # 長押しと確定する前に離された（タップ）場合は、先行して始めた録音を捨てる
+                self._call_in_ui(self._discard_speculative_capture)
 
                 # 他のキーが割り込んでいなかった場合のみタップとみなす
                 if not self._other_key_pressed_during_hold:
                     current_time = time.time()
                     # 前回のタップから0.4秒以内で、かつ録音中でなければダブルタップと判定
                     if current_time - self._last_press_time < 0.4:
-                        self.root.after(0, self._handle_double_tap)
+                        self._call_in_ui(self._handle_double_tap, key_up_at)
                         self._last_press_time = 0 # リセット
                     else:
                         self._last_press_time = current_time
@@ -205,22 +396,36 @@ class AudioInputApp:
         """ホールド（長押し）による録音開始を判定"""
         # まだ押されており、かつ他のキーが割り込んでいない場合のみ
         if self._key_held and not self._other_key_pressed_during_hold:
-            if not self.is_recording and not self.processing:
+            if not self.is_recording and self._services_ready():
                 # トグル状態でない純粋なホールド開始
                 self._is_toggled = False
                 self.start_recording()
 
-    def _handle_double_tap(self):
+    def _begin_speculative_capture(self):
+        """ホットキーを押した時点で、長押しと確定する前に録音を始めておく（プリロールを含む）"""
+        if not self.ready or self.is_recording or self._speculative:
+            return
+        self._speculative = True
+        self.recorder.start()
+
+    def _discard_speculative_capture(self):
+        """先行して始めた録音が録音として確定しなかった場合に捨てる"""
+        if not self._speculative or self.is_recording:
+            return
+        self._speculative = False
+        self.recorder.discard()
+
+    def _handle_double_tap(self, key_up_at=None):
         """ダブルタップ時のトグル切り替え"""
         if self._is_toggled:
             # トグル解除
             self._is_toggled = False
             if self.is_recording:
-                self.stop_and_transcribe()
+                self.stop_and_transcribe(key_up_at)
         else:
             # トグルによる録音開始
-            if not self.is_recording and not self.processing:
-                if not ConfigManager.has_valid_key():
+            if not self.is_recording and self._services_ready():
+                if not self._has_credentials():
                     self._open_settings()
                     return
                 self._is_toggled = True
@@ -251,6 +456,14 @@ class AudioInputApp:
             if current_time - self.last_watchdog_time > 8:
                 print("System resume detected. Reloading hotkeys...")
                 self.reload_hotkeys()
+                # スリープ前の接続は切れているため作り直す
+                if self.transcriber:
+                    self.transcriber.reset_connection()
+                if self.daemon:
+                    self.daemon.service.transcriber.reset_connection()
+                # 開いたままのマイクのストリームも、復帰後のデバイスで開き直す
+                if self.recorder and not self.is_recording and not self._speculative:
+                    self.recorder.reopen_stream()
 
             self.last_watchdog_time = current_time
         except Exception as e:
@@ -261,7 +474,7 @@ class AudioInputApp:
 
     def _setup_tray_icon(self):
         """システムトレイアイコンの設定"""
-        image = create_icon_image()
+        image = load_tray_icon()
         menu = pystray.Menu(
             pystray.MenuItem("Settings", self._open_settings_from_tray),
             pystray.MenuItem("Exit", self._quit_app_from_tray)
@@ -270,22 +483,30 @@ class AudioInputApp:
 
     def _open_settings_from_tray(self, icon, item):
         # トレイスレッドからTkinterスレッドへ依頼
-        self.root.after(0, self._open_settings)
+        self._call_in_ui(lambda: self._services_ready() and self._open_settings())
 
     def _quit_app_from_tray(self, icon, item):
         # トレイスレッドからTkinterスレッドへ依頼
-        self.root.after(0, self._on_exit)
+        self._call_in_ui(self._on_exit)
 
     def _check_api_key_on_startup(self):
         """起動時にAPIキーを確認"""
         print("Initializing application...")
-        if not ConfigManager.has_valid_key():
+        if not self._has_credentials():
             print("API Key not found. Opening settings...")
             self._open_settings()
         else:
             hotkey = ConfigManager.get_hotkey()
             print(f"Ready to record (Press {hotkey.upper()})")
 
+    def _has_credentials(self) -> bool:
+        """文字起こしに必要な認証情報があるか（ローカルバックエンドではAPIキー不要）"""
+        # デーモンを起動している場合は、そのデーモンが使うバックエンドの認証情報が要る
+        backend = (self.daemon.service.transcriber if self.daemon else self.transcriber).backend
+        if not backend.requires_api_key:
+            return True
+        return ConfigManager.has_valid_key()
+
     def _open_settings(self):
         """設定画面を開く"""
         # リスト選択式への変更に伴い、設定中のホットキー停止は不要（むしろ混乱の元）なため削除
@@ -296,6 +517,8 @@ class AudioInputApp:
                 print("Hotkey config updated via settings.")
             elif saved is True:
                 self.transcriber.reload_key()
+                if self.daemon:
+                    self.daemon.service.transcriber.reload_key()
                 self.reload_hotkeys()
                 print("All settings reloaded.")
             else:
@@ -313,19 +536,12 @@ class AudioInputApp:
             return
         self.last_toggle_time = current_time
 
-        if not ConfigManager.has_valid_key():
+        if not self._services_ready():
+            return
+        if not self._has_credentials():
             self._open_settings()
             return
 
-        if self.processing:
-            # スタック対策: 一定時間以上処理中の場合は強制リセット
-            if time.time() - self.processing_start_time > 35:
-                print("Warning: Processing state stuck. Force resetting.")
-                self.processing = False
-                self.overlay.hide()
-            else:
-                return # 処理中は無視
-
         if not self.is_recording:
             self.start_recording()
         else:
@@ -335,91 +551,180 @@ class AudioInputApp:
         print("Start Recording...")
         self.is_recording = True
         self.overlay.show()
+
+        # 話している間に API への接続を確立しておく
+        self.transcriber.warm_up()
         
         # アイコンの状態を変えてもいいかも（赤くするとか）
         
-        # UIスレッドからの更新用コールバック
-        def update_volume_ui(vol):
-            self.root.after(0, lambda: self.overlay.update_volume(vol))
-
-        self.recorder.start(volume_callback=update_volume_ui)
+        # パイプラインモード: 発話の切れ目ごとにセグメントを先行して文字起こしする
+        segment_callback = None
+        self.pipeline = None
+        if ConfigManager.get_pipelined():
+            self.pipeline = SegmentPipeline(self.transcriber, preprocess=self._prepare_audio, loop=self.loop)
+            segment_callback = self.pipeline.submit
+
+        if self._speculative:
+            # キーを押した時点から先行して始めていた録音を、そのまま録音として続ける
+            self._speculative = False
+            self.recorder.set_segment_callback(segment_callback)
+        else:
+            self.recorder.start(segment_callback=segment_callback)
 
-    def stop_and_transcribe(self):
+    def stop_and_transcribe(self, key_up_at=None):
+        """録音を停止して文字起こしジョブを投入する。key_up_at はキーを離した時刻 (perf_counter)"""
         print("Stop Recording...")
         self.is_recording = False
-        self.processing = True
-        self.processing_start_time = time.time()
-        
-        # Thinking表示
-        self.overlay.set_thinking()
-        
-        # 録音停止・ファイル保存
-        audio_path = self.recorder.stop()
-        
-        # 音量チェック (閾値以下の場合はスキップ)
-        # RMS 0.01 はノイズをより確実に弾く設定
-        if self.recorder.max_volume < 0.01:
-            print(f"Skipping transcription (Input too quiet: {self.recorder.max_volume:.5f})")
-            if audio_path and os.path.exists(audio_path):
-                try: os.remove(audio_path)
-                except: pass
-            self.processing = False
-            self.root.after(0, self.overlay.hide)
-            return
 
-        # 別スレッドで文字起こし実行（UIをフリーズさせないため）
-        threading.Thread(target=self._transcribe_thread, args=(audio_path,)).start()
-
-    def _transcribe_thread(self, audio_path):
-        if not audio_path:
-            self.processing = False
-            self.root.after(0, self.overlay.hide)
-            return
+        # キーを離してから貼り付けまでの各区間を計測する
+        trace = tracing.Trace(start=key_up_at)
+        trace.add_span("dispatch", trace.start, time.perf_counter())
+        with tracing.activate(trace):
+            # 録音停止（録音データはメモリ上に保持される）
+            with tracing.span("stream_stop"):
+                audio = self.recorder.stop()
+            pipeline = self.pipeline
+            self.pipeline = None
+            
+            # 発話の有無を送信前の加工より先に判定し、雑音・物音だけの録音は送らない
+            has_speech = audio is not None and self._has_speech(audio)
+            if pipeline and pipeline.segment_count:
+                # 先行して送ったセグメントがあれば、発話の無い最後のセグメントだけを送らない
+                audio = audio if has_speech else None
+            elif not has_speech:
+                print("Skipping transcription (no speech)")
+                if pipeline:
+                    pipeline.cancel()
+                self._on_queue_changed()
+                return
+
+            audio_sec = Transcriber.audio_duration(audio) if audio is not None else 0.0
+            tracing.annotate(
+                backend=self.transcriber.backend.name,
+                pipelined=pipeline is not None,
+                audio_sec=round(audio_sec, 2),
+            )
+            # ジョブとして投入（イベントループで実行。UIはすぐ次の録音を受け付ける）
+            # トレースはジョブと結果の受け渡しに引き継がれる
+            # リクエストの締め切りは RequestPolicy が決める。これはどこかで止まったときの打ち切り
+            # （口述デーモンに送る場合は、デーモンの待ち行列にいる間に打ち切らないよう設けない）
+            timeout = self.transcriber.policy.job_timeout(audio_sec, self.JOB_TIMEOUT_MARGIN_SEC)
+            self.jobs.submit(lambda: self._transcribe_job(audio, pipeline), timeout=timeout)
+
+    async def _transcribe_job(self, audio, pipeline=None) -> str:
+        """イベントループ上で実行される文字起こし本体"""
+        if pipeline:
+            # 先行して処理済みのセグメントと最後のセグメントを連結
+            text = await pipeline.finish_async(audio)
+        else:
+            text = await self.transcriber.transcribe_async(self._prepare_audio(audio))
+        print(f"Transcribed: {text}")
+        return text
 
+    def _deliver_result(self, text, error):
+        """ジョブの結果を投入順に受け取り、ペーストまたはエラー通知を行う"""
         try:
-            text = self.transcriber.transcribe(audio_path)
-            print(f"Transcribed: {text}")
-            
+            if error:
+                raise error
+
             if text:
-                # クリップボードにコピー & ペースト
-                pyperclip.copy(text)
-                
-                # ペースト実行 (Ctrl+V)
-                # 少し待ってから実行（クリップボード反映待ち）
-                time.sleep(0.1)
-                pyautogui.hotkey('ctrl', 'v')
-                
+                # 出力先（既定はクリップボード経由のペースト）に渡す
+                self.output.deliver(text)
+            tracing.annotate(ok=True, chars=len(text))
+
+        except TranscriptionError as e:
+            tracing.annotate(ok=False, error=e.kind)
+            if e.kind == "cancelled":
+                print("Transcription cancelled.")
+                return
+            # 空文字で握りつぶさず、失敗をユーザーに知らせる
+            msg = f"Transcription failed [{e.kind}]: {e}"
+            print(msg)
+            log_error(msg)
+            self._notify("文字起こしに失敗しました", str(e))
+            if e.kind == "auth":
+                # APIキーが無効: 設定画面を再表示して再入力を促す
+                self._call_in_ui(self._open_settings)
+
         except Exception as e:
+            tracing.annotate(ok=False, error="unknown")
             msg = f"Error: {e}"
             print(msg)
             log_error(msg)
+
         finally:
-            # 一時ファイル削除
-            if audio_path and os.path.exists(audio_path):
-                try:
-                    os.remove(audio_path)
-                except:
-                    pass
-            
-            self.processing = False
-            self.root.after(0, self.overlay.hide)
+            self._write_trace()
 
-    def cancel_recording(self):
-        """録音キャンセル"""
+    def _write_trace(self):
+        """口述1回分のレイテンシを latency.jsonl に追記する"""
+        trace = tracing.current()
+        if trace is None or not ConfigManager.get_latency_trace():
+            return
+        tracing.write_record(trace, ConfigManager.get_latency_log_path())
+
+    def _on_queue_changed(self):
+        """キューの件数をオーバーレイに反映する（Tkスレッドで呼ぶ）"""
+        depth = self.jobs.depth
+        self.overlay.set_queue_depth(depth)
         if self.is_recording:
+            return
+        if depth > 0:
+            self.overlay.show_thinking()
+        else:
+            self.overlay.hide()
+
+    def _notify(self, title, message):
+        """トレイのバルーン通知でユーザーに知らせる（非対応環境では何もしない）"""
+        try:
+            if self.tray_icon:
+                self.tray_icon.notify(message, title)
+        except Exception as e:
+            print(f"Notify Error: {e}")
+
+    def _has_speech(self, audio) -> bool:
+        """録音に発話が含まれるか。判定の根拠はログと speech_gate.jsonl に残す"""
+        if not ConfigManager.get_speech_gate():
+            # 従来の判定: 録音中のブロックごとの最大音量（フルスケール 1.0 換算の RMS）
+            print(f"Input peak: {self.recorder.max_volume:.5f}")
+            return self.recorder.max_volume >= 0.01
+        with tracing.span("speech_gate"):
+            decision = self.speech_gate.evaluate(audio, device=self.recorder.device_name)
+        print(f"Speech gate: {SpeechGate.describe(decision)}")
+        tracing.annotate(speech_frac=decision.get("speech_frac"), voiced_sec=decision.get("voiced_sec"))
+        return decision["send"]
+
+    def _prepare_audio(self, audio):
+        """送信前の加工: 前後の無音を削り、長い間を詰める"""
+        # デバッグ用のファイルパスはそのまま送る
+        if isinstance(audio, str) or not ConfigManager.get_trim_silence():
+            return audio
+        with tracing.span("encode"):
+            trimmed, saved_sec, saved_bytes = trim_silence(audio)
+        print(f"Silence trimmed: {saved_sec:.2f}s / {saved_bytes / 1024:.1f} KB saved "
+              f"({audio.duration:.2f}s -> {trimmed.duration:.2f}s)")
+        return trimmed
+
+    def cancel_recording(self):
+        """録音キャンセル。録音中でなければ、待ち・処理中の文字起こしを取り消す"""
+        if not self.is_recording:
+            if self.jobs and self.jobs.depth:
+                print(f"Cancelling {self.jobs.depth} pending transcription(s)...")
+                self.jobs.cancel_all()
+        else:
             print("Cancelled.")
             self.is_recording = False
-            audio_path = self.recorder.stop()
-            if audio_path and os.path.exists(audio_path):
-                try:
-                    os.remove(audio_path)
-                except:
-                    pass
-            self.overlay.hide()
+            self.recorder.stop()
+            if self.pipeline:
+                self.pipeline.cancel()
+                self.pipeline = None
+            self._on_queue_changed()
 
     def run(self):
         # トレイアイコンを別スレッドで開始
         threading.Thread(target=self.tray_icon.run, daemon=True).start()
+        log_startup("tray and hotkey ready")
+        # 録音・文字起こしの準備はトレイとホットキーが有効になってから
+        threading.Thread(target=self._load_services, daemon=True).start()
 
         # Ctrl+C (SIGINT) を効くようにするハック
         self.root.after(100, self._check_signal)
@@ -437,8 +742,18 @@ class AudioInputApp:
 
     def _on_exit(self):
         print("\nExiting application...")
-        if hasattr(self, 'recorder'):
+        if self.recorder:
             self.recorder.stop()
+            self.recorder.close()
+        if self.jobs:
+            self.jobs.shutdown()
+        if self.loop:
+            self.loop.stop()
+        if self.output:
+            print(f"Output latency: {OutputRouter.format_stats(self.output.stats())}")
+            self.output.close()
+        if self.daemon:
+            self.daemon.stop()
         
         # ホットキー監視停止
         try:
@@ -0,0 +1,87 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from src import tracing
+
+
+class SegmentPipeline:
+    """
+    録音中に発話の切れ目で区切られたセグメントを、バックグラウンドで
+    逐次文字起こしするパイプライン。
+    停止時には最後のセグメントだけが未処理の状態になるため、
+    録音が長くなっても停止からペーストまでの待ち時間がほぼ一定になる。
+    loop (EventLoopThread) を渡すと、セグメントはスレッドではなくそのイベントループ上で文字起こしする。
+    """
+
+    def __init__(self, transcriber, max_workers=2, preprocess=None, loop=None):
+        self.transcriber = transcriber
+        self.preprocess = preprocess # 送信前に音声を加工する関数 (audio -> audio)
+        self.loop = loop
+        if loop is None:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="segment")
+        else:
+            self._executor = None
+            self._semaphore = asyncio.Semaphore(max_workers)
+        self._futures = []
+
+    @property
+    def segment_count(self) -> int:
+        """投入済みのセグメントの数"""
+        return len(self._futures)
+
+    def submit(self, audio) -> None:
+        """セグメントを文字起こしキューに投入する（録音順に呼ぶこと）"""
+        # 停止後に投入される最後のセグメントは口述のトレースに記録される
+        if self.loop is not None:
+            self._futures.append(self.loop.submit(self._transcribe_segment_async(audio)))
+        else:
+            self._futures.append(tracing.submit(self._executor, self._transcribe_segment, audio))
+
+    def finish(self, last_audio=None) -> str:
+        """
+        最後のセグメントを投入し、全セグメントの結果を録音順に連結して
+        ポストプロセスを一度だけ適用したテキストを返す
+        """
+        if last_audio is not None:
+            self.submit(last_audio)
+
+        try:
+            texts = [future.result() for future in self._futures]
+        finally:
+            if self._executor:
+                self._executor.shutdown(wait=False)
+        return self._stitch(texts)
+
+    async def finish_async(self, last_audio=None) -> str:
+        """finish() のイベントループ版（loop を渡した場合に、そのループ上で呼ぶ）"""
+        if last_audio is not None:
+            self.submit(last_audio)
+        try:
+            texts = [await asyncio.wrap_future(future) for future in self._futures]
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+        return self._stitch(texts)
+
+    def _stitch(self, texts) -> str:
+        print(f"Pipeline: {len(texts)} segment(s) stitched")
+        stitched = "".join(text.strip() for text in texts if text)
+        return self.transcriber._post_process(stitched)
+
+    def _transcribe_segment(self, audio) -> str:
+        if self.preprocess:
+            audio = self.preprocess(audio)
+        return self.transcriber.transcribe_raw(audio)
+
+    async def _transcribe_segment_async(self, audio) -> str:
+        async with self._semaphore:
+            if self.preprocess:
+                audio = self.preprocess(audio)
+            return await self.transcriber.transcribe_raw_async(audio)
+
+    def cancel(self) -> None:
+        """未処理のセグメントを破棄する"""
+        for future in self._futures:
+            future.cancel()
+        if self._executor:
+            self._executor.shutdown(wait=False)
@@ -0,0 +1,102 @@
+import re
+
+# 幻覚（Hallucination）フレーズ
+# 全文がこれだけなら空にし、文中に含まれていれば除去する
+HALLUCINATION_PHRASES = [
+    "ご視聴ありがとうございました",
+    "チャンネル登録お願いします",
+    "高評価お願いします",
+    "おかげさまで",
+    "字幕作成",
+    "視聴してくれてありがとう",
+    "Thank you for watching",
+    "視聴ありがとうございました",
+    "最後までご視聴",
+    "最後までご視聴ありがとうございました",
+    "おやすみなさい",
+]
+
+# 残存フィラー (念のため)
+FILLERS = ["えー", "あー", "うーん", "えっと"]
+
+# 記号のみ・極端に短い入力の判定用
+_PUNCT_PATTERN = re.compile(r'[。\.\,、 \? ！ ！ \n\t]')
+_FINAL_PUNCT_PATTERN = re.compile(r'[。\.\,、 \? ！ ！]')
+_SNIPPET_TRIM_CHARS = "。．.、,？?！! \n\t"
+
+
+def _trie_pattern(words) -> str:
+    """
+    単語リストを共通接頭辞でまとめた正規表現にする。
+    単純な "a|b|c" の選択より、各位置で試す分岐が大幅に減る（Aho-Corasick 的な照合）。
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = True
+
+    def build(node):
+        end = '' in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch != '']
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if end:
+            # ここで終わる単語もあるが、最長一致を優先する
+            return '(?:' + body + ')?'
+        return body
+
+    return build(trie)
+
+
+class PostProcessor:
+    """
+    文字起こし結果のクリーニングエンジン。
+    幻覚フレーズ・フィラーの除去とユーザー辞書の置換を1つの正規表現にまとめて事前コンパイルし、
+    テキストを1回走査するだけで全ルールを適用する。
+    """
+
+    def __init__(self, replacements=None, snippets=None):
+        # 置換辞書: 文中に現れた語を置き換える（例: "ちゃっとじーぴーてぃー" -> "ChatGPT"）
+        self.replacements = dict(replacements or {})
+        # スニペット辞書: 発話全体がキーと一致した場合に定型文へ展開する
+        self.snippets = {k.strip(_SNIPPET_TRIM_CHARS): v for k, v in (snippets or {}).items()}
+
+        self._substitutions = {phrase: "" for phrase in HALLUCINATION_PHRASES + FILLERS}
+        self._substitutions.update({k: v for k, v in self.replacements.items() if k})
+
+        self._rule_pattern = re.compile(_trie_pattern(self._substitutions))
+        self._hallucination_pattern = re.compile(
+            "(?:" + _trie_pattern(HALLUCINATION_PHRASES) + ")[。．？！]?")
+
+    def _substitute(self, match) -> str:
+        return self._substitutions[match.group(0)]
+
+    def process(self, text: str) -> str:
+        """文字起こし結果のクリーニングと加工。幻覚の除去。"""
+        # 0. 記号のみ、または極端に短い場合は空として扱う（点や丸だけの入力を防ぐ）
+        if len(_PUNCT_PATTERN.sub('', text)) <= 1:
+            return ""
+
+        # 1. 全体として幻覚フレーズしか含まれていない場合は空にする
+        if self._hallucination_pattern.fullmatch(text):
+            return ""
+
+        # 2. 発話全体がスニペットのキーなら展開する
+        snippet = self.snippets.get(text.strip(_SNIPPET_TRIM_CHARS))
+        if snippet is not None:
+            return snippet
+
+        # 3. 幻覚フレーズ・フィラー除去とユーザー辞書の置換を1パスで適用
+        text = self._rule_pattern.sub(self._substitute, text)
+
+        # 4. 整形
+        text = text.strip()
+
+        # 最終チェック：加工後に記号だけになったり短くなりすぎたら空にする
+        if len(_FINAL_PUNCT_PATTERN.sub('', text)) == 0:
+            return ""
+
+        return text
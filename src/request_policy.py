@@ -0,0 +1,277 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import httpx
+import openai
+
+from src import tracing
+
+
+class TranscriptionError(Exception):
+    """
+    文字起こしに失敗したことを表す（リトライ・ヘッジを尽くした後の最終結果）。
+    kind: "timeout" / "auth" / "network" / "server" / "rate_limit" / "bad_request" / "cancelled" / "unknown"
+    """
+
+    def __init__(self, message, kind="unknown", attempts=0):
+        super().__init__(message)
+        self.kind = kind
+        self.attempts = attempts
+
+
+def classify_error(error) -> tuple:
+    """例外を (kind, リトライ可能か) に分類する"""
+    if isinstance(error, TranscriptionError):
+        return error.kind, False
+    if isinstance(error, (openai.APITimeoutError, httpx.TimeoutException)):
+        return "timeout", True
+    if isinstance(error, openai.AuthenticationError):
+        return "auth", False
+    if isinstance(error, openai.RateLimitError):
+        return "rate_limit", True
+    if isinstance(error, openai.InternalServerError):
+        return "server", True
+    if isinstance(error, openai.BadRequestError):
+        return "bad_request", False
+    if isinstance(error, (openai.APIConnectionError, httpx.TransportError, ConnectionError)):
+        return "network", True
+    if isinstance(error, openai.APIStatusError):
+        return "server", error.status_code >= 500 or error.status_code == 408
+    if isinstance(error, httpx.HTTPStatusError):
+        # 口述デーモンなど、httpx で直接送るバックエンドの応答
+        status = error.response.status_code
+        if status == 401:
+            return "auth", False
+        if status == 429:
+            return "rate_limit", True
+        return ("server", True) if status >= 500 or status == 408 else ("bad_request", False)
+    return "unknown", False
+
+
+class RequestPolicy:
+    """
+    文字起こしリクエストの実行方針。
+    - 締め切りは音声の長さに比例して伸ばす（固定30秒のタイムアウトの代わり）
+    - 一時的なエラーはジッター付きの指数バックオフでリトライする
+    - 最初のリクエストが直近のレイテンシの p95 を超えたら同じリクエストをもう1本投げ（ヘッジ）、
+      先に返ってきた方を採用する
+    deadlines=False なら締め切りを設けず、送り先が受け付けなかった (rate_limit) 場合だけリトライする
+    （送り先の口述デーモンが自分の RequestPolicy で締め切り・リトライを管理する場合）
+    """
+    BASE_DEADLINE_SEC = 8.0        # 音声長によらない締め切りの基本部分
+    DEADLINE_PER_AUDIO_SEC = 0.5   # 音声1秒あたりに追加する締め切り
+    MAX_ATTEMPTS = 3               # 最初の1回 + リトライ
+    BACKOFF_BASE_SEC = 0.3
+    BACKOFF_MAX_SEC = 2.0
+    HEDGE_PERCENTILE = 0.95
+    HEDGE_MIN_SAMPLES = 10         # これ未満のサンプル数では既定の比率でヘッジする
+    HEDGE_DEFAULT_RATIO = 0.4      # 既定では締め切りの40%を過ぎたらヘッジ
+    HISTORY_SIZE = 100
+
+    def __init__(self, hedging=True, max_attempts=None, deadlines=True):
+        self.hedging = hedging
+        self.deadlines = deadlines
+        self.max_attempts = max_attempts or self.MAX_ATTEMPTS
+        # 締め切りに対する実際のレイテンシの比率（音声長の違いを吸収するため正規化して保持）
+        self._history = deque(maxlen=self.HISTORY_SIZE)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="request")
+
+    def deadline_for(self, duration: float) -> float:
+        """音声の長さ（秒）に応じた締め切り（秒）"""
+        return self.BASE_DEADLINE_SEC + self.DEADLINE_PER_AUDIO_SEC * max(0.0, duration)
+
+    def job_timeout(self, duration: float, margin: float):
+        """
+        文字起こしのジョブ全体を打ち切る時間（秒）。どこかで止まったときのためのもので、締め切りに margin を足す。
+        deadlines=False なら送り先が締め切りを管理するため None（打ち切らない）
+        """
+        if not self.deadlines:
+            return None
+        return self.deadline_for(duration) + margin
+
+    def hedge_delay(self, duration: float) -> float:
+        """最初のリクエストがこの時間を超えたらヘッジを投げる"""
+        with self._lock:
+            ratios = sorted(self._history)
+        if len(ratios) < self.HEDGE_MIN_SAMPLES:
+            ratio = self.HEDGE_DEFAULT_RATIO
+        else:
+            ratio = ratios[min(len(ratios) - 1, int(len(ratios) * self.HEDGE_PERCENTILE))]
+        return ratio * self.deadline_for(duration)
+
+    def _record(self, latency, duration):
+        with self._lock:
+            self._history.append(latency / self.deadline_for(duration))
+
+    def _backoff(self, attempt) -> float:
+        # フルジッター: 0 から上限までの一様乱数
+        return random.uniform(0, min(self.BACKOFF_MAX_SEC, self.BACKOFF_BASE_SEC * (2 ** attempt)))
+
+    def execute(self, call, duration: float):
+        """
+        call(timeout) を方針に従って実行し、最初に成功した結果を返す。
+        締め切りまでに成功しなければ TranscriptionError を送出する。
+        """
+        if not self.deadlines:
+            return self._execute_unbounded(call, duration)
+        deadline = time.monotonic() + self.deadline_for(duration)
+        last_kind, last_error = "timeout", None
+        attempts = 0
+
+        for attempt in range(self.max_attempts):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            attempts += 1
+            start = time.monotonic()
+            # トレースを引き継ぐため、コンテキストごとワーカーで実行する
+            pending = {tracing.submit(self._executor, call, remaining)}
+            hedged = not self.hedging
+            errors = []
+
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                timeout = remaining if hedged else min(remaining, max(0.0, start + self.hedge_delay(duration) - time.monotonic()))
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    error = future.exception()
+                    if error is None:
+                        self._record(time.monotonic() - start, duration)
+                        return future.result()
+                    errors.append(error)
+
+                if not done and not hedged:
+                    # p95 を超えても返ってこない: 同じリクエストをもう1本投げて速い方を使う
+                    hedged = True
+                    attempts += 1
+                    print(f"Request exceeded p95 ({time.monotonic() - start:.2f}s). Sending hedged request.")
+                    pending.add(tracing.submit(self._executor, call, deadline - time.monotonic()))
+
+            if pending:
+                # 締め切り切れ。残ったリクエストは各自のタイムアウトで終わるので待たない
+                last_kind, last_error = "timeout", None
+                break
+
+            last_error = errors[-1]
+            last_kind, retryable = classify_error(last_error)
+            if not retryable:
+                break
+            delay = self._backoff(attempt)
+            if time.monotonic() + delay >= deadline:
+                break
+            print(f"Transient error ({last_kind}): {last_error}. Retrying in {delay:.2f}s...")
+            time.sleep(delay)
+
+        raise self._failure(last_kind, last_error, attempts, duration)
+
+    async def execute_async(self, call, duration: float):
+        """
+        execute() の asyncio 版。call(timeout) はコルーチンを返す関数。
+        リクエストごとにスレッドを使わず、ヘッジで負けた方・締め切りを過ぎた方はキャンセルする。
+        """
+        if not self.deadlines:
+            return await self._execute_unbounded_async(call, duration)
+        deadline = time.monotonic() + self.deadline_for(duration)
+        last_kind, last_error = "timeout", None
+        attempts = 0
+
+        for attempt in range(self.max_attempts):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            attempts += 1
+            start = time.monotonic()
+            # タスクは作成時のコンテキスト（トレース）を引き継ぐ
+            pending = {asyncio.ensure_future(call(remaining))}
+            hedged = not self.hedging
+            errors = []
+
+            try:
+                while pending:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    timeout = remaining if hedged else min(remaining, max(0.0, start + self.hedge_delay(duration) - time.monotonic()))
+                    done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                    for task in done:
+                        error = task.exception()
+                        if error is None:
+                            self._record(time.monotonic() - start, duration)
+                            return task.result()
+                        errors.append(error)
+
+                    if not done and not hedged:
+                        hedged = True
+                        attempts += 1
+                        print(f"Request exceeded p95 ({time.monotonic() - start:.2f}s). Sending hedged request.")
+                        pending.add(asyncio.ensure_future(call(deadline - time.monotonic())))
+            finally:
+                # 勝った方が返った・締め切り切れ・呼び出し元のキャンセルのいずれでも、残りは打ち切る
+                for task in pending:
+                    task.cancel()
+
+            if pending:
+                last_kind, last_error = "timeout", None
+                break
+
+            last_error = errors[-1]
+            last_kind, retryable = classify_error(last_error)
+            if not retryable:
+                break
+            delay = self._backoff(attempt)
+            if time.monotonic() + delay >= deadline:
+                break
+            print(f"Transient error ({last_kind}): {last_error}. Retrying in {delay:.2f}s...")
+            await asyncio.sleep(delay)
+
+        raise self._failure(last_kind, last_error, attempts, duration)
+
+    def _execute_unbounded(self, call, duration):
+        """
+        締め切りを設けずに call(None) を実行する (deadlines=False)。
+        送り先で処理中のジョブを重複させないよう、受け付けられなかった場合だけリトライする。
+        """
+        for attempt in range(self.max_attempts):
+            try:
+                return call(None)
+            except Exception as e:
+                kind, _ = classify_error(e)
+                if kind != "rate_limit" or attempt + 1 == self.max_attempts:
+                    raise self._failure(kind, e, attempt + 1, duration)
+                delay = self._backoff(attempt)
+                print(f"Request rejected ({kind}): {e}. Retrying in {delay:.2f}s...")
+            time.sleep(delay)
+
+    async def _execute_unbounded_async(self, call, duration):
+        """_execute_unbounded() の asyncio 版"""
+        for attempt in range(self.max_attempts):
+            try:
+                return await call(None)
+            except Exception as e:
+                kind, _ = classify_error(e)
+                if kind != "rate_limit" or attempt + 1 == self.max_attempts:
+                    raise self._failure(kind, e, attempt + 1, duration)
+                delay = self._backoff(attempt)
+                print(f"Request rejected ({kind}): {e}. Retrying in {delay:.2f}s...")
+            await asyncio.sleep(delay)
+
+    def _failure(self, last_kind, last_error, attempts, duration) -> TranscriptionError:
+        if last_error is None:
+            message = f"Transcription timed out after {self.deadline_for(duration):.1f}s"
+        elif isinstance(last_error, TranscriptionError):
+            # 口述デーモンなど、送り先で既にまとめられた失敗
+            message = str(last_error)
+        else:
+            message = f"Transcription failed ({last_kind}): {last_error}"
+        return TranscriptionError(message, kind=last_kind, attempts=attempts)
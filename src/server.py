@@ -0,0 +1,357 @@
+"""
+ローカルの口述デーモン。
+
+1つの Transcriber（接続プール・キャッシュ・整形）を、トレイアプリ・エディタのプラグイン・スクリプトなど
+複数のクライアントで共有する。音声は 127.0.0.1 の HTTP で受け取り、整形済みのテキストを返す。
+
+- 同時に文字起こしする数はワーカー数（既定は接続プールと同じ4）に抑える
+- 待ちのジョブはクライアントごとの列に並べ、クライアント間で1件ずつ順番に取り出す（公平性）
+- クライアントごと・全体の待ち件数が上限に達したら、受け付けずに 429 を返す（バックプレッシャー）
+
+起動すると接続先とトークンを設定フォルダの server.json に書き出す。
+クライアントは Authorization: Bearer <トークン> を付けて送る。
+
+    python -m src.server [--port 8765] [--workers 4]
+
+    POST /v1/transcribe?name=memo.wav[&raw=1][&trimmed=1]
+                                                本文に音声ファイルの中身。X-Client-Id でクライアントを名乗る。
+                                                trimmed=1 はクライアントで無音を削り済み（デーモンでは削らない）
+      -> {"text": 整形済み, "raw": 整形前, "queued_ms": 待ち時間, "elapsed_ms": 処理時間}
+    GET  /v1/health                             -> 待ち件数・処理済み件数など
+"""
+import argparse
+import json
+import os
+import secrets
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from src.capture import RecordedAudio
+from src.config import ConfigManager
+from src.request_policy import TranscriptionError
+from src.vad import trim_silence
+
+MAX_UPLOAD_BYTES = 200 * 1024 * 1024
+
+
+class ServerBusy(Exception):
+    """待ち件数が上限に達していて受け付けられない"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ServerClosed(Exception):
+    """デーモンが終了処理中で受け付けられない"""
+
+
+class FairScheduler:
+    """
+    ジョブをクライアントごとの列に並べ、有限個のワーカーがクライアント間で1件ずつ順番に取り出して実行する。
+    1つのクライアントが大量に投入しても、他のクライアントのジョブは次の空きワーカーで実行される。
+    """
+
+    def __init__(self, workers=4, max_pending_per_client=4, max_pending=32):
+        self.max_pending_per_client = max_pending_per_client
+        self.max_pending = max_pending
+        self._queues = OrderedDict() # クライアント -> 待ちジョブの列（次に取り出す順）
+        self._pending = Counter()    # クライアント -> 待ち + 実行中の件数
+        self._running = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.completed = Counter()
+        self.rejected = Counter()
+        self._threads = [threading.Thread(target=self._worker, name=f"daemon-{i}", daemon=True)
+                         for i in range(max(1, workers))]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, client, work) -> Future:
+        """work() を投入し、結果を受け取る Future を返す。上限に達していたら ServerBusy"""
+        future = Future()
+        future.submitted_at = time.perf_counter()
+        with self._cond:
+            if self._closed:
+                raise ServerClosed("Server is shutting down")
+            total = sum(self._pending.values())
+            if self._pending[client] >= self.max_pending_per_client or total >= self.max_pending:
+                self.rejected[client] += 1
+                raise ServerBusy(f"Too many pending requests (client {self._pending[client]}, total {total})")
+            self._pending[client] += 1
+            self._queues.setdefault(client, deque()).append((work, future))
+            self._cond.notify()
+        return future
+
+    def _next(self):
+        """先頭のクライアントから1件取り出し、そのクライアントを列の最後に回す"""
+        client, queue = next(iter(self._queues.items()))
+        item = queue.popleft()
+        del self._queues[client]
+        if queue:
+            self._queues[client] = queue
+        return client, item
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._queues and not self._closed:
+                    self._cond.wait()
+                if not self._queues:
+                    return
+                client, (work, future) = self._next()
+                self._running += 1
+            if future.set_running_or_notify_cancel():
+                future.started_at = time.perf_counter()
+                try:
+                    future.set_result(work())
+                except BaseException as e:
+                    future.set_exception(e)
+            with self._cond:
+                self._running -= 1
+                self._pending[client] -= 1
+                if not self._pending[client]:
+                    del self._pending[client]
+                self.completed[client] += 1
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "running": self._running,
+                "queued": {client: len(queue) for client, queue in self._queues.items()},
+                "completed": dict(self.completed),
+                "rejected": dict(self.rejected),
+            }
+
+    def shutdown(self) -> None:
+        """新しいジョブの受け付けをやめる（待ちのジョブは処理してからワーカーが終わる）"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class DictationService:
+    """受け取った音声を共有の Transcriber で文字起こしする（HTTP とは独立した本体）"""
+
+    def __init__(self, transcriber, workers=4, max_pending_per_client=4, max_pending=32, trim=True):
+        self.transcriber = transcriber
+        self.trim = trim
+        self.scheduler = FairScheduler(workers, max_pending_per_client, max_pending)
+
+    def transcribe(self, client, data, name="audio.wav", raw=False, trimmed=False) -> dict:
+        """
+        音声ファイルの中身 data を文字起こしする。trimmed ならクライアントで無音を削り済みなので削り直さない。
+        待ち件数が上限なら ServerBusy、文字起こしに失敗したら TranscriptionError を送出する。
+        """
+        audio, temp_path = self._decode(data, name, trimmed)
+        try:
+            future = self.scheduler.submit(client, lambda: self._run(audio, raw))
+            result = future.result()
+        finally:
+            if temp_path:
+                os.remove(temp_path)
+        result["queued_ms"] = round((future.started_at - future.submitted_at) * 1000, 1)
+        return result
+
+    def _decode(self, data, name, trimmed=False):
+        """
+        16bit / float の WAV はメモリ上で扱い（無音除去とキャッシュのキーに使う）、
+        それ以外の形式は拡張子を付けた一時ファイルにしてそのまま送る。(音声, 一時ファイル) を返す
+        """
+        if data[:4] == b"RIFF":
+            try:
+                audio = RecordedAudio.from_wav_bytes(data)
+            except ValueError:
+                pass
+            else:
+                if self.trim and not trimmed:
+                    audio, _, _ = trim_silence(audio)
+                return audio, None
+        suffix = os.path.splitext(name)[1].lower() or ".wav"
+        fd, path = tempfile.mkstemp(prefix="rb10-daemon-", suffix=suffix)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return path, path
+
+    def _run(self, audio, raw) -> dict:
+        start = time.perf_counter()
+        text = self.transcriber.transcribe_raw(audio)
+        cleaned = text if raw else self.transcriber._post_process(text)
+        return {"text": cleaned, "raw": text, "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+    def health(self) -> dict:
+        return {"status": "ok", "backend": self.transcriber.backend.name, **self.scheduler.stats()}
+
+    def shutdown(self) -> None:
+        self.scheduler.shutdown()
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # クライアントは接続を使い回せる
+    disable_nagle_algorithm = True
+    server_version = "rb10-whisper"
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if urlsplit(self.path).path == "/v1/health":
+            self._send_json(200, self.server.service.health())
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        url = urlsplit(self.path)
+        if url.path != "/v1/transcribe":
+            self._send_json(404, {"error": "Not found"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if not 0 < length <= MAX_UPLOAD_BYTES:
+            self._send_json(413 if length else 400, {"error": "Audio body is empty or too large"})
+            return
+        data = self.rfile.read(length)
+        query = parse_qs(url.query)
+        client = self.headers.get("X-Client-Id") or "anonymous"
+        name = query.get("name", ["audio.wav"])[0]
+        raw = query.get("raw", ["0"])[0] == "1"
+        trimmed = query.get("trimmed", ["0"])[0] == "1"
+        try:
+            result = self.server.service.transcribe(client, data, name=name, raw=raw, trimmed=trimmed)
+        except ServerBusy as e:
+            self._send_json(429, {"error": str(e)}, {"Retry-After": str(e.retry_after)})
+        except ServerClosed as e:
+            # 使い回している接続も閉じ、クライアントに接続先を読み直させる
+            self.close_connection = True
+            self._send_json(503, {"error": str(e)}, {"Connection": "close"})
+        except TranscriptionError as e:
+            self._send_json(502, {"error": str(e), "kind": e.kind})
+        except Exception as e:
+            print(f"Daemon Error: {e}")
+            self._send_json(500, {"error": str(e)})
+        else:
+            self._send_json(200, result)
+
+    def _authorized(self) -> bool:
+        expected = f"Bearer {self.server.token}"
+        if secrets.compare_digest(self.headers.get("Authorization", ""), expected):
+            return True
+        # 本文を読み捨ててから返す（接続を使い回すクライアントのため）
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self._send_json(401, {"error": "Unauthorized"})
+        return False
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128 # 多数のクライアントが同時に接続しても接続を拒否しない（上限は FairScheduler で判断する）
+
+
+class DictationServer:
+    """DictationService を 127.0.0.1 の HTTP で公開し、接続先を server.json に書き出す"""
+
+    def __init__(self, service, port=8765, info_path=None):
+        self.service = service
+        self.info_path = info_path or ConfigManager.get_server_info_path()
+        self.token = secrets.token_urlsafe(24)
+        self._httpd = _HTTPServer(("127.0.0.1", port), _RequestHandler) # 使用中なら OSError
+        self._httpd.service = service
+        self._httpd.token = self.token
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="daemon-http", daemon=True)
+        self._thread.start()
+        write_server_info(self.info_path, self.url, self.token)
+        print(f"Dictation daemon listening on {self.url}")
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self.service.shutdown()
+        # 別のデーモンが書き直していなければ消す
+        info = read_server_info(self.info_path)
+        if info and info.get("token") == self.token:
+            try:
+                os.remove(self.info_path)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def write_server_info(path, url, token) -> None:
+    """接続先とトークンを本人だけが読めるファイルに書く"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"url": url, "token": token, "pid": os.getpid()}, f)
+
+
+def read_server_info(path=None) -> dict:
+    """起動中のデーモンの接続先 {"url", "token", "pid"}。無ければ空の dict"""
+    try:
+        with open(path or ConfigManager.get_server_info_path(), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def main(argv=None):
+    from src.backends import OpenAIBackend
+    from src.transcriber import Transcriber
+    from src.transcript_cache import create_cache
+
+    parser = argparse.ArgumentParser(description="複数のクライアントで共有するローカルの文字起こしデーモン")
+    parser.add_argument("--port", type=int, default=ConfigManager.get_daemon_port())
+    parser.add_argument("--workers", type=int, default=OpenAIBackend.MAX_CONNECTIONS,
+                        help="同時に文字起こしする数（既定: 接続プールの上限）")
+    parser.add_argument("--max-pending-per-client", type=int, default=4, help="クライアントごとの待ち件数の上限")
+    parser.add_argument("--max-pending", type=int, default=32, help="全体の待ち件数の上限")
+    args = parser.parse_args(argv)
+
+    service = DictationService(Transcriber(cache=create_cache()), workers=args.workers,
+                               max_pending_per_client=args.max_pending_per_client,
+                               max_pending=args.max_pending, trim=ConfigManager.get_trim_silence())
+    server = DictationServer(service, port=args.port)
+    server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""
+文字起こし結果の出力先 (sink)。
+
+既定はクリップボード経由のペースト。ファイルへの追記・標準出力・ローカルソケットにも出力でき、
+デスクトップの無い環境でも口述の流れ全体を計測できる。
+設定の output_sinks に次の形式で並べる（複数可）:
+    "paste" / "stdout" / "file:C:\\path\\to\\out.txt" / "socket:127.0.0.1:5005"
+"""
+import json
+import socket
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+from src import tracing
+
+
+class OutputSink:
+    """出力先の基底クラス。deliver は結果を受け取った順に1件ずつ呼ばれる"""
+
+    name = ""
+
+    def deliver(self, text) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """保持しているファイルや接続を閉じる"""
+
+
+class ClipboardPasteSink(OutputSink):
+    """
+    クリップボードにコピーして Ctrl+V を送る。
+    固定時間待つ代わりに、クリップボードの内容が反映されたのを確認してから貼り付ける。
+    restore が有効なら、貼り付け先が読み終わった頃に元のクリップボードの内容に戻す。
+    """
+
+    name = "paste"
+
+    POLL_SEC = 0.005      # 反映の確認間隔
+    DEADLINE_SEC = 0.5    # これを過ぎたら反映を待たずに貼り付ける
+    RESTORE_DELAY_SEC = 1.0
+
+    def __init__(self, restore=True):
+        # pyperclip / pyautogui はデスクトップ環境でしか使わないため、このクラスを使うときだけ読み込む
+        import pyperclip
+        import pyautogui
+        self._clipboard = pyperclip
+        self._keys = pyautogui
+        self.restore = restore
+        self._restore_timer = None
+
+    def deliver(self, text) -> None:
+        previous = self._save_clipboard()
+        with tracing.span("clipboard"):
+            self._clipboard.copy(text)
+        with tracing.span("clipboard_wait"):
+            if not self._wait_until_copied(text):
+                print(f"Clipboard not updated within {self.DEADLINE_SEC}s. Pasting anyway.")
+        with tracing.span("paste"):
+            self._keys.hotkey('ctrl', 'v')
+        if previous:
+            self._schedule_restore(previous, text)
+
+    def _wait_until_copied(self, text) -> bool:
+        deadline = time.perf_counter() + self.DEADLINE_SEC
+        while self._clipboard.paste() != text:
+            if time.perf_counter() >= deadline:
+                return False
+            time.sleep(self.POLL_SEC)
+        return True
+
+    def _save_clipboard(self) -> str:
+        if not self.restore:
+            return ""
+        timer, self._restore_timer = self._restore_timer, None
+        if timer and not timer.finished.is_set():
+            # 前回の復元がまだなら、それを今の「元の内容」として引き継ぐ（復元済みなら今の内容を読む）
+            timer.cancel()
+            return timer.args[0]
+        try:
+            return self._clipboard.paste() or ""
+        except Exception as e:
+            print(f"Clipboard Read Error: {e}")
+            return ""
+
+    def _schedule_restore(self, previous, pasted) -> None:
+        self._restore_timer = threading.Timer(self.RESTORE_DELAY_SEC, self._restore, args=(previous, pasted))
+        self._restore_timer.daemon = True
+        self._restore_timer.start()
+
+    def _restore(self, previous, pasted) -> None:
+        # その間にユーザーが別の内容をコピーしていたら上書きしない
+        try:
+            if self._clipboard.paste() == pasted:
+                self._clipboard.copy(previous)
+        except Exception as e:
+            print(f"Clipboard Restore Error: {e}")
+
+    def close(self) -> None:
+        timer, self._restore_timer = self._restore_timer, None
+        if timer and not timer.finished.is_set():
+            timer.cancel()
+            self._restore(*timer.args)
+
+
+class FileSink(OutputSink):
+    """ファイルに1件1行で追記する"""
+
+    name = "file"
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def deliver(self, text) -> None:
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(text + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class StdoutSink(OutputSink):
+    """標準出力に1件1行で書く"""
+
+    name = "stdout"
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def deliver(self, text) -> None:
+        stream = self.stream or sys.stdout
+        stream.write(text + "\n")
+        stream.flush()
+
+
+class SocketSink(OutputSink):
+    """
+    ローカルの TCP ソケットに {"text": ...} を1行のJSONとして送る。
+    接続は使い回し、切れていたら1回だけ繋ぎ直す。
+    """
+
+    name = "socket"
+
+    CONNECT_TIMEOUT_SEC = 1.0
+
+    def __init__(self, host, port):
+        self.address = (host, int(port))
+        self._sock = None
+
+    def deliver(self, text) -> None:
+        line = (json.dumps({"text": text}, ensure_ascii=False) + "\n").encode("utf-8")
+        try:
+            self._connection().sendall(line)
+        except OSError:
+            self.close()
+            self._connection().sendall(line)
+
+    def _connection(self):
+        if self._sock is None:
+            self._sock = socket.create_connection(self.address, timeout=self.CONNECT_TIMEOUT_SEC)
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return self._sock
+
+    def close(self) -> None:
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+
+def create_sink(spec, restore_clipboard=True) -> OutputSink:
+    """設定の文字列から出力先を作る。形式が正しくなければ ValueError"""
+    kind, _, arg = spec.partition(":")
+    if kind == "paste" and not arg:
+        return ClipboardPasteSink(restore=restore_clipboard)
+    if kind == "stdout" and not arg:
+        return StdoutSink()
+    if kind == "file" and arg:
+        return FileSink(arg)
+    if kind == "socket" and arg:
+        host, _, port = arg.rpartition(":")
+        if host and port.isdigit():
+            return SocketSink(host, port)
+    raise ValueError(f"Unknown output sink: {spec!r}")
+
+
+def create_sinks(specs, restore_clipboard=True) -> list:
+    """設定の出力先を作る。正しくない指定は読み飛ばし、1つも無ければペーストにする"""
+    sinks = []
+    for spec in specs:
+        try:
+            sinks.append(create_sink(spec, restore_clipboard))
+        except ValueError as e:
+            print(f"Output Sink Error: {e}")
+    return sinks or [ClipboardPasteSink(restore=restore_clipboard)]
+
+
+class OutputRouter:
+    """
+    結果を全ての出力先に順に渡し、出力先ごとの所要時間を記録する。
+    1つが失敗しても残りには出力し、最後に最初のエラーを送出する。
+    所要時間は出力先ごと（同じ種類が複数あっても別々）に記録する。
+    """
+
+    HISTORY_SIZE = 1000
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+        self.labels = self._labels(self.sinks)
+        self._latencies = [deque(maxlen=self.HISTORY_SIZE) for _ in self.sinks]
+
+    @staticmethod
+    def _labels(sinks) -> list:
+        """統計・トレースでの出力先の名前。同じ種類が複数あれば番号を付ける（file#1, file#2）"""
+        counts = Counter(sink.name for sink in sinks)
+        seen = Counter()
+        labels = []
+        for sink in sinks:
+            seen[sink.name] += 1
+            labels.append(sink.name if counts[sink.name] == 1 else f"{sink.name}#{seen[sink.name]}")
+        return labels
+
+    def deliver(self, text) -> None:
+        error = None
+        for sink, label, latencies in zip(self.sinks, self.labels, self._latencies):
+            start = time.perf_counter()
+            try:
+                with tracing.span(f"sink_{label}"):
+                    sink.deliver(text)
+            except Exception as e:
+                print(f"Output Error ({label}): {e}")
+                error = error or e
+                continue
+            latencies.append(time.perf_counter() - start)
+        if error:
+            raise error
+
+    def stats(self) -> dict:
+        """出力先ごとの件数と所要時間 (ms)"""
+        stats = {}
+        for label, samples in zip(self.labels, self._latencies):
+            if not samples:
+                continue
+            values = np.array(samples) * 1000
+            stats[label] = {"n": len(values), "mean_ms": float(values.mean()), "p50_ms": float(np.percentile(values, 50)),
+                           "p95_ms": float(np.percentile(values, 95)), "p99_ms": float(np.percentile(values, 99)),
+                           "max_ms": float(values.max())}
+        return stats
+
+    @staticmethod
+    def format_stats(stats) -> str:
+        return ", ".join(f"{name} {row['n']} x p50 {row['p50_ms']:.2f} ms / p95 {row['p95_ms']:.2f} ms"
+                         for name, row in stats.items()) or "no output"
+
+    def close(self) -> None:
+        for sink, label in zip(self.sinks, self.labels):
+            try:
+                sink.close()
+            except Exception as e:
+                print(f"Output Close Error ({label}): {e}")
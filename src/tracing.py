@@ -0,0 +1,216 @@
+"""
+口述1回分（ホットキーを離してからテキストが貼り付けられるまで）のレイテンシ計測。
+
+各処理は現在のトレースに区間 (span) や時点 (mark) を記録し、
+完了したトレースは1行のJSONとしてファイルに追記する。
+トレースは contextvars で受け渡すため、スレッドをまたぐ場合は submit() でコンテキストごと渡す。
+
+集計:
+    python -m src.tracing latency.jsonl
+"""
+import argparse
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+# 集計時の表示順（処理の流れ順）。これ以外の区間は後ろに並べる
+STAGES = [
+    "dispatch",      # キーを離してから Tk スレッドで停止処理が始まるまで
+    "stream_stop",   # 録音ストリームの停止
+    "speech_gate",   # 発話の有無の判定（送るかどうか）
+    "queue",         # ジョブキューでの待ち
+    "encode",        # 無音除去・連結など送信前の加工
+    "cache",         # 文字起こしキャッシュの照合（音声のハッシュ計算を含む）
+    "request",       # バックエンドへのリクエスト全体（ヘッジ・リトライを含む）
+    "upload_start",  # (時点) 最初のリクエストの送信開始
+    "first_byte",    # (時点) 最初の応答ヘッダの受信
+    "response",      # (時点) 文字起こし結果の受信
+    "post_process",  # 整形・辞書の適用
+    "clipboard",     # クリップボードへのコピー
+    "clipboard_wait",  # クリップボードへの反映の確認
+    "paste",         # Ctrl+V の送信
+    "sink_paste",    # 出力先ごとの出力全体（sink_file / sink_stdout / sink_socket も同様。同じ種類が複数あれば sink_file#2 など）
+    "total",         # キーを離してから貼り付け完了まで
+]
+
+MAX_LOG_BYTES = 5 * 1024 * 1024 # これを超えたら .1 に退避して新しいファイルに書く
+
+_current = contextvars.ContextVar("trace", default=None)
+
+
+class Trace:
+    """口述1回分の計測結果。時刻は time.perf_counter() の値で受け取り、開始からの ms で保持する"""
+
+    def __init__(self, start=None):
+        now = time.perf_counter()
+        self.start = now if start is None else start
+        self.wall_start = time.time() - (now - self.start)
+        self.spans = [] # [名前, 開始 ms, 長さ ms]
+        self.marks = {} # 名前 -> 開始からの ms（最初の1回のみ）
+        self.attrs = {}
+        self._lock = threading.Lock()
+
+    def _ms(self, seconds) -> float:
+        return round(seconds * 1000, 2)
+
+    def add_span(self, name, start, end) -> None:
+        with self._lock:
+            self.spans.append([name, self._ms(start - self.start), self._ms(end - start)])
+
+    def mark(self, name, at=None) -> None:
+        at = time.perf_counter() if at is None else at
+        with self._lock:
+            self.marks.setdefault(name, self._ms(at - self.start))
+
+    def to_record(self, end=None) -> dict:
+        end = time.perf_counter() if end is None else end
+        with self._lock:
+            record = {"ts": round(self.wall_start, 3), "total": self._ms(end - self.start)}
+            record.update(self.attrs)
+            record["spans"] = list(self.spans)
+            record["marks"] = dict(self.marks)
+        return record
+
+
+def current():
+    """このスレッド（コンテキスト）で有効なトレース。無ければ None"""
+    return _current.get()
+
+
+@contextmanager
+def activate(trace):
+    """with ブロックの間、trace を現在のトレースにする"""
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name):
+    """with ブロックの所要時間を現在のトレースに記録する（トレースが無ければ何もしない）"""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(name, start, time.perf_counter())
+
+
+def mark(name) -> None:
+    """現在の時点を現在のトレースに記録する"""
+    trace = _current.get()
+    if trace is not None:
+        trace.mark(name)
+
+
+def annotate(**attrs) -> None:
+    """現在のトレースに属性（音声の長さ・バックエンド名など）を付ける"""
+    trace = _current.get()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+
+def submit(executor, fn, *args):
+    """現在のコンテキスト（トレース）ごと executor で実行する"""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def write_record(trace, path) -> None:
+    """トレースを1行のJSONとして追記する"""
+    append_record(trace.to_record(), path)
+
+
+def append_record(record, path) -> None:
+    """dict を1行のJSONとして追記する（MAX_LOG_BYTES を超えたら .1 に退避する）"""
+    line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+    try:
+        if os.path.exists(path) and os.path.getsize(path) > MAX_LOG_BYTES:
+            os.replace(path, f"{path}.1")
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        print(f"Trace Write Error: {e}")
+
+
+def read_records(paths):
+    """JSONL ファイルからトレースを読む（壊れた行は読み飛ばす）"""
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def stage_values(record) -> dict:
+    """
+    1件のトレースを 区間名 -> ms にまとめる。
+    同じ名前の区間が複数ある場合（ヘッジ・セグメントなど）は最初の開始から最後の終了までとする。
+    時点はキーを離してからの経過時間。
+    """
+    extents = {}
+    for name, start, duration in record.get("spans", []):
+        first, last = extents.get(name, (start, start + duration))
+        extents[name] = (min(first, start), max(last, start + duration))
+    values = {name: last - first for name, (first, last) in extents.items()}
+    values.update(record.get("marks", {}))
+    if "total" in record:
+        values["total"] = record["total"]
+    return values
+
+
+def summarize(records, percentiles=(50, 95, 99)) -> dict:
+    """区間ごとの件数とパーセンタイル (ms) を求める"""
+    samples = {}
+    for record in records:
+        for name, value in stage_values(record).items():
+            samples.setdefault(name, []).append(value)
+
+    order = {name: i for i, name in enumerate(STAGES)}
+    summary = {}
+    for name in sorted(samples, key=lambda n: (order.get(n, len(STAGES)), n)):
+        values = np.array(samples[name])
+        summary[name] = {"n": len(values), **{f"p{p}": float(np.percentile(values, p)) for p in percentiles}}
+    return summary
+
+
+def format_summary(summary, record_count) -> str:
+    lines = [f"{record_count} dictation(s)",
+             f"{'stage':<14}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+    for name, row in summary.items():
+        lines.append(f"{name:<14}{row['n']:>6}{row['p50']:>10.1f}{row['p95']:>10.1f}{row['p99']:>10.1f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="口述ごとのレイテンシ記録 (JSONL) を区間ごとに集計する")
+    parser.add_argument("paths", nargs="+", help="latency.jsonl（複数可）")
+    parser.add_argument("--json", action="store_true", help="集計結果をJSONで出力する")
+    args = parser.parse_args(argv)
+
+    records = list(read_records(args.paths))
+    summary = summarize(records)
+    if args.json:
+        print(json.dumps({"records": len(records), "stages": summary}, indent=2))
+    else:
+        print(format_summary(summary, len(records)))
+    return 0 if records else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,90 +1,194 @@
+import asyncio
 import os
-from openai import OpenAI, APITimeoutError
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
 from src.config import ConfigManager
-import re
+from src.postprocess import PostProcessor
+from src.backends import create_backend
+from src.capture import RecordedAudio
+from src.chunking import merge_texts, split_at_silences
+from src.request_policy import RequestPolicy, TranscriptionError
+from src.transcript_cache import audio_digest
+from src import tracing
 
 class Transcriber:
-    def __init__(self):
-        self.api_key = ConfigManager.load_api_key()
-        self.client = None
-        if self.api_key:
-            self.client = OpenAI(api_key=self.api_key, timeout=30.0)
+    def __init__(self, backend=None, cache=None, chunk_sec=None, chunk_parallelism=None):
+        # 文字起こしの実体（OpenAI API / ローカルモデル）。整形はバックエンドによらず共通
+        self.backend = backend or create_backend()
+        # 生のテキストのキャッシュ (TranscriptCache)。None ならキャッシュしない
+        self.cache = cache
+        # 長い音声の分割（None なら設定の値を使う）
+        self.chunk_sec = chunk_sec
+        self.chunk_parallelism = chunk_parallelism
+        self.backend.warm_up()
+        # 締め切り・リトライ・ヘッジ（ローカルモデルでは重複実行しても速くならないためヘッジしない。
+        # 口述デーモンは締め切り・リトライを自分で管理するため、こちらでは締め切りを設けない）
+        self.policy = RequestPolicy(hedging=self.backend.hedging, deadlines=self.backend.client_deadline)
+        self._post_processor = None
+        self._post_processor_version = None
 
     def reload_key(self):
-        """APIキーを再読み込みする"""
-        self.api_key = ConfigManager.load_api_key()
-        if self.api_key:
-            self.client = OpenAI(api_key=self.api_key, timeout=30.0)
+        """APIキーを再読み込みする（Credential Managerのキャッシュも読み直す）"""
+        ConfigManager.reload_api_key()
+        self.backend.reload_key()
+
+    def warm_up(self):
+        """録音開始時に呼び、停止後の文字起こしがすぐ始まるよう接続などを準備する"""
+        self.backend.warm_up()
+
+    def reset_connection(self):
+        """スリープ復帰後に接続を作り直す"""
+        self.backend.reset_connection()
+
+    def transcribe(self, audio) -> str:
+        """
+        音声をテキストに変換する。
+        audio は RecordedAudio（メモリ上のWAV）またはWAVファイルのパス。
+        """
+        return self._post_process(self.transcribe_raw(audio))
+
+    def transcribe_raw(self, audio) -> str:
+        """
+        音声をテキストに変換する（ポストプロセスなし）。
+        セグメントごとの結果を連結してから一度だけ整形したい場合に使う。
+        失敗した場合は空文字列ではなく TranscriptionError を送出する。
+        キャッシュに同じ音声の結果があれば送信せずにそれを返す。
+        """
+        key, text = self._lookup_cache(audio)
+        if text is not None:
+            return text
+        self._ensure_ready()
+        chunks = self._split(audio)
+        try:
+            if len(chunks) == 1:
+                text = self._request(chunks[0][0])
+            else:
+                # 長い音声は分割して並行して送り、重なった部分の重複を除いて連結する
+                with ThreadPoolExecutor(max_workers=self._chunk_parallelism(),
+                                        thread_name_prefix="chunk") as executor:
+                    futures = [tracing.submit(executor, self._request, chunk) for chunk, _ in chunks]
+                    texts = [future.result() for future in futures]
+                text = merge_texts(texts, [overlapped for _, overlapped in chunks])
+        except TranscriptionError as e:
+            print(f"Transcription Error: {e} (attempts: {e.attempts})")
+            raise
+        self._store_cache(key, text)
+        return text
+
+    def _request(self, audio) -> str:
+        return self.policy.execute(lambda timeout: self.backend.transcribe(audio, timeout=timeout),
+                                   self.audio_duration(audio))
+
+    async def transcribe_async(self, audio) -> str:
+        """transcribe() の asyncio 版（attach_loop で指定したループ上で呼ぶ）"""
+        return self._post_process(await self.transcribe_raw_async(audio))
 
-    def transcribe(self, audio_file_path: str) -> str:
+    async def transcribe_raw_async(self, audio) -> str:
+        """transcribe_raw() の asyncio 版。キャンセルされると送信中のリクエストも打ち切る"""
+        key, text = self._lookup_cache(audio)
+        if text is not None:
+            return text
+        self._ensure_ready()
+        chunks = self._split(audio)
+        try:
+            if len(chunks) == 1:
+                text = await self._request_async(chunks[0][0])
+            else:
+                semaphore = asyncio.Semaphore(self._chunk_parallelism())
+
+                async def request(chunk):
+                    async with semaphore:
+                        return await self._request_async(chunk)
+
+                texts = await asyncio.gather(*(request(chunk) for chunk, _ in chunks))
+                text = merge_texts(texts, [overlapped for _, overlapped in chunks])
+        except TranscriptionError as e:
+            print(f"Transcription Error: {e} (attempts: {e.attempts})")
+            raise
+        self._store_cache(key, text)
+        return text
+
+    async def _request_async(self, audio) -> str:
+        return await self.policy.execute_async(
+            lambda timeout: self.backend.transcribe_async(audio, timeout=timeout), self.audio_duration(audio))
+
+    def _chunk_parallelism(self) -> int:
+        return self.chunk_parallelism or ConfigManager.get_chunk_parallelism()
+
+    def _split(self, audio) -> list:
         """
-        音声ファイルをテキストに変換する
+        長い音声を [(チャンク, 前と重なっているか)] に分割する（アップロードサイズに上限のあるバックエンドのみ）。
+        WAVファイルはメモリマップで読み込んで分割し、それ以外の形式（mp3 など）は分割せずそのまま送る。
         """
-        if not self.client:
+        chunk_sec = self.chunk_sec or ConfigManager.get_chunk_sec()
+        if not self.backend.split_long_audio:
+            return [(audio, False)]
+        if isinstance(audio, str):
+            if self.audio_duration(audio) <= chunk_sec or not audio.lower().endswith(".wav"):
+                return [(audio, False)]
+            try:
+                audio = RecordedAudio.load(audio)
+            except (ValueError, OSError):
+                return [(audio, False)]
+        chunks = split_at_silences(audio, chunk_sec)
+        if len(chunks) > 1:
+            print(f"Split {audio.duration:.0f}s of audio into {len(chunks)} chunks")
+            tracing.annotate(chunks=len(chunks))
+        return chunks
+
+    def attach_loop(self, loop):
+        """非同期の文字起こしに使うイベントループをバックエンドに知らせる"""
+        self.backend.attach_loop(loop)
+
+    def _lookup_cache(self, audio) -> tuple:
+        """(キャッシュのキー, キャッシュされていたテキスト)。キャッシュが無効ならキーも None"""
+        if self.cache is None:
+            return None, None
+        with tracing.span("cache"):
+            key = audio_digest(audio, self.backend.identity())
+            text = self.cache.get(key)
+        if text is not None:
+            print(f"Transcript cache hit ({self.cache.hit_rate * 100:.0f}% hit rate)")
+            tracing.annotate(cache="hit")
+        return key, text
+
+    def _ensure_ready(self):
+        if not self.backend.is_ready():
             self.reload_key()
-            if not self.client:
-                raise ValueError("API Key is not set.")
+            if not self.backend.is_ready():
+                raise TranscriptionError("API Key is not set.", kind="auth")
 
+    def _store_cache(self, key, text):
+        # 空の結果は一時的な失敗の可能性もあるので残さない
+        if key is not None and text:
+            self.cache.put(key, text)
+
+    @staticmethod
+    def audio_duration(audio) -> float:
+        """音声の長さ（秒）。締め切りの計算に使う"""
+        if not isinstance(audio, str):
+            return audio.duration
+        try:
+            with wave.open(audio, "rb") as f:
+                return f.getnframes() / f.getframerate()
+        except (wave.Error, EOFError, OSError):
+            pass
+        # WAV以外（mp3 / m4a など）は長さが分からないため、低めのビットレート (16 kbps) を仮定して
+        # ファイルサイズから長めに見積もる（締め切りが短すぎて長い音声が打ち切られないように）
         try:
-            with open(audio_file_path, "rb") as audio_file:
-                # Whisper API 呼び出し
-                # promptを簡略化してAIによる過剰な推測（幻覚）を抑制
-                transcript = self.client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    language="ja",
-                    prompt="こんにちは。" # 最小限のプロンプトで日本語であることを示す
-                )
-            
-            text = transcript.text
-            return self._post_process(text)
-            
-        except Exception as e:
-            print(f"Transcription Error: {e}")
-            return ""
+            return os.path.getsize(audio) / 2000
+        except OSError:
+            return 0.0
 
     def _post_process(self, text: str) -> str:
         """
         文字起こし結果のクリーニングと加工。幻覚の除去。
+        ルールは設定が変わったときだけ再コンパイルする。
         """
-        # 0. 記号のみ、または極端に短い場合は空として扱う（点や丸だけの入力を防ぐ）
-        clean_text = re.sub(r'[。\.\,、 \? ！ ！ \n\t]', '', text)
-        if len(clean_text) <= 1:
-            return ""
-
-        # 1. 幻覚（Hallucination）フィルター
-        # 行単位や全文で完全一致、あるいは含まれている場合に除去するフレーズ
-        hallucination_phrases = [
-            r"ご視聴ありがとうございました",
-            r"チャンネル登録お願いします",
-            r"高評価お願いします",
-            r"おかげさまで",
-            r"字幕作成",
-            r"視聴してくれてありがとう",
-            r"Thank you for watching",
-            r"視聴ありがとうございました",
-            r"最後までご視聴",
-            r"おやすみなさい",
-        ]
-        
-        # 全体としてこれらのフレーズしか含まれていない場合は空にする
-        for phrase in hallucination_phrases:
-            if re.search(f"^{phrase}[。．？！]?$", text) or text == phrase:
-                return ""
-            # 部分一致での除去
-            text = re.sub(phrase, "", text)
-
-        # 2. 残存フィラー除去 (念のため)
-        fillers = [r"えー", r"あー", r"うーん", r"えっと"]
-        for filler in fillers:
-            text = re.sub(filler, "", text)
-
-        # 3. 整形
-        text = text.strip()
-        
-        # 最終チェック：加工後に記号だけになったり短くなりすぎたら空にする
-        final_clean = re.sub(r'[。\.\,、 \? ！ ！]', '', text)
-        if len(final_clean) == 0:
-            return ""
-            
-        return text
+        if self._post_processor is None or self._post_processor_version != ConfigManager.config_version:
+            replacements, snippets = ConfigManager.get_dictionaries()
+            self._post_processor = PostProcessor(replacements, snippets)
+            self._post_processor_version = ConfigManager.config_version
+        with tracing.span("post_process"):
+            return self._post_processor.process(text)
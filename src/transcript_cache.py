@@ -0,0 +1,175 @@
+"""
+文字起こし結果のディスクキャッシュ。
+
+音声の内容とモデル・言語・プロンプトのハッシュをキーに、APIが返した生のテキストを保存する。
+整形・辞書は読み出し後に毎回適用するため、ルールを変えてもキャッシュは無効にならない。
+合計サイズが上限を超えたら最後に使われたのが古いものから削除する (LRU)。
+
+    python -m src.transcript_cache          # 件数・サイズの表示
+    python -m src.transcript_cache --clear  # 全削除
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from src.config import ConfigManager
+
+HASH_BLOCK = 1024 * 1024
+
+
+def audio_digest(audio, identity) -> str:
+    """
+    audio（RecordedAudio またはファイルのパス）の内容と identity（モデル・言語・プロンプト）の SHA-256。
+    RecordedAudio は送信されるWAVと同じバイト列（ヘッダ + サンプル）をコピーせずにハッシュする。
+    """
+    h = hashlib.sha256(identity.encode("utf-8") + b"\0")
+    if isinstance(audio, str):
+        with open(audio, "rb") as f:
+            while block := f.read(HASH_BLOCK):
+                h.update(block)
+    else:
+        h.update(audio.header())
+        for chunk in audio.chunks:
+            h.update(np.ascontiguousarray(chunk))
+    return h.hexdigest()
+
+
+class TranscriptCache:
+    """
+    1件1ファイル (<キー>.txt) で保存する。最後に使った時刻はファイルの更新時刻で持ち、
+    起動時にそれを読んで LRU の順序を復元する。
+    """
+
+    def __init__(self, directory, max_bytes=50 * 1024 * 1024):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = None # キー -> サイズ（古い順）
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key) -> str:
+        return os.path.join(self.directory, key + ".txt")
+
+    def _load_index(self) -> None:
+        """初回アクセス時にディレクトリを走査して索引を作る"""
+        if self._entries is not None:
+            return
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(".txt"):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime_ns, entry.name[:-4], stat.st_size))
+        except FileNotFoundError:
+            pass
+        entries.sort()
+        self._entries = OrderedDict((key, size) for _, key, size in entries)
+        self._total = sum(self._entries.values())
+
+    def get(self, key):
+        """保存されたテキスト。無ければ None"""
+        with self._lock:
+            self._load_index()
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(key), encoding="utf-8") as f:
+                    text = f.read()
+                os.utime(self._path(key)) # 最後に使った時刻を更新する
+            except OSError:
+                # 別プロセスに消された場合など
+                self._total -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def put(self, key, text) -> None:
+        data = text.encode("utf-8")
+        with self._lock:
+            self._load_index()
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                # 途中で落ちても壊れたファイルが残らないよう、一時ファイルに書いてから置き換える
+                fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, self._path(key))
+            except OSError as e:
+                print(f"Transcript Cache Write Error: {e}")
+                return
+            self._total += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._total > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._load_index()
+            for key in list(self._entries):
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self._entries.clear()
+            self._total = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._load_index()
+            return {"entries": len(self._entries), "bytes": self._total, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate}
+
+    @staticmethod
+    def format_stats(stats) -> str:
+        return (f"{stats['entries']} entries, {stats['bytes'] / 1024:.1f} / {stats['max_bytes'] / 1024:.0f} KB, "
+                f"{stats['hits']} hits / {stats['misses']} misses ({stats['hit_rate'] * 100:.1f}% hit rate)")
+
+
+def create_cache():
+    """設定で有効ならキャッシュを作る。無効なら None"""
+    if not ConfigManager.get_transcript_cache():
+        return None
+    return TranscriptCache(ConfigManager.get_transcript_cache_dir(), ConfigManager.get_transcript_cache_bytes())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="文字起こしキャッシュの状態表示・削除")
+    parser.add_argument("--clear", action="store_true", help="キャッシュを全て削除する")
+    args = parser.parse_args(argv)
+
+    cache = TranscriptCache(ConfigManager.get_transcript_cache_dir(), ConfigManager.get_transcript_cache_bytes())
+    if args.clear:
+        cache.clear()
+    stats = cache.stats()
+    print(f"{cache.directory}: {stats['entries']} entries, {stats['bytes'] / 1024:.1f} KB"
+          f" (limit {stats['max_bytes'] / 1024 / 1024:.0f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,9 +2,12 @@ import tkinter as tk
 from tkinter import messagebox, ttk
 import webbrowser
 from src.config import ConfigManager
-import math
+from src.visualizer import BarAnimator, BarRaster, FrameComposer, FrameGovernor, GLOW_COLOR, hex_to_rgb
+from PIL import Image, ImageTk
+import numpy as np
 import keyboard
 import threading
+import time
 
 class SettingsWindow:
     """APIキー設定ウィンドウ"""
@@ -206,10 +209,110 @@ class SettingsWindow:
             self.on_close_callback(False)
         self.window.destroy()
 
+class CanvasBarRenderer:
+    """バーを canvas の line アイテムとして1本ずつ描く。高さや色が変わったバーだけ Tcl を呼ぶ"""
+
+    def __init__(self, canvas, height, bar_x, bar_width, animator, rec_colors, thinking_colors):
+        self.canvas = canvas
+        self.center_y = height / 2
+        self.bar_x = bar_x # x座標は固定なので保持しておき、毎フレーム canvas.coords で読み直さない
+        self.animator = animator
+        self.rec_colors = rec_colors
+        self.thinking_colors = thinking_colors
+        self.num_bars = len(bar_x)
+
+        self.bars = []
+        for i, x in enumerate(bar_x):
+            # 描画負荷が低い create_line で角丸を表現
+            bar = self.canvas.create_line(x, self.center_y - 2, x, self.center_y + 2, 
+                                        fill=rec_colors[i], width=bar_width, capstyle='round')
+            self.bars.append(bar)
+
+        # 最後に Tk へ送った状態。変化したバーだけを更新するために使う
+        self._drawn_heights = np.full(self.num_bars, 4.0)
+        self._drawn_colors = list(rec_colors)
+        self._stride = 1
+
+    def _set_colors(self, colors):
+        """色が変わったバーだけ itemconfig する"""
+        for i in range(0, self.num_bars, self._stride):
+            if self._drawn_colors[i] != colors[i]:
+                self.canvas.itemconfig(self.bars[i], fill=colors[i])
+                self._drawn_colors[i] = colors[i]
+
+    def _set_heights(self, heights):
+        """高さが変わったバーだけ coords を更新する"""
+        changed = np.flatnonzero(heights != self._drawn_heights)
+        if self._stride > 1:
+            changed = changed[changed % self._stride == 0]
+        half_heights = heights / 2
+        for i in changed.tolist():
+            x = self.bar_x[i]
+            half_h = half_heights[i]
+            self.canvas.coords(self.bars[i], x, self.center_y - half_h, x, self.center_y + half_h)
+            self._drawn_heights[i] = heights[i]
+
+    def draw_recording(self, heights):
+        self._set_heights(heights)
+        self._set_colors(self.rec_colors)
+
+    def draw_thinking(self, index):
+        heights, glow = self.animator.thinking_keyframe(index)
+        self._set_heights(heights)
+        # ピーク付近はライトピンクで発光感を出す (白を廃止)
+        self._set_colors([GLOW_COLOR if g else c for g, c in zip(glow.tolist(), self.thinking_colors)])
+
+    def reset(self):
+        """色を録音中用(rec_colors)に戻す"""
+        self._set_colors(self.rec_colors)
+
+    def set_stride(self, stride):
+        """描画するバーを stride 本おきに間引く（間引いたバーは非表示）"""
+        self._stride = stride
+        for i, bar in enumerate(self.bars):
+            self.canvas.itemconfig(bar, state='normal' if i % stride == 0 else 'hidden')
+        # 再表示したバーは次のフレームで必ず描き直す
+        self._drawn_heights[:] = -1.0
+        self._drawn_colors = [None] * self.num_bars
+
+
+class ImageBarRenderer:
+    """
+    バー全体をオフスクリーンの画像に合成し、canvas の画像アイテム1つを差し替えて描く。
+    1フレームあたりの Tcl の呼び出しは画像の転送1回だけになる。
+    """
+
+    def __init__(self, canvas, width, height, bar_x, bar_width, bg_color, animator, rec_colors, thinking_colors):
+        raster = BarRaster(width, height, bar_x, bar_width, bg_color)
+        self.composer = FrameComposer(animator, raster, rec_colors, thinking_colors)
+        self.photo = ImageTk.PhotoImage(Image.new("RGB", (width, height), bg_color))
+        self.item = canvas.create_image(0, 0, image=self.photo, anchor='nw')
+        self.baseline = np.full(len(bar_x), animator.MIN_HEIGHT)
+
+    def _blit(self, frame):
+        if frame is not None:
+            self.photo.paste(frame)
+
+    def draw_recording(self, heights):
+        self._blit(self.composer.recording(heights))
+
+    def draw_thinking(self, index):
+        self._blit(self.composer.thinking(index))
+
+    def reset(self):
+        """待機時の録音中用の表示に戻す"""
+        self.composer.invalidate()
+        self.draw_recording(self.baseline)
+
+    def set_stride(self, stride):
+        self.composer.set_stride(stride)
+
+
 class OverlayWindow:
     """録音中のモダンなビジュアライザーオーバーレイ"""
-    def __init__(self, root):
+    def __init__(self, root, renderer=None, level_source=None):
         self.root = root
+        self.level_source = level_source # () -> float (0.0-1.0)。録音中は描画フレームごとに1回読む
         self.window = tk.Toplevel(root)
         
         # ウィンドウ設定
@@ -231,7 +334,6 @@ class OverlayWindow:
         self.canvas = tk.Canvas(self.window, width=width, height=height, bg=self.bg_color, highlightthickness=0)
         self.canvas.pack()
         
-        self.bars = []
         self.num_bars = 100 # 多すぎず、かつ高密度なバランス
         self.bar_width = 1   # 最小の細さ
         self.bar_spacing = 2 # 間隔を広げて独立した「線」に見せる
@@ -241,8 +343,14 @@ class OverlayWindow:
         # 配色：思考中（赤からピンクへのグラデーション）
         self.thinking_colors = self._generate_gradient("#ff0000", "#ff69b4", self.num_bars)
         
-        self.colors = self.rec_colors # 初期カラー
-        self._init_bars(width, height)
+        self.canvas_height = height
+        self.animator = BarAnimator(self.num_bars, height)
+        self.governor = FrameGovernor()
+        self.renderer = self._create_renderer(renderer or ConfigManager.get_overlay_renderer(), width, height)
+
+        # 文字起こし待ちのジョブ数（右上に小さく表示。0件なら非表示）
+        self.queue_text = self.canvas.create_text(width - 8, 6, text="", anchor='ne',
+                                                  fill="#aaaaaa", font=("Helvetica", 8))
         self.window.withdraw()
         
         self.is_visible = False
@@ -251,10 +359,6 @@ class OverlayWindow:
 
     def _generate_gradient(self, start_hex, end_hex, steps):
         """グラデーションカラーを生成"""
-        def hex_to_rgb(h):
-            h = h.lstrip('#')
-            return tuple(int(h[i:i+2], 16) for i in (0, 2, 4))
-        
         s_rgb = hex_to_rgb(start_hex)
         e_rgb = hex_to_rgb(end_hex)
         
@@ -267,26 +371,29 @@ class OverlayWindow:
             gradient.append(f'#{r:02x}{g:02x}{b:02x}')
         return gradient
 
-    def _init_bars(self, width, height):
-        self.canvas_height = height
+    def _create_renderer(self, name, width, height):
+        """描画方式を選ぶ ("canvas": バーごとの line アイテム / "image": 1枚の画像)"""
         total_width = (self.bar_width * self.num_bars) + (self.bar_spacing * (self.num_bars - 1))
         start_x = (width - total_width) / 2
-        
-        center_y = height / 2
-        for i in range(self.num_bars):
-            x = start_x + (i * (self.bar_width + self.bar_spacing)) + (self.bar_width / 2)
-            # 描画負荷が低い create_line で角丸を表現
-            bar = self.canvas.create_line(x, center_y - 2, x, center_y + 2, 
-                                        fill=self.colors[i], width=self.bar_width, capstyle='round')
-            self.bars.append(bar)
+        bar_x = [start_x + (i * (self.bar_width + self.bar_spacing)) + (self.bar_width / 2)
+                 for i in range(self.num_bars)]
+
+        if name == "image":
+            return ImageBarRenderer(self.canvas, width, height, bar_x, self.bar_width, self.bg_color,
+                                    self.animator, self.rec_colors, self.thinking_colors)
+        return CanvasBarRenderer(self.canvas, height, bar_x, self.bar_width,
+                                 self.animator, self.rec_colors, self.thinking_colors)
 
     def show(self):
         self.is_thinking = False
         self.current_volume = 0.0
         
         # 表示前に色を録音中用(rec_colors)にリセット
-        for i, bar in enumerate(self.bars):
-            self.canvas.itemconfig(bar, fill=self.rec_colors[i])
+        self.renderer.reset()
+
+        if self.is_visible:
+            # 前の文字起こしの待機中に次の録音が始まった: 描画ループは動いているので切り替えのみ
+            return
         
         # 描画を強制的に反映させてからウィンドウを表示する
         self.canvas.update_idletasks()
@@ -295,17 +402,35 @@ class OverlayWindow:
         self.is_visible = True
         self._draw_frame() # 描画ループ開始
 
+    def show_thinking(self):
+        """Thinking状態で表示する（すでに表示中なら切り替えのみ）"""
+        if not self.is_visible:
+            self.show()
+        self.set_thinking()
+
+    def set_queue_depth(self, depth):
+        """文字起こし待ちのジョブ数を表示する"""
+        self.canvas.itemconfig(self.queue_text, text=f"{depth}" if depth > 0 else "")
+
     def hide(self):
         self.is_thinking = False
         self.is_visible = False
         
         # 隠す前に色を録音中用(rec_colors)にリセットしておく（次回表示時のフラッシング防止）
-        for i, bar in enumerate(self.bars):
-            self.canvas.itemconfig(bar, fill=self.rec_colors[i])
+        self.renderer.reset()
         self.canvas.update_idletasks()
         
         self.window.withdraw()
 
+        stats = self.frame_stats()
+        if stats["frames"]:
+            print(f"Overlay frame time: {FrameGovernor.format_stats(stats)}")
+        self.governor.reset_stats()
+
+    def frame_stats(self) -> dict:
+        """直近の表示期間の描画フレーム時間の統計"""
+        return self.governor.stats()
+
     def update_volume(self, volume):
         """音量に合わせてバーを更新"""
         if not self.is_visible or self.is_thinking:
@@ -316,64 +441,31 @@ class OverlayWindow:
         self.current_volume = self.current_volume * alpha + volume * (1 - alpha)
 
     def _draw_frame(self):
-        """アニメーションのメインループ (60fps目標)"""
+        """
+        アニメーションのメインループ (60fps目標)。
+        高さは NumPy で一括計算し、変化があった分だけ描画方式に応じて Tk に反映する。
+        """
         if not self.is_visible:
             return
 
-        import time
+        start = time.perf_counter()
         t = time.time()
-        center_y = self.canvas_height / 2
-        
-        # 心拍リズムの計算 (ドクッ、ドクッ...)
-        pulse = 0.0
         if self.is_thinking:
-            # 二峰性拍動 (systole: 大, diastole: 小)
-            # 周期を約1.2秒に設定
-            cycle_t = (t * 0.8) % 1.0
-            # 第1波（ドクッ）
-            pulse1 = math.exp(-((cycle_t - 0.2)**2) / (2 * 0.05**2)) * 1.0
-            # 第2波（ドクッ）
-            pulse2 = math.exp(-((cycle_t - 0.45)**2) / (2 * 0.04**2)) * 0.4
-            pulse = pulse1 + pulse2
+            # 心拍は周期的なので、1周期分のキーフレームから選ぶ
+            self.renderer.draw_thinking(self.animator.keyframe_index(t))
+        else:
+            if self.level_source:
+                self.update_volume(self.level_source())
+            self.renderer.draw_recording(self.animator.recording(t, self.current_volume))
 
-        for i, bar in enumerate(self.bars):
-            norm_pos = i / (self.num_bars - 1)
-            dist = abs(norm_pos - 0.5)
-            envelope = math.exp(-(dist**2) / (2 * 0.18**2)) # 広がりを微調整
-            
-            if self.is_thinking:
-                # 思考中：心音アニメーション（ベース高を録音待機時と同じ 3px に合わせる）
-                delay = dist * 0.4
-                p = (t * 0.8 - delay) % 1.0
-                p1 = math.exp(-((p - 0.2)**2) / (2 * 0.05**2)) * 1.0
-                p2 = math.exp(-((p - 0.45)**2) / (2 * 0.04**2)) * 0.4
-                local_pulse = (p1 + p2) * envelope
-                
-                # ベース高 3 + 拍動分 40
-                h = 3 + 40 * local_pulse
-                h = max(3, h)
-                
-                if local_pulse > 0.4: 
-                    self.canvas.itemconfig(bar, fill="#ffb6c1") # ライトピンクで発光感を出す (白を廃止)
-                else:
-                    self.canvas.itemconfig(bar, fill=self.thinking_colors[i])
-            else:
-                # 録音中：音量反応
-                anim_t = t * 6
-                wave = (math.sin(norm_pos * 14 + anim_t) * 0.2 + 
-                       math.sin(norm_pos * 9 - anim_t * 0.5) * 0.1 + 0.7)
-                # ベース高 3
-                h = 3 + (self.canvas_height * self.current_volume * 1.6) * envelope * wave
-                h = max(3, min(self.canvas_height - 6, h))
-                self.canvas.itemconfig(bar, fill=self.rec_colors[i])
-            
-            # 座標更新
-            x, _, _, _ = self.canvas.coords(bar)
-            half_h = h / 2
-            self.canvas.coords(bar, x, center_y - half_h, x, center_y + half_h)
-
-        # 16ms間隔で更新 (約60fps)
-        self.root.after(16, self._draw_frame)
+        # 処理時間が予算を超え続けるならフレームレート・バーの本数を落とす
+        if self.governor.record(time.perf_counter() - start):
+            print(f"Overlay level -> {self.governor.level} "
+                  f"({self.governor.interval_ms} ms, every {self.governor.stride} bar(s))")
+            self.renderer.set_stride(self.governor.stride)
+
+        # 既定は16ms間隔で更新 (約60fps)
+        self.root.after(self.governor.interval_ms, self._draw_frame)
 
     def set_thinking(self):
         self.is_thinking = True
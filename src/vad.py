@@ -0,0 +1,233 @@
+import json
+import os
+import time
+
+import numpy as np
+
+from src import tracing
+from src.capture import RecordedAudio
+
+# フレームエネルギーによる簡易VAD（音声区間検出）のパラメータ
+FRAME_SEC = 0.02          # 判定単位（20ms）
+SPEECH_RMS = 0.01         # 発話とみなすRMS（フルスケール 1.0 換算）
+PAD_SEC = 0.2             # 発話の前後に残す余白（語頭・語尾の欠け防止）
+MAX_PAUSE_SEC = 0.8       # 発話中の無音はこの長さまで短縮する
+
+# 発話の有無の判定（SpeechGate）のパラメータ
+FLOOR_PERCENTILE = 10      # 録音中の静かな方から 10% のフレームの音量をノイズフロアとみなす
+FLOOR_SMOOTHING = 0.2      # デバイスごとのノイズフロアを更新するときの重み（指数移動平均）
+SNR_RATIO = 2.5            # ノイズフロアのこの倍（約 8 dB）以上のフレームを発話とみなす
+MIN_GATE_RMS = 0.003       # 静かな環境でも、これ未満のフレームは発話とみなさない
+MIN_RUN_SEC = 0.06         # これより短く途切れる音（キーのクリックなど）は発話とみなさない
+MIN_SPEECH_SEC = 0.15      # 発話フレームの合計がこれ未満なら送らない
+MIN_SPEECH_FRACTION = 0.05 # 発話フレームの割合がこれ未満なら送らない
+MIN_PITCHED_SEC = 0.1      # 声の高さ（周期性）のある発話フレームがこれ未満なら送らない（咳・物音）
+CONFIDENT_SPEECH_SEC = 0.5 # 発話フレームがこれ以上あれば、割合・周期性によらず送る（ささやき声など）
+PITCH_MIN_HZ = 60
+PITCH_MAX_HZ = 400
+PITCH_CORRELATION = 0.5    # 正規化した自己相関がこれ以上なら周期性があるとみなす
+
+LEVEL_SCALES = {"i": 1.0 / 32768, "f": 1.0}
+
+
+def frame_levels(samples, sample_rate, frame_sec=FRAME_SEC):
+    """
+    サンプル配列 (frames, channels) をフレームに分け、各フレームのRMSを一括で計算する。
+    末尾の端数サンプルは最後のフレームと同じ扱いにするため含めない。
+    """
+    frame_len = max(1, int(sample_rate * frame_sec))
+    num_frames = len(samples) // frame_len
+    if num_frames == 0:
+        return np.zeros(0, dtype=np.float32), frame_len
+
+    scale = LEVEL_SCALES[samples.dtype.kind]
+    frames = samples[:num_frames * frame_len].reshape(num_frames, -1)
+    levels = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1)) * scale
+    return levels, frame_len
+
+
+def audio_levels(audio):
+    """audio (RecordedAudio) 全体のフレームごとのRMSと、各フレームの開始位置（チャンクを結合せずに計算する）"""
+    levels, starts = [], []
+    offset = 0
+    for chunk in audio.chunks:
+        chunk_levels, frame_len = frame_levels(chunk, audio.sample_rate)
+        levels.append(chunk_levels)
+        starts.append(offset + np.arange(len(chunk_levels)) * frame_len)
+        offset += len(chunk)
+    if not levels:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+    return np.concatenate(levels), np.concatenate(starts)
+
+
+def trim_silence(audio, max_pause_sec=MAX_PAUSE_SEC):
+    """
+    先頭・末尾の無音を削り、発話中の長い無音を max_pause_sec に短縮する。
+    (加工後の RecordedAudio, 削減した秒数, 削減したバイト数) を返す。
+    削る部分がない場合や発話が見つからない場合は元の audio をそのまま返す。
+    どちらの場合も返す音声の silence_trimmed を立てる。
+    """
+    levels, frame_len = frame_levels(audio.samples, audio.sample_rate)
+    voiced = levels >= SPEECH_RMS
+    if not voiced.any():
+        audio.silence_trimmed = True
+        return audio, 0.0, 0
+
+    # 発話フレームの前後に余白を付ける（畳み込みで一括膨張）
+    pad = int(PAD_SEC / FRAME_SEC)
+    keep = np.convolve(voiced, np.ones(2 * pad + 1), mode='same') > 0
+
+    # 発話中の長い無音区間を上限の長さまで詰める（前後半分ずつ残す）
+    max_pause = int(max_pause_sec / FRAME_SEC)
+    edges = np.diff(keep.astype(np.int8))
+    gap_starts = np.flatnonzero(edges == -1) + 1
+    gap_ends = np.flatnonzero(edges == 1) + 1
+    if len(gap_starts) and len(gap_ends) and gap_ends[0] < gap_starts[0]:
+        gap_ends = gap_ends[1:] # 先頭の無音は別扱い（すべて削る）
+    for start, end in zip(gap_starts, gap_ends):
+        if end - start > max_pause:
+            head = max_pause // 2
+            keep[start:start + head] = True
+            keep[end - (max_pause - head):end] = True
+        else:
+            keep[start:end] = True
+
+    # 末尾の端数サンプルは最後のフレームの判定に従う
+    tail = len(audio.samples) - len(keep) * frame_len
+    mask = np.repeat(keep, frame_len)
+    if tail:
+        mask = np.concatenate([mask, np.full(tail, keep[-1])])
+    if mask.all():
+        audio.silence_trimmed = True
+        return audio, 0.0, 0
+
+    trimmed = RecordedAudio([audio.samples[mask]], audio.sample_rate, audio.channels, audio.dtype)
+    trimmed.silence_trimmed = True
+    saved_frames = audio.num_frames - trimmed.num_frames
+    return trimmed, saved_frames / audio.sample_rate, audio.nbytes - trimmed.nbytes
+
+
+def _sustained(voiced, min_run):
+    """min_run フレーム以上続く発話フレームだけを残す"""
+    edges = np.diff(np.concatenate([[0], voiced.astype(np.int8), [0]]))
+    kept = np.zeros_like(voiced)
+    for start, end in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)):
+        if end - start >= min_run:
+            kept[start:end] = True
+    return kept
+
+
+def _pitched_frames(samples, starts, frame_len, sample_rate) -> int:
+    """starts から始まる2フレーム分の窓のうち、声の高さの範囲に周期性があるものの数（自己相関で判定）"""
+    window = 2 * frame_len
+    starts = starts[starts + window <= len(samples)]
+    if not len(starts):
+        return 0
+    mono = samples.astype(np.float32).mean(axis=1)
+    x = mono[starts[:, None] + np.arange(window)]
+    x -= x.mean(axis=1, keepdims=True)
+    power = np.abs(np.fft.rfft(x, n=2 * window, axis=1)) ** 2
+    lo = int(sample_rate / PITCH_MAX_HZ)
+    hi = min(window - 1, int(sample_rate / PITCH_MIN_HZ))
+    lags = np.arange(lo, hi + 1)
+    ac = np.fft.irfft(power, axis=1)
+    # 長い周期ほど窓の重なりが短く相関が小さく出るため、重なりの長さで補正する
+    correlation = ac[:, lags] * (window / (window - lags)) / np.maximum(ac[:, :1], 1e-12)
+    strength = correlation.max(axis=1)
+    return int(np.count_nonzero(strength >= PITCH_CORRELATION))
+
+
+class SpeechGate:
+    """
+    録音に発話が含まれるかを、送信前の加工（無音除去・エンコード）より先に判定する。
+    1ブロックの最大音量ではなく、入力デバイスごとのノイズフロアを基準に発話とみなせるフレームの割合で判定するため、
+    キーのクリックや咳が1回入っただけの録音は送らず、騒がしい環境でも雑音だけの録音を送らない。
+    ノイズフロアは録音のたびに静かなフレームから推定し、path (JSON) にデバイス名ごとに保存する。
+    log_path を渡すと、判定ごとに根拠の値を1行のJSONで追記する（見逃し・誤送信の率を後から調べるため）。
+    """
+
+    def __init__(self, path=None, log_path=None):
+        self.path = path
+        self.log_path = log_path
+        self.floors = {} # デバイス名 -> ノイズフロア (RMS)
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self.floors = {str(k): float(v) for k, v in json.load(f).items()}
+            except (OSError, ValueError, AttributeError) as e:
+                print(f"Noise Floor Load Error: {e}")
+
+    def evaluate(self, audio, device=None) -> dict:
+        """
+        audio (RecordedAudio または WAVファイルのパス) を判定し、判定結果と根拠の値を dict で返す（"send" が真なら送る）。
+        あわせて device のノイズフロアを更新する。
+        """
+        if isinstance(audio, str):
+            audio = RecordedAudio.load(audio)
+        decision = self._evaluate(audio, device or "default")
+        if self.log_path:
+            tracing.append_record({"ts": round(time.time(), 3), **decision}, self.log_path)
+        return decision
+
+    def _evaluate(self, audio, device) -> dict:
+        decision = {"send": False, "reason": "empty", "device": device, "duration": round(audio.duration, 2)}
+        levels, starts = audio_levels(audio)
+        if not len(levels):
+            return decision
+
+        # 保存済みのノイズフロアと、この録音の静かな部分の小さい方を基準にする（静かな場所へ移った直後も外さない）
+        clip_floor = float(np.percentile(levels, FLOOR_PERCENTILE))
+        stored = self.floors.get(device)
+        floor = clip_floor if stored is None else min(stored, clip_floor)
+        threshold = max(MIN_GATE_RMS, floor * SNR_RATIO)
+
+        frame_len = int(audio.sample_rate * FRAME_SEC)
+        voiced = _sustained(levels >= threshold, max(1, round(MIN_RUN_SEC / FRAME_SEC)))
+        voiced_sec = float(np.count_nonzero(voiced)) * FRAME_SEC
+        fraction = float(np.mean(voiced))
+        decision.update(floor=round(floor, 5), threshold=round(threshold, 5),
+                        speech_frac=round(fraction, 3), voiced_sec=round(voiced_sec, 2))
+
+        if voiced_sec < MIN_SPEECH_SEC:
+            decision["reason"] = "too little speech"
+        elif voiced_sec >= CONFIDENT_SPEECH_SEC:
+            decision.update(send=True, reason="speech")
+        elif fraction < MIN_SPEECH_FRACTION:
+            decision["reason"] = "speech fraction too low"
+        else:
+            # 短い音だけの録音は、声の高さがあるか（咳・物音でないか）も確かめる
+            pitched = _pitched_frames(audio.samples, starts[voiced], frame_len, audio.sample_rate)
+            decision["pitched_sec"] = round(pitched * FRAME_SEC, 2)
+            if pitched * FRAME_SEC < MIN_PITCHED_SEC:
+                decision["reason"] = "no voice pitch"
+            else:
+                decision.update(send=True, reason="speech")
+
+        # ほぼ全体が発話の録音はノイズフロアの推定に使わない
+        if fraction < 0.8:
+            self._update_floor(device, clip_floor)
+        return decision
+
+    def _update_floor(self, device, estimate):
+        stored = self.floors.get(device)
+        self.floors[device] = estimate if stored is None else stored + FLOOR_SMOOTHING * (estimate - stored)
+        if not self.path:
+            return
+        try:
+            temp = f"{self.path}.tmp"
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump(self.floors, f, ensure_ascii=False, indent=2)
+            os.replace(temp, self.path)
+        except OSError as e:
+            print(f"Noise Floor Save Error: {e}")
+
+    @staticmethod
+    def describe(decision) -> str:
+        """ログ用の1行の説明"""
+        if "floor" not in decision:
+            return f"skip ({decision['reason']})"
+        text = (f"{'send' if decision['send'] else 'skip'} ({decision['reason']}: "
+                f"speech {decision['speech_frac'] * 100:.0f}% / {decision['voiced_sec']:.2f}s")
+        if "pitched_sec" in decision:
+            text += f", pitched {decision['pitched_sec']:.2f}s"
+        return text + f", floor {decision['floor']:.4f}, threshold {decision['threshold']:.4f}, device {decision['device']})"
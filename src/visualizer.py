@@ -0,0 +1,247 @@
+import time
+from collections import deque
+
+import numpy as np
+from PIL import Image
+
+# 思考中に拍動のピークを迎えたバーの色（発光感を出す）
+GLOW_COLOR = "#ffb6c1"
+
+
+def hex_to_rgb(color) -> tuple:
+    """"#rrggbb" を (r, g, b) に変換する"""
+    color = color.lstrip('#')
+    return tuple(int(color[i:i+2], 16) for i in (0, 2, 4))
+
+
+def heartbeat(phase):
+    """二峰性拍動（ドクッ、ドクッ）の波形。phase は周期内の位置 (0-1)。配列も可"""
+    # 第1波（大）+ 第2波（小）
+    return (np.exp(-((phase - 0.2) ** 2) / (2 * 0.05 ** 2)) * 1.0 +
+            np.exp(-((phase - 0.45) ** 2) / (2 * 0.04 ** 2)) * 0.4)
+
+
+class BarAnimator:
+    """
+    オーバーレイのバーの高さを1フレーム分まとめて NumPy で計算する。
+    位置に依存する値（包絡線・遅延）は最初に一度だけ計算しておく。
+    """
+    MIN_HEIGHT = 3.0
+    QUANTUM = 0.5 # 高さはこの単位(px)に丸める。これ未満の変化では描画し直さない
+    HEARTBEAT_RATE = 0.8 # 心拍の周期 = 1 / 0.8 = 1.25秒
+    KEYFRAMES = 75       # 思考中アニメーション1周期分のキーフレーム数（60fpsで1フレームに1枚）
+
+    def __init__(self, num_bars, height):
+        self.num_bars = num_bars
+        self.height = height
+        self.norm_pos = np.linspace(0.0, 1.0, num_bars)
+        dist = np.abs(self.norm_pos - 0.5)
+        self.envelope = np.exp(-(dist ** 2) / (2 * 0.18 ** 2)) # 広がりを微調整
+        self.delay = dist * 0.4 # 中央から外側へ拍動が伝わる遅れ
+        self._keyframes = None
+
+    def recording(self, t, volume) -> np.ndarray:
+        """録音中：音量に反応する波"""
+        anim_t = t * 6
+        wave = (np.sin(self.norm_pos * 14 + anim_t) * 0.2 +
+                np.sin(self.norm_pos * 9 - anim_t * 0.5) * 0.1 + 0.7)
+        h = self.MIN_HEIGHT + (self.height * volume * 1.6) * self.envelope * wave
+        return self.quantize(np.clip(h, self.MIN_HEIGHT, self.height - 6))
+
+    def thinking(self, t) -> tuple:
+        """思考中：心音アニメーション。(高さ, 発光させるバーのマスク) を返す"""
+        local_pulse = heartbeat((t * self.HEARTBEAT_RATE - self.delay) % 1.0) * self.envelope
+        # ベース高 3 + 拍動分 40
+        h = np.maximum(self.MIN_HEIGHT, self.MIN_HEIGHT + 40 * local_pulse)
+        return self.quantize(h), local_pulse > 0.4
+
+    def keyframe_index(self, t) -> int:
+        """時刻 t に対応する思考中アニメーションのキーフレーム番号"""
+        return int((t * self.HEARTBEAT_RATE) % 1.0 * self.KEYFRAMES) % self.KEYFRAMES
+
+    def thinking_keyframe(self, index) -> tuple:
+        """
+        思考中アニメーションは周期的なので、1周期分を最初に一度だけ計算して使い回す。
+        (高さ, 発光マスク) を返す。
+        """
+        if self._keyframes is None:
+            self._keyframes = [self.thinking(i / (self.KEYFRAMES * self.HEARTBEAT_RATE))
+                               for i in range(self.KEYFRAMES)]
+        return self._keyframes[index]
+
+    def quantize(self, heights) -> np.ndarray:
+        return np.round(heights / self.QUANTUM) * self.QUANTUM
+
+
+class BarRaster:
+    """
+    バー全体を1枚の RGB 画像として描く。
+    各バーは中央から上下に伸びる縦線で、端は被覆率でアンチエイリアスする。
+    計算は NumPy でチャンネルごとの平面に対して行い、最後に Pillow で1枚にまとめる。
+    """
+
+    def __init__(self, width, height, bar_x, bar_width, bg_color):
+        self.width = width
+        self.height = height
+        self.bg = np.array(hex_to_rgb(bg_color), dtype=np.float32)
+        # バーは等間隔に並ぶので、各バーの k 列目はスライス1つでまとめて書ける
+        lefts = [int(round(x - bar_width / 2)) for x in bar_x]
+        step = lefts[1] - lefts[0] if len(lefts) > 1 else 1
+        if any(b - a != step for a, b in zip(lefts, lefts[1:])) or lefts[0] < 0 or lefts[-1] + bar_width > width:
+            raise ValueError("Bars must be evenly spaced inside the image")
+        self.columns = [slice(lefts[0] + k, lefts[-1] + k + 1, step) for k in range(bar_width)]
+        # ピクセル中心から縦方向の中央までの距離
+        self._dist = np.abs(np.arange(height, dtype=np.float32) + 0.5 - height / 2)[:, None]
+        self._planes = [np.full((height, width), int(c), dtype=np.uint8) for c in self.bg]
+
+    def render(self, heights, colors) -> Image.Image:
+        """
+        heights: バーごとの高さ(px)。0 のバーは描かない
+        colors:  バーごとの色 (num_bars, 3) の RGB
+        """
+        half = np.asarray(heights, dtype=np.float32) * 0.5
+        coverage = np.clip(half - self._dist + 0.5, 0.0, 1.0)
+        delta = (np.asarray(colors, dtype=np.float32) - self.bg).T
+        for plane, bg, channel_delta in zip(self._planes, self.bg, delta):
+            values = coverage * channel_delta + (bg + 0.5)
+            for columns in self.columns:
+                plane[:, columns] = values
+        return Image.merge("RGB", [Image.fromarray(plane) for plane in self._planes])
+
+
+class FrameComposer:
+    """
+    画像方式のオーバーレイで、1フレーム分の画像を合成する。
+    直前と同じ内容なら None を返して描画を省略し、思考中の1周期分の画像はキーフレームとしてキャッシュする。
+    """
+
+    def __init__(self, animator, raster, rec_colors, thinking_colors):
+        self.animator = animator
+        self.raster = raster
+        self.rec_rgb = np.array([hex_to_rgb(c) for c in rec_colors], dtype=np.float32)
+        self.thinking_rgb = np.array([hex_to_rgb(c) for c in thinking_colors], dtype=np.float32)
+        self.glow_rgb = np.array(hex_to_rgb(GLOW_COLOR), dtype=np.float32)
+        self._visible = np.ones(animator.num_bars)
+        self._keyframes = {}
+        self._last_key = None
+
+    def set_stride(self, stride):
+        """描画するバーを stride 本おきに間引く"""
+        self._visible = (np.arange(self.animator.num_bars) % stride == 0).astype(float)
+        self._keyframes.clear()
+        self._last_key = None
+
+    def invalidate(self):
+        """次のフレームを必ず描き直す"""
+        self._last_key = None
+
+    def recording(self, heights):
+        key = ("recording", heights.tobytes())
+        if key == self._last_key:
+            return None
+        self._last_key = key
+        return self.raster.render(heights * self._visible, self.rec_rgb)
+
+    def thinking(self, index):
+        key = ("thinking", index)
+        if key == self._last_key:
+            return None
+        self._last_key = key
+        frame = self._keyframes.get(index)
+        if frame is None:
+            heights, glow = self.animator.thinking_keyframe(index)
+            colors = np.where(glow[:, None], self.glow_rgb, self.thinking_rgb)
+            frame = self._keyframes[index] = self.raster.render(heights * self._visible, colors)
+        return frame
+
+
+class FrameGovernor:
+    """
+    描画1フレームにかかった時間を計測し、予算を超えるようなら
+    フレームレート→バーの本数の順に描画レベルを下げる（余裕が戻れば上げ直す）。
+    """
+    # (フレーム間隔 ms, バーの間引き間隔)
+    LEVELS = [(16, 1), (33, 1), (33, 2), (50, 4)]
+    BUDGET_RATIO = 0.5   # フレーム間隔のうち描画処理に使ってよい割合（残りはホットキー等のイベント処理用）
+    RECOVER_RATIO = 0.2  # 平均がこの割合を下回ったら1段階戻す
+    WINDOW = 30          # このフレーム数ごとに判定する
+    HISTORY_SIZE = 3600  # 統計用に保持するフレーム数（60fpsで1分）
+
+    def __init__(self):
+        self.level = 0
+        self._recent = []
+        self._samples = deque(maxlen=self.HISTORY_SIZE)
+        self._started = None
+        self._last = None
+        self.level_changes = 0
+
+    @property
+    def interval_ms(self) -> int:
+        return self.LEVELS[self.level][0]
+
+    @property
+    def stride(self) -> int:
+        return self.LEVELS[self.level][1]
+
+    @property
+    def budget(self) -> float:
+        """1フレームの描画処理に使ってよい時間（秒）"""
+        return self.interval_ms / 1000 * self.BUDGET_RATIO
+
+    def record(self, frame_sec) -> bool:
+        """1フレームの処理時間を記録する。描画レベルを変えたら True を返す"""
+        now = time.perf_counter()
+        if self._started is None:
+            self._started = now
+        self._last = now
+        self._samples.append(frame_sec)
+        self._recent.append(frame_sec)
+        if len(self._recent) < self.WINDOW:
+            return False
+
+        average = sum(self._recent) / len(self._recent)
+        self._recent.clear()
+        if average > self.budget and self.level < len(self.LEVELS) - 1:
+            self.level += 1
+        elif average < self.budget * self.RECOVER_RATIO and self.level > 0:
+            self.level -= 1
+        else:
+            return False
+        self.level_changes += 1
+        return True
+
+    def stats(self) -> dict:
+        """フレーム時間の統計（ms）"""
+        if not self._samples:
+            return {"frames": 0}
+        samples = np.array(self._samples) * 1000
+        elapsed = self._last - self._started
+        return {
+            "frames": len(samples),
+            "fps": (len(samples) - 1) / elapsed if elapsed > 0 else 0.0,
+            "mean_ms": float(samples.mean()),
+            "p50_ms": float(np.percentile(samples, 50)),
+            "p95_ms": float(np.percentile(samples, 95)),
+            "p99_ms": float(np.percentile(samples, 99)),
+            "max_ms": float(samples.max()),
+            "over_budget": float(np.mean(samples > self.budget * 1000)),
+            "level": self.level,
+            "level_changes": self.level_changes,
+        }
+
+    def reset_stats(self):
+        """統計のみ消去する（描画レベルは次回表示時にも引き継ぐ）"""
+        self._recent.clear()
+        self._samples.clear()
+        self._started = None
+        self._last = None
+        self.level_changes = 0
+
+    @staticmethod
+    def format_stats(stats) -> str:
+        if not stats.get("frames"):
+            return "no frames"
+        return (f"{stats['frames']} frames, {stats['fps']:.1f} fps, "
+                f"p50 {stats['p50_ms']:.2f} ms, p95 {stats['p95_ms']:.2f} ms, "
+                f"p99 {stats['p99_ms']:.2f} ms, max {stats['max_ms']:.2f} ms, "
+                f"over budget {stats['over_budget'] * 100:.1f}%, level {stats['level']}")